@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from langchain import hub
+from langchain.agents import create_react_agent, AgentExecutor
+from langchain_core.load import dumps, loads
+from langchain_core.prompts import PromptTemplate
+from langsmith.utils import LangSmithConnectionError
+
+from tool_cache import CachedTool, tool_settings
+
+# Hub reference of the ReAct prompt. Pin a commit (e.g. "hwchase17/react:d15fe3c4")
+# to change the prompt version; each version gets its own local copy and executors.
+REACT_PROMPT_REF = os.getenv("REACT_PROMPT_REF", "hwchase17/react")
+PROMPT_CACHE_DIR = os.getenv("PROMPT_CACHE_DIR", os.path.join(".cache", "prompts"))
+EXECUTOR_CACHE_SIZE = int(os.getenv("EXECUTOR_CACHE_SIZE", "64"))
+
+logger = logging.getLogger(__name__)
+
+# Bundled copy of hwchase17/react, used when the hub is unreachable and no
+# local copy exists yet (offline runs, benchmarks)
+REACT_TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+# Only these mean the hub is unreachable; auth errors or a pinned commit that
+# does not exist are raised. The hub is tried again after HUB_RETRY_INTERVAL.
+HUB_OFFLINE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    LangSmithConnectionError
+)
+HUB_RETRY_INTERVAL = 60.0
+
+_lock = threading.Lock()
+_prompts = {}
+_offline_until = {}
+_executors = OrderedDict()
+
+
+def _prompt_path(prompt_ref):
+    """Local file the pulled prompt is saved to"""
+    safe_name = prompt_ref.replace("/", "_").replace(":", "@")
+    return os.path.join(PROMPT_CACHE_DIR, f"{safe_name}.json")
+
+
+def load_prompt(prompt_ref=REACT_PROMPT_REF):
+    """Load a hub prompt, pulling it only when there is no local copy yet"""
+    with _lock:
+        if prompt_ref in _prompts:
+            return _prompts[prompt_ref]
+
+        path = _prompt_path(prompt_ref)
+        prompt = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    prompt = loads(f.read())
+            except Exception:
+                prompt = None  # Corrupt copy, fall back to the hub
+
+        if prompt is None:
+            if time.monotonic() < _offline_until.get(prompt_ref, 0.0):
+                return PromptTemplate.from_template(REACT_TEMPLATE)
+            try:
+                prompt = hub.pull(prompt_ref)
+            except HUB_OFFLINE_ERRORS as e:
+                if prompt_ref != "hwchase17/react":
+                    raise  # A pinned version has no bundled copy
+                # Offline: serve the bundled template without persisting or
+                # memoizing it, so the hub copy is used once it is reachable
+                logger.warning("Prompt hub unreachable (%s), using the bundled %s template", e, prompt_ref)
+                _offline_until[prompt_ref] = time.monotonic() + HUB_RETRY_INTERVAL
+                return PromptTemplate.from_template(REACT_TEMPLATE)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(dumps(prompt))
+                os.replace(tmp_path, path)
+            except OSError:
+                pass  # Read-only filesystem, keep the in-memory copy only
+
+        _prompts[prompt_ref] = prompt
+        return prompt
+
+
+def _tool_key(tool):
+    """Name, class and output settings of a tool (of the wrapped one for a cached tool)"""
+    inner = tool.tool if isinstance(tool, CachedTool) else tool
+    return (tool.name, type(tool).__name__, type(inner).__name__, tool_settings(inner))
+
+
+def _executor_key(llm, model_name, tools, prompt_ref, extra):
+    """Cache key for an executor
+
+    The LLM is keyed by identity: pooled clients are long-lived, and a client
+    rebuilt after pool eviction must not reuse an executor holding the old
+    one (which keeps it alive, so its id cannot be recycled). Tools are keyed
+    by what they do, so a tool set rebuilt with the same settings (e.g. on
+    every Streamlit rerun) reuses the executor.
+    """
+    tool_keys = tuple(_tool_key(tool) for tool in tools)
+    return (id(llm), model_name, tool_keys, prompt_ref, tuple(sorted(extra.items())))
+
+
+def get_agent_executor(llm, model_name, tools, prompt_ref=REACT_PROMPT_REF, **executor_kwargs):
+    """Return a cached ReAct AgentExecutor for (model, tool set, prompt version)
+
+    Callbacks are passed per call to ``invoke`` so the same executor can be shared
+    across Streamlit reruns and sessions.
+    """
+    key = _executor_key(llm, model_name, tools, prompt_ref, executor_kwargs)
+    with _lock:
+        executor = _executors.get(key)
+        if executor is not None:
+            _executors.move_to_end(key)
+            return executor
+
+    prompt = load_prompt(prompt_ref)
+    agent = create_react_agent(llm, tools, prompt)
+    executor = AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True,
+        **executor_kwargs
+    )
+
+    with _lock:
+        # Built on the bundled offline template: not kept, like the template itself
+        if _prompts.get(prompt_ref) is not prompt:
+            return executor
+        # Another thread may have built the same executor meanwhile, keep the first
+        executor = _executors.setdefault(key, executor)
+        while len(_executors) > EXECUTOR_CACHE_SIZE:
+            _executors.popitem(last=False)
+        return executor
+
+
+def clear_agent_cache():
+    """Drop all cached executors and in-memory prompts"""
+    with _lock:
+        _executors.clear()
+        _prompts.clear()
+        _offline_until.clear()
@@ -0,0 +1,247 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", os.path.join(".cache", "analytics.sqlite3"))
+ANALYTICS_RETENTION_HOURS = int(os.getenv("ANALYTICS_RETENTION_HOURS", str(90 * 24)))
+
+# Quantiles from the sketch are within 1% of the true value; values below
+# MIN_VALUE seconds share the lowest bucket
+SKETCH_ACCURACY = 0.01
+SKETCH_MIN_VALUE = 0.001
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with log-spaced buckets (DDSketch)
+
+    Each value lands in bucket ceil(log(value) / log(gamma)), so any quantile
+    is estimated within ``accuracy`` relative error from a few hundred
+    counters, and sketches merge by adding bucket counts. That is what lets
+    several processes update one persisted sketch.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY, buckets=None):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = dict(buckets or {})
+
+    def key(self, value):
+        return math.ceil(math.log(max(value, SKETCH_MIN_VALUE)) / self._log_gamma)
+
+    def add(self, value, count=1):
+        key = self.key(value)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def quantile(self, q):
+        """Estimate of the q-th quantile, or None without data"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Analytics:
+    """Rolling search metrics shared by every session, process and restart
+
+    Each finished query updates an hourly bucket, per model/tool/route/stage
+    counters and that hour's latency sketches in one SQLite transaction. The
+    dashboard reads those aggregates back, so its cost depends on the number
+    of buckets (bounded by the retention window), not on how many queries ran.
+    """
+
+    def __init__(self, path=ANALYTICS_DB_PATH, retention_hours=ANALYTICS_RETENTION_HOURS):
+        self.path = path
+        self.retention_hours = retention_hours
+        self._lock = threading.Lock()
+        self._sketch = QuantileSketch()
+        self._pruned_hour = None
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS hourly (
+                    hour INTEGER PRIMARY KEY,
+                    queries INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0,
+                    cached INTEGER NOT NULL DEFAULT 0,
+                    response_seconds REAL NOT NULL DEFAULT 0,
+                    first_token_seconds REAL NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS counters (
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, name)
+                )"""
+            )
+            # Sketches are kept per hour so they cover the same window as the
+            # hourly totals; the earlier all-time table cannot be windowed
+            self._conn.execute("DROP TABLE IF EXISTS sketch_buckets")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS hourly_sketches (
+                    metric TEXT NOT NULL,
+                    hour INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (metric, hour, bucket)
+                )"""
+            )
+            self._prune()
+            self._conn.commit()
+
+    @staticmethod
+    def _hour(now=None):
+        return int((now or time.time()) // 3600)
+
+    def _prune(self):
+        """Delete hourly rows and sketches older than the retention window, once per hour (caller holds the lock)"""
+        hour = self._hour()
+        if not self.retention_hours or self._pruned_hour == hour:
+            return
+        self._pruned_hour = hour
+        self._conn.execute("DELETE FROM hourly WHERE hour < ?", (hour - self.retention_hours,))
+        self._conn.execute("DELETE FROM hourly_sketches WHERE hour < ?", (hour - self.retention_hours,))
+
+    def _count(self, kind, name, count=1, seconds=0.0):
+        self._conn.execute(
+            "INSERT INTO counters (kind, name, count, seconds) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (kind, name) DO UPDATE SET count = count + excluded.count, seconds = seconds + excluded.seconds",
+            (kind, name, count, seconds)
+        )
+
+    def _observe(self, metric, value):
+        self._conn.execute(
+            "INSERT INTO hourly_sketches (metric, hour, bucket, count) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (metric, hour, bucket) DO UPDATE SET count = count + 1",
+            (metric, self._hour(), self._sketch.key(value))
+        )
+
+    def record_query(self, result):
+        """Fold one finished query (a run_query result) into the aggregates"""
+        response_time = result.get("response_time") or 0.0
+        first_token_time = result.get("first_token_time") or response_time
+        model = result.get("model") or "unknown"
+        with self._lock:
+            self._prune()
+            self._conn.execute(
+                "INSERT INTO hourly (hour, queries, cached, response_seconds, first_token_seconds) "
+                "VALUES (?, 1, ?, ?, ?) ON CONFLICT (hour) DO UPDATE SET queries = queries + 1, "
+                "cached = cached + excluded.cached, response_seconds = response_seconds + excluded.response_seconds, "
+                "first_token_seconds = first_token_seconds + excluded.first_token_seconds",
+                (self._hour(), int(bool(result.get("cached"))), response_time, first_token_time)
+            )
+            self._count("model", model, seconds=response_time)
+            if result.get("route"):
+                self._count("route", result["route"])
+            for tool, calls in (result.get("tool_calls") or {}).items():
+                self._count("tool", tool, calls)
+            for stage, seconds in (result.get("stages") or {}).items():
+                self._count("stage", stage, seconds=seconds)
+            self._observe("response_time", response_time)
+            self._observe("first_token_time", first_token_time)
+            self._observe(f"response_time:{model}", response_time)
+            self._conn.commit()
+
+    def record_error(self, model=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO hourly (hour, errors) VALUES (?, 1) "
+                "ON CONFLICT (hour) DO UPDATE SET errors = errors + 1",
+                (self._hour(),)
+            )
+            if model:
+                self._count("model_error", model)
+            self._conn.commit()
+
+    def sketch(self, metric, since_hour=None):
+        """Merged sketch of a metric over the retained hours, or from ``since_hour`` on"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bucket, SUM(count) FROM hourly_sketches WHERE metric = ? AND hour >= ? GROUP BY bucket",
+                (metric, since_hour or 0)
+            ).fetchall()
+        return QuantileSketch(buckets=dict(rows))
+
+    def percentiles(self, metric, since_hour=None):
+        """{"p50": ..., "p95": ..., "p99": ...} seconds for a sketched metric"""
+        sketch = self.sketch(metric, since_hour)
+        return {f"p{round(q * 100)}": sketch.quantile(q) for q in QUANTILES}
+
+    def snapshot(self, recent_hours=24):
+        """Everything the dashboard shows, read from the aggregates"""
+        since = self._hour() - recent_hours + 1
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT COALESCE(SUM(queries), 0), COALESCE(SUM(errors), 0), COALESCE(SUM(cached), 0) FROM hourly"
+            ).fetchone()
+            by_hour_of_day = self._conn.execute(
+                "SELECT CAST(strftime('%H', hour * 3600, 'unixepoch', 'localtime') AS INTEGER), SUM(queries) "
+                "FROM hourly GROUP BY 1 ORDER BY 1"
+            ).fetchall()
+            recent = self._conn.execute(
+                "SELECT hour, queries, CASE WHEN queries THEN response_seconds / queries END "
+                "FROM hourly WHERE hour >= ? ORDER BY hour",
+                (since,)
+            ).fetchall()
+            counters = self._conn.execute("SELECT kind, name, count, seconds FROM counters").fetchall()
+
+        grouped = {}
+        for kind, name, count, seconds in counters:
+            grouped.setdefault(kind, {})[name] = (count, seconds)
+        # Counters are all-time while hourly rows are pruned, so stage averages
+        # divide by the all-time query count
+        all_time = sum(count for count, _ in grouped.get("model", {}).values())
+        return {
+            "queries": totals[0],
+            "errors": totals[1],
+            "cached": totals[2],
+            "by_hour_of_day": dict(by_hour_of_day),
+            "recent_hours": [
+                {"hour": hour * 3600, "queries": queries, "avg_response_time": avg} for hour, queries, avg in recent
+            ],
+            "models": {name: count for name, (count, _) in grouped.get("model", {}).items()},
+            "tools": {name: count for name, (count, _) in grouped.get("tool", {}).items()},
+            "routes": {name: count for name, (count, _) in grouped.get("route", {}).items()},
+            # Seconds per query, counting queries that skipped a stage as zero
+            "stage_averages": {
+                name: seconds / all_time for name, (_, seconds) in grouped.get("stage", {}).items()
+            } if all_time else {},
+            "response_time": self.percentiles("response_time"),
+            "first_token_time": self.percentiles("first_token_time")
+        }
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics():
+    """Process-wide analytics store"""
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = Analytics()
+        return _analytics
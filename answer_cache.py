@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from embeddings import EMBEDDING_MODEL, embed_texts, get_sentence_model
+
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(".cache", "answer_cache.sqlite3"))
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+
+# Maximum age of a reusable answer in seconds, by the sidebar time filter
+TIME_FILTER_MAX_AGE = {
+    "Past day": 3600,
+    "Past week": 6 * 3600,
+    "Past month": 24 * 3600,
+    "Any time": 7 * 24 * 3600
+}
+
+# News goes stale quickly whatever the time filter says
+SEARCH_TYPE_MAX_AGE = {
+    "News": 3600,
+    "General": 3 * 24 * 3600,
+    "Technical": 7 * 24 * 3600,
+    "Academic": 7 * 24 * 3600
+}
+
+# Nearest neighbours examined per lookup before metadata filtering
+SEARCH_CANDIDATES = 8
+
+
+def max_age(search_type, time_filter):
+    """Staleness limit for an answer given the search settings"""
+    return min(
+        TIME_FILTER_MAX_AGE.get(time_filter, TIME_FILTER_MAX_AGE["Any time"]),
+        SEARCH_TYPE_MAX_AGE.get(search_type, SEARCH_TYPE_MAX_AGE["General"])
+    )
+
+
+class SemanticAnswerCache:
+    """Cross-session cache of final answers matched by query embedding similarity
+
+    Queries are embedded locally with sentence-transformers and searched with an
+    inner-product FAISS index over normalized vectors (cosine similarity). An
+    answer is only reused for the search settings it was produced with
+    (type, language, depth and time filter).
+    Answers and embeddings are persisted in SQLite, which several processes
+    share; each lookup first adds the rows inserted since the last one (by
+    this process or another) to the index.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, model_name=EMBEDDING_MODEL, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._model_name = model_name
+        self._dim = get_sentence_model(model_name).get_sentence_embedding_dimension()
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(self._dim))
+        self._max_id = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                search_type TEXT NOT NULL,
+                response TEXT NOT NULL,
+                model TEXT,
+                embedding BLOB NOT NULL,
+                created REAL NOT NULL,
+                language TEXT,
+                search_depth TEXT,
+                time_filter TEXT
+            )"""
+        )
+        # Rows stored before these settings were recorded match no lookup and age out
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        for column in ("language", "search_depth", "time_filter"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE answers ADD COLUMN {column} TEXT")
+        self._conn.commit()
+        self.prune()
+        with self._lock:
+            self._sync_index()
+
+    def _sync_index(self):
+        """Bring the index up to date with rows other processes added or pruned (caller holds the lock)
+
+        Row ids grow in commit order, so every row committed since the last
+        sync has a larger id; fewer rows up to that id than index entries
+        means another process pruned some.
+        """
+        live = self._conn.execute("SELECT COUNT(*) FROM answers WHERE id <= ?", (self._max_id,)).fetchone()[0]
+        if live < self._index.ntotal:
+            kept = {row[0] for row in self._conn.execute("SELECT id FROM answers WHERE id <= ?", (self._max_id,))}
+            gone = [row_id for row_id in faiss.vector_to_array(self._index.id_map) if row_id not in kept]
+            self._index.remove_ids(np.asarray(gone, dtype=np.int64))
+
+        ids, vectors = [], []
+        for row_id, blob in self._conn.execute(
+            "SELECT id, embedding FROM answers WHERE id > ? ORDER BY id", (self._max_id,)
+        ):
+            ids.append(row_id)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        if ids:
+            self._index.add_with_ids(np.vstack(vectors), np.asarray(ids, dtype=np.int64))
+            self._max_id = ids[-1]
+
+    def _embed(self, query):
+        """Normalized float32 embedding of a query"""
+        return embed_texts([query], self._model_name)
+
+    def lookup(self, query, search_type="General", time_filter="Any time", language="English",
+               search_depth="Standard"):
+        """Return the most similar fresh answer above the threshold with the same settings, or None
+
+        Among equally similar answers (the same query answered again, e.g. by
+        the prefetcher) the newest wins.
+        """
+        vector = self._embed(query)
+        oldest = time.time() - max_age(search_type, time_filter)
+        with self._lock:
+            self._sync_index()
+            if self._index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = self._index.search(vector, min(SEARCH_CANDIDATES, self._index.ntotal))
+            candidates = [
+                (float(score), int(row_id)) for score, row_id in zip(scores[0], ids[0])
+                if row_id != -1 and score >= self.threshold
+            ]
+            best = None
+            for score, row_id in candidates:
+                row = self._conn.execute(
+                    "SELECT query, response, model, created FROM answers "
+                    "WHERE id = ? AND search_type = ? AND language = ? AND search_depth = ? AND time_filter = ? "
+                    "AND created >= ?",
+                    (row_id, search_type, language, search_depth, time_filter, oldest)
+                ).fetchone()
+                if row is not None and (best is None or (round(score, 4), row[3]) > best[0]):
+                    best = ((round(score, 4), row[3]), score, row)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            _, score, row = best
+            return {
+                "query": row[0],
+                "response": row[1],
+                "model": row[2],
+                "created": row[3],
+                "similarity": score
+            }
+
+    def add(self, query, response, search_type="General", model=None, time_filter="Any time", language="English",
+            search_depth="Standard"):
+        """Store a final answer for future similar questions asked with the same settings"""
+        vector = self._embed(query)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (query, search_type, response, model, embedding, created, "
+                "language, search_depth, time_filter) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (query, search_type, response, model, vector.tobytes(), time.time(),
+                 language, search_depth, time_filter)
+            )
+            self._conn.commit()
+            self._sync_index()
+
+    def prune(self, older_than=max(TIME_FILTER_MAX_AGE.values())):
+        """Delete answers too old to be served under any setting"""
+        cutoff = time.time() - older_than
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM answers WHERE created < ?", (cutoff,))]
+            if not ids:
+                return 0
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (cutoff,))
+            self._conn.commit()
+            self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+            return len(ids)
+
+    def stats(self):
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            return {"entries": self._index.ntotal, "hits": self.hits, "misses": self.misses}
@@ -1,24 +1,26 @@
 import streamlit as st
-from langchain_groq import ChatGroq
 from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
 from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain import hub
 from langchain.callbacks import StreamlitCallbackHandler
+from agent_factory import get_agent_executor
+from llm_pool import get_llm_pool
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-## Arxiv and Wikipedia Tools
-arxiv_wrapper = ArxivAPIWrapper(top_k_results=1, doc_content_chars_max=200)
-arxiv = ArxivQueryRun(api_wrapper=arxiv_wrapper)
+## Arxiv and Wikipedia Tools, built once per process rather than on every rerun
+@st.cache_resource
+def load_tools():
+    arxiv_wrapper = ArxivAPIWrapper(top_k_results=1, doc_content_chars_max=200)
+    arxiv = ArxivQueryRun(api_wrapper=arxiv_wrapper)
 
-api_wrapper = WikipediaAPIWrapper(top_k_results=1, doc_content_chars_max=200)
-wiki = WikipediaQueryRun(api_wrapper=api_wrapper)
+    api_wrapper = WikipediaAPIWrapper(top_k_results=1, doc_content_chars_max=200)
+    wiki = WikipediaQueryRun(api_wrapper=api_wrapper)
 
-search = DuckDuckGoSearchRun(name="Search")
+    search = DuckDuckGoSearchRun(name="Search")
+    return [search, arxiv, wiki]
 
 st.title("🔎 LangChain - Chat with search")
 """
@@ -43,22 +45,11 @@ if prompt := st.chat_input(placeholder="What is machine learning?"):
     st.chat_message("user").write(prompt)
 
     if api_key:
-        llm = ChatGroq(groq_api_key=api_key, model_name="llama3-8b-8192", streaming=True)
-        tools = [search, arxiv, wiki]
+        llm = get_llm_pool().get(api_key, "llama3-8b-8192", streaming=True)
+        tools = load_tools()
 
-        # Get the React prompt template
-        react_prompt = hub.pull("hwchase17/react")
-        
-        # Create the React agent
-        agent = create_react_agent(llm, tools, react_prompt)
-        
-        # Create the agent executor
-        agent_executor = AgentExecutor(
-            agent=agent, 
-            tools=tools, 
-            verbose=True,
-            handle_parsing_errors=True,
-        )
+        # Reuse the cached React agent executor (prompt is pulled from the hub only once)
+        agent_executor = get_agent_executor(llm, "llama3-8b-8192", tools)
 
         with st.chat_message("assistant"):
             st_cb = StreamlitCallbackHandler(st.container(), expand_new_thoughts=False)
@@ -1,16 +1,21 @@
 import streamlit as st
-from langchain_groq import ChatGroq
-from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
-from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain import hub
-from langchain.callbacks import StreamlitCallbackHandler
+from analytics import get_analytics
+from budgets import MODEL_OPTIONS, QUICK_SUGGESTIONS
+from chat_view import lazy_expander, render_chat, reset_history_view
+from conversation import get_conversation_store
+from history_store import get_history_store, new_session_state
+from prefetch import HOT_QUERY_SUGGESTIONS, hot_queries, start_prefetcher
+from query_router import get_route_stats
+from search_client import SEARCH_SERVICE_URL, fetch_analytics, run_remote_query
+from warmup import get_warmup, start_warmup
 import os
+import sys
 import time
 import json
 from datetime import datetime
-import plotly.express as px
-import pandas as pd
+
+# LangChain, Groq, the search tools and plotly are imported on first use, so
+# the first page paints without waiting for them (see load_search_engine)
 
 # Page configuration
 st.set_page_config(
@@ -148,28 +153,16 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "search_count" not in st.session_state:
-    st.session_state.search_count = 0
-if "search_history" not in st.session_state:
-    st.session_state.search_history = []
-if "favorite_searches" not in st.session_state:
-    st.session_state.favorite_searches = []
-if "response_times" not in st.session_state:
-    st.session_state.response_times = []
+# Session state is bounded (last few messages, fixed-size timing arrays);
+# the full chat, searches and saved responses live in the history store
+if "session_id" not in st.session_state:
+    for key, value in new_session_state().items():
+        st.session_state[key] = value
+history = get_history_store()
 
-# Session cleanup to prevent memory issues
-def cleanup_session():
-    """Clean up session state to prevent memory accumulation"""
-    if len(st.session_state.messages) > 50:  # Keep only last 50 messages
-        st.session_state.messages = st.session_state.messages[-50:]
-    
-    if len(st.session_state.search_history) > 100:  # Keep only last 100 searches
-        st.session_state.search_history = st.session_state.search_history[-100:]
-    
-    if len(st.session_state.response_times) > 100:  # Keep only last 100 response times
-        st.session_state.response_times = st.session_state.response_times[-100:]
+def add_message(message):
+    """Store a chat message and keep it in the session's ring buffer"""
+    st.session_state.messages.append(history.add_message(st.session_state.session_id, message))
 
 # Get API key from secrets or user input
 def get_default_api_key():
@@ -179,53 +172,26 @@ def get_default_api_key():
     except:
         return ""
 
-# Tools setup with error handling
-@st.cache_resource
-def setup_tools():
-    """Setup tools with proper error handling"""
-    try:
-        arxiv_wrapper = ArxivAPIWrapper(top_k_results=3, doc_content_chars_max=500)
-        arxiv = ArxivQueryRun(api_wrapper=arxiv_wrapper)
-        
-        wiki_wrapper = WikipediaAPIWrapper(top_k_results=2, doc_content_chars_max=500)
-        wiki = WikipediaQueryRun(api_wrapper=wiki_wrapper)
-        
-        search = DuckDuckGoSearchRun(name="WebSearch")
-        
-        return [search, arxiv, wiki]
-    except Exception as e:
-        st.error(f"Error initializing search tools: {str(e)}")
-        return []
-
-tools = setup_tools()
+# Search engine import and tools setup, run once per process in a background
+# thread started after the first render; the first query waits for it
+def load_search_engine():
+    """Import the LLM and search stack and build the shared tools"""
+    import engine
+    return engine.setup_tools()
 
-# Create LLM with retry logic
-def create_llm_with_retry(api_key, model_name, max_retries=3):
-    """Create LLM with retry logic and timeout"""
-    for attempt in range(max_retries):
-        try:
-            return ChatGroq(
-                groq_api_key=api_key,
-                model_name=model_name,
-                streaming=True,
-                temperature=0.1,
-                timeout=30
-            )
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise e
-            time.sleep(1)
+# With a search service configured the tools live in its worker processes
+search_engine = None if SEARCH_SERVICE_URL else get_warmup("search_engine")
 
-# Memory usage check
-def check_memory_usage():
-    """Simple memory usage check"""
-    total_messages = len(st.session_state.get('messages', []))
-    total_history = len(st.session_state.get('search_history', []))
-    
-    if total_messages > 100 or total_history > 200:
-        st.warning("⚠️ Session data is getting large. Consider clearing history.")
-        return True
-    return False
+# Render the answer card, with a cursor while tokens are still streaming in
+def render_response_card(placeholder, text, streaming=False):
+    """Render the search result card into a placeholder"""
+    cursor = "▌" if streaming else ""
+    placeholder.markdown(f"""
+    <div class="response-card">
+        <h4>🎯 Search Results</h4>
+        <p>{text}{cursor}</p>
+    </div>
+    """, unsafe_allow_html=True)
 
 # Header
 st.markdown("""
@@ -254,11 +220,7 @@ with st.sidebar:
     )
     
     # Model Selection
-    model_options = {
-        "Llama3-8B (Fast)": "llama3-8b-8192",
-        "Llama3-70B (Powerful)": "llama3-70b-8192",
-        "Mixtral-8x7B (Balanced)": "mixtral-8x7b-32768"
-    }
+    model_options = MODEL_OPTIONS
     selected_model = st.selectbox("🤖 Select AI Model:", list(model_options.keys()))
     
     # Search Settings
@@ -273,22 +235,41 @@ with st.sidebar:
     with col1:
         st.metric("Total Searches", st.session_state.search_count)
     with col2:
-        avg_time = sum(st.session_state.response_times) / len(st.session_state.response_times) if st.session_state.response_times else 0
-        st.metric("Avg Response Time", f"{avg_time:.1f}s")
+        st.metric("Avg Response Time", f"{st.session_state.response_times.mean():.1f}s")
+    st.metric("Avg Time to First Token", f"{st.session_state.first_token_times.mean():.1f}s")
+    if not SEARCH_SERVICE_URL and "engine" in sys.modules:
+        # Requests of all sessions in this process waiting for a Groq/search API
+        # rate limit (nothing can be waiting before the search engine is loaded)
+        from rate_limit import get_scheduler
+        upstream_stats = get_scheduler().stats()
+        queued = sum(upstream["queue_depth"] for upstream in upstream_stats.values())
+        throttled = sum(upstream["throttled"] for upstream in upstream_stats.values())
+        st.metric("Requests Waiting on Rate Limits", queued, help=f"{throttled} throttled (429) responses so far")
+
+        # Share of queries answered by one direct lookup instead of the agent loop
+        route_stats = get_route_stats().stats()
+        if route_stats["total"]:
+            st.caption("Query paths: " + ", ".join(
+                f"{path} {info['fraction']:.0%}"
+                for path, info in route_stats["paths"].items() if info["queries"]
+            ))
     
     # Quick Actions
     st.subheader("⚡ Quick Actions")
     if st.button("🗑️ Clear Chat History"):
-        st.session_state.messages = []
-        st.session_state.search_history = []
-        st.session_state.response_times = []
+        history.clear(st.session_state.session_id)
+        get_conversation_store().clear(st.session_state.session_id)
+        st.session_state.messages.clear()
+        st.session_state.response_times.clear()
+        st.session_state.first_token_times.clear()
         st.session_state.search_count = 0
+        reset_history_view()
         st.rerun()
     
     if st.button("📥 Export Chat"):
         chat_data = {
             "timestamp": datetime.now().isoformat(),
-            "messages": st.session_state.messages,
+            "messages": history.export(st.session_state.session_id),
             "search_count": st.session_state.search_count
         }
         st.download_button(
@@ -297,13 +278,6 @@ with st.sidebar:
             file_name=f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
             mime="application/json"
         )
-    
-    # Memory usage warning
-    if check_memory_usage():
-        if st.button("🧹 Clean Session Data"):
-            cleanup_session()
-            st.success("Session data cleaned!")
-            st.rerun()
 
 # Main content area
 col1, col2 = st.columns([3, 1])
@@ -312,15 +286,11 @@ with col1:
     # Search Interface
     st.subheader("🔍 Search Interface")
     
-    # Quick search suggestions
+    # Quick search suggestions: the defaults, or (if opted in) the queries most
+    # sessions searched, whose answers the prefetcher keeps warm, topped up with the defaults
     st.markdown("**💡 Quick Suggestions:**")
-    suggestion_cols = st.columns(4)
-    suggestions = [
-        "Latest AI research",
-        "Climate change solutions",
-        "Quantum computing basics",
-        "Space exploration news"
-    ]
+    suggestions = hot_queries(len(QUICK_SUGGESTIONS)) if HOT_QUERY_SUGGESTIONS else list(QUICK_SUGGESTIONS)
+    suggestion_cols = st.columns(len(suggestions))
     
     for i, suggestion in enumerate(suggestions):
         if suggestion_cols[i].button(f"🔸 {suggestion}", key=f"suggest_{i}"):
@@ -353,12 +323,28 @@ with col2:
     
     # Dynamic tool status based on actual availability
     tool_status = {}
-    if tools:
+    if SEARCH_SERVICE_URL:
+        tool_status = {
+            "🌐 Web Search": "🛰️ Search service",
+            "📚 ArXiv Papers": "🛰️ Search service",
+            "📖 Wikipedia": "🛰️ Search service"
+        }
+    elif search_engine is None or not search_engine.ready:
+        tool_status = {
+            "🌐 Web Search": "⏳ Loading",
+            "📚 ArXiv Papers": "⏳ Loading",
+            "📖 Wikipedia": "⏳ Loading"
+        }
+    elif search_engine.result:
         tool_status = {
             "🌐 Web Search": "✅ Ready",
             "📚 ArXiv Papers": "✅ Ready",
             "📖 Wikipedia": "✅ Ready"
         }
+        if any(tool.name == "local_memory" for tool in search_engine.result):
+            tool_status["🧠 Local Memory"] = "✅ Ready"
+        if any(tool.name == "document_search" for tool in search_engine.result):
+            tool_status["📂 Documents"] = "✅ Ready"
     else:
         tool_status = {
             "🌐 Web Search": "❌ Error",
@@ -377,34 +363,15 @@ with col2:
 # Chat Interface
 st.subheader("💬 AI Assistant")
 
-# Display chat messages
-for i, message in enumerate(st.session_state.messages):
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
-        
-        # Add action buttons for assistant messages
-        if message["role"] == "assistant" and i == len(st.session_state.messages) - 1:
-            col_btn1, col_btn2, col_btn3 = st.columns(3)
-            with col_btn1:
-                if st.button("👍 Helpful", key=f"helpful_{i}"):
-                    st.success("Thanks for the feedback!")
-            with col_btn2:
-                if st.button("💾 Save Response", key=f"save_{i}"):
-                    st.session_state.favorite_searches.append({
-                        "query": message.get("original_query", "Unknown"),
-                        "response": message["content"],
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    st.success("Response saved!")
-            with col_btn3:
-                if st.button("🔄 Regenerate", key=f"regen_{i}"):
-                    st.info("Regenerating response...")
+# Display chat messages: only the session's recent messages are drawn on each
+# rerun; earlier ones are paged in from the history store (see chat_view.py)
+render_chat(history, st.session_state.session_id, st.session_state.messages)
 
 # Process search query
 if search_query and api_key:
-    if search_query not in [msg.get("query", "") for msg in st.session_state.messages if msg["role"] == "user"]:
+    if not history.has_query(st.session_state.session_id, search_query):
         # Add user message
-        st.session_state.messages.append({
+        add_message({
             "role": "user",
             "content": search_query,
             "query": search_query,
@@ -422,116 +389,120 @@ if search_query and api_key:
             progress_bar = st.progress(0)
             status_text = st.empty()
             
+            # Agent thoughts render above the streamed answer
+            thoughts_container = st.container()
+            answer_placeholder = st.empty()
+            first_token_at = []
+            
+            def show_status(message, progress):
+                status_text.text(message)
+                progress_bar.progress(progress)
+            
+            def show_tokens(text):
+                if not first_token_at:
+                    first_token_at.append(time.time())
+                render_response_card(answer_placeholder, text, streaming=True)
+            
             try:
-                # Check if tools are available
-                if not tools:
-                    st.error("❌ Search tools are not properly initialized. Please refresh the page.")
-                    st.stop()
-                
-                # Initialize LLM
-                status_text.text("🤖 Initializing AI model...")
-                progress_bar.progress(20)
-                
-                llm = create_llm_with_retry(
-                    api_key, 
-                    model_options[selected_model]
-                )
-                
-                # Setup agent
-                status_text.text("🔧 Setting up search agent...")
-                progress_bar.progress(40)
-                
-                react_prompt = hub.pull("hwchase17/react")
-                agent = create_react_agent(llm, tools, react_prompt)
-                agent_executor = AgentExecutor(
-                    agent=agent,
-                    tools=tools,
-                    verbose=True,
-                    handle_parsing_errors=True,
-                    max_iterations=50
-                )
-                
-                # Execute search
-                status_text.text("🔍 Searching across multiple sources...")
-                progress_bar.progress(60)
-                
-                st_cb = StreamlitCallbackHandler(st.container(), expand_new_thoughts=True)
-                
-                # Enhanced prompt based on search settings
-                enhanced_query = f"""
-                Search Query: {search_query}
-                Search Type: {search_type}
-                Depth: {search_depth}
-                
-                Please provide a comprehensive answer with:
-                1. Key findings and main points
-                2. Multiple perspectives if applicable
-                3. Recent developments or updates
-                4. Reliable sources and citations
-                """
-                
-                progress_bar.progress(80)
-                
-                response = agent_executor.invoke(
-                    {"input": enhanced_query},
-                    {"callbacks": [st_cb]}
-                )
-                
-                progress_bar.progress(100)
-                status_text.text("✅ Search completed!")
+                if SEARCH_SERVICE_URL:
+                    # Headless search service runs the pipeline and streams events back
+                    result = run_remote_query(
+                        search_query,
+                        api_key,
+                        model_options[selected_model],
+                        search_depth=search_depth,
+                        search_type=search_type,
+                        time_filter=time_filter,
+                        max_results=max_results,
+                        language=language,
+                        on_token=show_tokens,
+                        on_status=show_status,
+                        session_id=st.session_state.session_id
+                    )
+                else:
+                    # Waits for the background warm-up (or starts it, if this
+                    # query came in before the first render finished)
+                    warmup = start_warmup("search_engine", load_search_engine)
+                    if not warmup.ready:
+                        show_status("📦 Loading search tools...", 5)
+                    tools = warmup.wait()
+                    
+                    # Check if tools are available
+                    if not tools:
+                        st.error("❌ Search tools are not properly initialized. Please refresh the page.")
+                        st.stop()
+                    
+                    from engine import run_query
+                    from langchain.callbacks import StreamlitCallbackHandler
+                    st_cb = StreamlitCallbackHandler(thoughts_container, expand_new_thoughts=True)
+                    result = run_query(
+                        search_query,
+                        api_key,
+                        model_options[selected_model],
+                        search_depth=search_depth,
+                        search_type=search_type,
+                        time_filter=time_filter,
+                        max_results=max_results,
+                        language=language,
+                        callbacks=[st_cb],
+                        on_token=show_tokens,
+                        on_status=show_status,
+                        session_id=st.session_state.session_id
+                    )
                 
                 # Calculate response time
                 end_time = time.time()
                 response_time = end_time - start_time
                 st.session_state.response_times.append(response_time)
                 
-                # Display response
-                final_response = response['output']
+                # Time until the first answer token was visible (whole answer if nothing streamed)
+                first_token_time = first_token_at[0] - start_time if first_token_at else response_time
+                st.session_state.first_token_times.append(first_token_time)
                 
-                st.markdown(f"""
-                <div class="response-card">
-                    <h4>🎯 Search Results</h4>
-                    <p>{final_response}</p>
-                </div>
-                """, unsafe_allow_html=True)
+                # Display response
+                final_response = result['output']
+                render_response_card(answer_placeholder, final_response)
+                if result.get("budget_exhausted"):
+                    st.caption(f"⏳ {search_depth} search budget reached - answer is based on the sources gathered so far")
                 
                 # Add metadata
                 st.markdown(f"""
                 <div class="search-stats">
                     ⏱️ Response Time: {response_time:.2f}s | 
+                    ⚡ First Token: {first_token_time:.2f}s | 
                     🤖 Model: {selected_model} | 
                     🔍 Sources: Web + ArXiv + Wikipedia
                 </div>
                 """, unsafe_allow_html=True)
                 
                 # Update session state
-                st.session_state.messages.append({
+                add_message({
                     "role": "assistant",
                     "content": final_response,
                     "response_time": response_time,
+                    "first_token_time": first_token_time,
                     "model": selected_model,
                     "original_query": search_query,
                     "timestamp": datetime.now().isoformat()
                 })
                 
                 st.session_state.search_count += 1
-                st.session_state.search_history.append({
-                    "query": search_query,
-                    "timestamp": datetime.now().isoformat(),
-                    "response_time": response_time
-                })
+                history.add_search(
+                    st.session_state.session_id,
+                    search_query,
+                    response_time,
+                    first_token_time,
+                    result.get("stages")
+                )
                 
                 # Clear progress indicators
                 progress_bar.empty()
                 status_text.empty()
                 
-                # Clean up session if needed
-                cleanup_session()
-                
             except Exception as e:
                 error_msg = f"❌ An error occurred: {str(e)}"
                 st.error(error_msg)
-                st.session_state.messages.append({
+                add_message({
                     "role": "assistant",
                     "content": f"Sorry, I encountered an error: {str(e)}",
                     "timestamp": datetime.now().isoformat(),
@@ -547,21 +518,40 @@ elif search_query and not api_key:
 elif not search_query and api_key:
     st.info("💡 Enter a search query above to get started!")
 
-# Analytics Dashboard
-if st.session_state.search_history:
-    with st.expander("📈 Analytics Dashboard"):
+# Analytics Dashboard: aggregates of every session, updated once per finished
+# query (see analytics.py), so drawing it does not depend on how many ran.
+# With a search service the queries are recorded there, not in this process.
+if SEARCH_SERVICE_URL:
+    try:
+        analytics = fetch_analytics()
+    except Exception:
+        analytics = None
+        st.caption("📈 Analytics Dashboard unavailable: the search service did not return its analytics")
+else:
+    analytics = get_analytics().snapshot()
+dashboard_open = False
+if analytics and analytics["queries"]:
+    dashboard, dashboard_open = lazy_expander("📈 Analytics Dashboard", key="analytics_dashboard")
+if dashboard_open:
+    # plotly is only imported once the dashboard is opened
+    import plotly.express as px
+    with dashboard:
+        latency = analytics["response_time"]
+        col_q, col_p50, col_p95, col_cached = st.columns(4)
+        col_q.metric("Searches (all sessions)", analytics["queries"])
+        col_p50.metric("p50 Response Time", f"{latency['p50'] or 0:.1f}s")
+        col_p95.metric("p95 Response Time", f"{latency['p95'] or 0:.1f}s")
+        col_cached.metric("Answered from Cache", f"{analytics['cached'] / analytics['queries']:.0%}")
+
         col1, col2 = st.columns(2)
         
         with col1:
-            # Response time chart
+            # This session's response times (fixed-size buffer)
             if len(st.session_state.response_times) > 1:
                 try:
-                    df_times = pd.DataFrame({
-                        'Search': range(1, len(st.session_state.response_times) + 1),
-                        'Response Time (s)': st.session_state.response_times
-                    })
-                    fig = px.line(df_times, x='Search', y='Response Time (s)', 
-                                title='Response Time Trend')
+                    response_times = st.session_state.response_times.values()
+                    fig = px.line(x=range(1, len(response_times) + 1), y=response_times,
+                                labels={'x': 'Search', 'y': 'Response Time (s)'}, title='Response Time Trend')
                     fig.update_layout(height=300)
                     st.plotly_chart(fig, use_container_width=True)
                 except Exception as e:
@@ -570,13 +560,40 @@ if st.session_state.search_history:
         with col2:
             # Search frequency by hour
             try:
-                hours = [datetime.fromisoformat(h['timestamp']).hour for h in st.session_state.search_history]
-                df_hours = pd.DataFrame({'Hour': hours})
-                fig2 = px.histogram(df_hours, x='Hour', title='Search Activity by Hour')
+                hours = analytics["by_hour_of_day"]
+                fig2 = px.bar(x=list(hours), y=list(hours.values()),
+                              labels={'x': 'Hour', 'y': 'Searches'}, title='Search Activity by Hour')
                 fig2.update_layout(height=300)
                 st.plotly_chart(fig2, use_container_width=True)
             except Exception as e:
                 st.error(f"Chart error: {str(e)}")
+        
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            # Per-stage breakdown from the LLM and tool spans of each query
+            stages = analytics["stage_averages"]
+            if stages:
+                try:
+                    fig3 = px.bar(x=list(stages), y=list(stages.values()),
+                                  labels={'x': 'Stage', 'y': 'Avg Time (s)'}, title='Average Time per Stage')
+                    fig3.update_layout(height=300)
+                    st.plotly_chart(fig3, use_container_width=True)
+                except Exception as e:
+                    st.error(f"Chart error: {str(e)}")
+        
+        with col4:
+            # Searches per model and calls per tool
+            usage = {f"🤖 {name}": count for name, count in analytics["models"].items()}
+            usage.update({f"🔧 {name}": count for name, count in analytics["tools"].items()})
+            if usage:
+                try:
+                    fig4 = px.bar(x=list(usage.values()), y=list(usage), orientation='h',
+                                  labels={'x': 'Count', 'y': ''}, title='Models and Tools Used')
+                    fig4.update_layout(height=300)
+                    st.plotly_chart(fig4, use_container_width=True)
+                except Exception as e:
+                    st.error(f"Chart error: {str(e)}")
 
 # Footer
 st.markdown("---")
@@ -585,4 +602,10 @@ st.markdown("""
     <p>🚀 AI Search Pro - Powered by LangChain & Groq | Built by Ansh Jha using Streamlit</p>
     <p><small>Ready for Streamlit Cloud Deployment</small></p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Load the search engine in the background now that the page has been drawn,
+# and keep answers to the hot queries fresh (with the app's own Groq key only)
+if not SEARCH_SERVICE_URL:
+    start_warmup("search_engine", load_search_engine)
+    start_prefetcher(get_default_api_key())
@@ -1,17 +1,16 @@
 import streamlit as st
-from langchain_groq import ChatGroq
-from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
-from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain import hub
-from langchain.callbacks import StreamlitCallbackHandler
+from analytics import get_analytics
+from chat_view import lazy_expander, render_chat, reset_history_view
+from history_store import get_history_store, new_session_state
+from warmup import start_warmup
 import os
 import time
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-import plotly.express as px
-import pandas as pd
+
+# LangChain, the search tools and plotly are imported on first use so the
+# first page paints without waiting for them
 
 # Load environment variables
 load_dotenv()
@@ -151,21 +150,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "search_count" not in st.session_state:
-    st.session_state.search_count = 0
-if "search_history" not in st.session_state:
-    st.session_state.search_history = []
-if "favorite_searches" not in st.session_state:
-    st.session_state.favorite_searches = []
-if "response_times" not in st.session_state:
-    st.session_state.response_times = []
+# Initialize session state (bounded; the full history lives in the history store)
+if "session_id" not in st.session_state:
+    for key, value in new_session_state().items():
+        st.session_state[key] = value
+history = get_history_store()
+
+def add_message(message):
+    """Store a chat message and keep it in the session's ring buffer"""
+    st.session_state.messages.append(history.add_message(st.session_state.session_id, message))
 
-# Tools setup
-@st.cache_resource
+# Tools setup, run once per process in a background thread started after the
+# first render; the first query waits for it
 def setup_tools():
+    from langchain_community.tools import ArxivQueryRun, DuckDuckGoSearchRun, WikipediaQueryRun
+    from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
+
+    from ingestion import get_document_index, get_document_tool
+    from tool_cache import wrap_tools
+
     arxiv_wrapper = ArxivAPIWrapper(top_k_results=3, doc_content_chars_max=500)
     arxiv = ArxivQueryRun(api_wrapper=arxiv_wrapper)
     
@@ -174,9 +177,14 @@ def setup_tools():
     
     search = DuckDuckGoSearchRun(name="WebSearch")
     
-    return [search, arxiv, wiki]
-
-tools = setup_tools()
+    # Serve repeated queries from the on-disk tool cache
+    tools = wrap_tools([search, arxiv, wiki])
+    
+    # Ingested knowledge base (see ingestion.py), only offered once it has documents
+    document_index = get_document_index()
+    if document_index is not None and document_index.count():
+        tools.append(get_document_tool(document_index))
+    return tools
 
 # Header
 st.markdown("""
@@ -218,19 +226,20 @@ with st.sidebar:
     with col1:
         st.metric("Total Searches", st.session_state.search_count)
     with col2:
-        avg_time = sum(st.session_state.response_times) / len(st.session_state.response_times) if st.session_state.response_times else 0
-        st.metric("Avg Response Time", f"{avg_time:.1f}s")
+        st.metric("Avg Response Time", f"{st.session_state.response_times.mean():.1f}s")
     
     # Quick Actions
     st.subheader("⚡ Quick Actions")
     if st.button("🗑️ Clear Chat History"):
-        st.session_state.messages = []
+        history.clear(st.session_state.session_id)
+        st.session_state.messages.clear()
+        reset_history_view()
         st.rerun()
     
     if st.button("📥 Export Chat"):
         chat_data = {
             "timestamp": datetime.now().isoformat(),
-            "messages": st.session_state.messages,
+            "messages": history.export(st.session_state.session_id),
             "search_count": st.session_state.search_count
         }
         st.download_button(
@@ -304,34 +313,15 @@ with col2:
 # Chat Interface
 st.subheader("💬 AI Assistant")
 
-# Display chat messages
-for i, message in enumerate(st.session_state.messages):
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
-        
-        # Add action buttons for assistant messages
-        if message["role"] == "assistant" and i == len(st.session_state.messages) - 1:
-            col_btn1, col_btn2, col_btn3 = st.columns(3)
-            with col_btn1:
-                if st.button("👍 Helpful", key=f"helpful_{i}"):
-                    st.success("Thanks for the feedback!")
-            with col_btn2:
-                if st.button("💾 Save Response", key=f"save_{i}"):
-                    st.session_state.favorite_searches.append({
-                        "query": search_query,
-                        "response": message["content"],
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    st.success("Response saved!")
-            with col_btn3:
-                if st.button("🔄 Regenerate", key=f"regen_{i}"):
-                    st.info("Regenerating response...")
+# Display chat messages: only the session's recent messages are drawn on each
+# rerun; earlier ones are paged in from the history store (see chat_view.py)
+render_chat(history, st.session_state.session_id, st.session_state.messages)
 
 # Process search query
 if search_query and api_key:
-    if search_query not in [msg.get("query", "") for msg in st.session_state.messages if msg["role"] == "user"]:
+    if not history.has_query(st.session_state.session_id, search_query):
         # Add user message
-        st.session_state.messages.append({
+        add_message({
             "role": "user",
             "content": search_query,
             "query": search_query,
@@ -350,28 +340,34 @@ if search_query and api_key:
             status_text = st.empty()
             
             try:
+                # Load tools and the LLM stack (already done by the warm-up unless this is the first query)
+                warmup = start_warmup("search_tools", setup_tools)
+                if not warmup.ready:
+                    status_text.text("📦 Loading search tools...")
+                tools = warmup.wait()
+                from langchain.callbacks import StreamlitCallbackHandler
+                from agent_factory import get_agent_executor
+                from llm_pool import get_llm_pool
+                
                 # Initialize LLM
                 status_text.text("🤖 Initializing AI model...")
                 progress_bar.progress(20)
                 
-                llm = ChatGroq(
-                    groq_api_key=api_key, 
-                    model_name=model_options[selected_model],
-                    streaming=True,
-                    temperature=0.1
+                llm = get_llm_pool().get(
+                    api_key,
+                    model_options[selected_model],
+                    temperature=0.1,
+                    streaming=True
                 )
                 
                 # Setup agent
                 status_text.text("🔧 Setting up search agent...")
                 progress_bar.progress(40)
                 
-                react_prompt = hub.pull("hwchase17/react")
-                agent = create_react_agent(llm, tools, react_prompt)
-                agent_executor = AgentExecutor(
-                    agent=agent,
-                    tools=tools,
-                    verbose=True,
-                    handle_parsing_errors=True,
+                agent_executor = get_agent_executor(
+                    llm,
+                    model_options[selected_model],
+                    tools,
                     max_iterations=5
                 )
                 
@@ -429,20 +425,18 @@ if search_query and api_key:
                 """, unsafe_allow_html=True)
                 
                 # Update session state
-                st.session_state.messages.append({
+                add_message({
                     "role": "assistant",
                     "content": final_response,
                     "response_time": response_time,
                     "model": selected_model,
+                    "original_query": search_query,
                     "timestamp": datetime.now().isoformat()
                 })
                 
                 st.session_state.search_count += 1
-                st.session_state.search_history.append({
-                    "query": search_query,
-                    "timestamp": datetime.now().isoformat(),
-                    "response_time": response_time
-                })
+                history.add_search(st.session_state.session_id, search_query, response_time)
+                get_analytics().record_query({"model": model_options[selected_model], "response_time": response_time})
                 
                 # Clear progress indicators
                 progress_bar.empty()
@@ -450,7 +444,8 @@ if search_query and api_key:
                 
             except Exception as e:
                 st.error(f"❌ An error occurred: {str(e)}")
-                st.session_state.messages.append({
+                get_analytics().record_error(model_options[selected_model])
+                add_message({
                     "role": "assistant",
                     "content": f"Sorry, I encountered an error: {str(e)}",
                     "timestamp": datetime.now().isoformat()
@@ -459,27 +454,35 @@ if search_query and api_key:
 elif search_query and not api_key:
     st.warning("🔑 Please enter your Groq API key in the sidebar to start searching!")
 
-# Analytics Dashboard
-if st.session_state.search_history:
-    with st.expander("📈 Analytics Dashboard"):
+# Analytics Dashboard (aggregates of all sessions, see analytics.py)
+analytics = get_analytics().snapshot()
+dashboard_open = False
+if analytics["queries"]:
+    dashboard, dashboard_open = lazy_expander("📈 Analytics Dashboard", key="analytics_dashboard")
+if dashboard_open:
+    import plotly.express as px
+    with dashboard:
+        latency = analytics["response_time"]
+        col_q, col_p50, col_p95 = st.columns(3)
+        col_q.metric("Searches (all sessions)", analytics["queries"])
+        col_p50.metric("p50 Response Time", f"{latency['p50'] or 0:.1f}s")
+        col_p95.metric("p95 Response Time", f"{latency['p95'] or 0:.1f}s")
+
         col1, col2 = st.columns(2)
         
         with col1:
             # Response time chart
             if len(st.session_state.response_times) > 1:
-                df_times = pd.DataFrame({
-                    'Search': range(1, len(st.session_state.response_times) + 1),
-                    'Response Time (s)': st.session_state.response_times
-                })
-                fig = px.line(df_times, x='Search', y='Response Time (s)', 
-                            title='Response Time Trend')
+                response_times = st.session_state.response_times.values()
+                fig = px.line(x=range(1, len(response_times) + 1), y=response_times,
+                            labels={'x': 'Search', 'y': 'Response Time (s)'}, title='Response Time Trend')
                 st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Search frequency by hour
-            hours = [datetime.fromisoformat(h['timestamp']).hour for h in st.session_state.search_history]
-            df_hours = pd.DataFrame({'Hour': hours})
-            fig2 = px.histogram(df_hours, x='Hour', title='Search Activity by Hour')
+            hours = analytics["by_hour_of_day"]
+            fig2 = px.bar(x=list(hours), y=list(hours.values()),
+                          labels={'x': 'Hour', 'y': 'Searches'}, title='Search Activity by Hour')
             st.plotly_chart(fig2, use_container_width=True)
 
 # Footer
@@ -488,4 +491,7 @@ st.markdown("""
 <div style="text-align: center; color: #666;">
     <p>🚀 AI Search Pro - Powered by LangChain & Groq | Built by Ansh Jha using Streamlit</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Build the search tools in the background now that the page has been drawn
+start_warmup("search_tools", setup_tools)
@@ -0,0 +1,262 @@
+import asyncio
+import html
+import re
+import threading
+import weakref
+import xml.etree.ElementTree as ET
+from abc import abstractmethod
+from typing import Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+from budgets import LANGUAGES, TIME_LIMITS
+from rate_limit import AsyncRateLimitedTransport, RateLimitedTransport
+
+# One connection pool per process (sync) and per event loop (async)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_HEADERS = {"User-Agent": "ai-search-pro/1.0 (https://github.com/anshjhagithub/AI-_Seach_Engine)"}
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_MAX_QUERY_LENGTH = 300
+WIKIPEDIA_API_URL = "https://{lang}.wikipedia.org/w/api.php"
+DUCKDUCKGO_HTML_URL = "https://html.duckduckgo.com/html/"
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_ARXIV_ID_RE = re.compile(r"^\s*(\d{4}\.\d{4,5}(v\d+)?|[a-z\-]+(\.[A-Z]{2})?/\d{7}(v\d+)?)\s*$")
+# Organic results of the HTML endpoint; ads carry "result--ad" on the same block
+_DDG_RESULT_RE = re.compile(r'<div class="(result\b[^"]*)"')
+_DDG_SNIPPET_RE = re.compile(r'class="result__snippet"[^>]*>(.*?)</a>', re.DOTALL)
+_DDG_NO_RESULTS = 'class="no-results"'
+_TAG_RE = re.compile(r"<[^>]+>")
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Process-wide pooled client for the sync tool path, rate limited per upstream host"""
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(
+                transport=RateLimitedTransport(transport=httpx.HTTPTransport(limits=HTTP_LIMITS)),
+                timeout=HTTP_TIMEOUT,
+                headers=HTTP_HEADERS,
+                follow_redirects=True
+            )
+        return _sync_client
+
+
+def get_async_client():
+    """Pooled async client of the running event loop (clients cannot move between loops)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=AsyncRateLimitedTransport(transport=httpx.AsyncHTTPTransport(limits=HTTP_LIMITS)),
+                timeout=HTTP_TIMEOUT,
+                headers=HTTP_HEADERS,
+                follow_redirects=True
+            )
+            _async_clients[loop] = client
+        return client
+
+
+async def aclose_async_client():
+    """Close the running loop's client, e.g. on server shutdown"""
+    with _lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _clean(text):
+    return " ".join(html.unescape(_TAG_RE.sub("", text or "")).split())
+
+
+class HTTPSearchTool(BaseTool):
+    """Search tool whose sync and async paths share one request and one parser
+
+    ``_run`` goes through the process-wide httpx.Client and ``_arun`` through
+    the event loop's httpx.AsyncClient, so an async agent run never holds a
+    thread while it waits on the network.
+    """
+
+    top_k_results: int = 3
+    doc_content_chars_max: int = 4000
+
+    @abstractmethod
+    def _request(self, query):
+        """(method, url, request kwargs) for a query"""
+
+    @abstractmethod
+    def _parse(self, response):
+        """Tool output from a successful response"""
+
+    def _error(self, error):
+        """Tool output for a failed request, an observation the agent can act on"""
+        return f"{self.name} exception: {error}"
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        method, url, kwargs = self._request(query)
+        try:
+            response = get_http_client().request(method, url, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return self._error(e)
+        return self._parse(response)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        method, url, kwargs = self._request(query)
+        try:
+            response = await get_async_client().request(method, url, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return self._error(e)
+        return self._parse(response)
+
+
+class ArxivSearchTool(HTTPSearchTool):
+    """ArXiv search over the export API, same output as ArxivQueryRun"""
+
+    name: str = "arxiv"
+    description: str = (
+        "A wrapper around Arxiv.org "
+        "Useful for when you need to answer questions about Physics, Mathematics, "
+        "Computer Science, Quantitative Biology, Quantitative Finance, Statistics, "
+        "Electrical Engineering, and Economics "
+        "from scientific articles on arxiv.org. "
+        "Input should be a search query."
+    )
+
+    def _request(self, query):
+        query = query[:ARXIV_MAX_QUERY_LENGTH]
+        if _ARXIV_ID_RE.match(query):
+            params = {"id_list": query.strip(), "max_results": self.top_k_results}
+        else:
+            params = {"search_query": f"all:{query}", "max_results": self.top_k_results}
+        return "GET", ARXIV_API_URL, {"params": params}
+
+    def _parse(self, response):
+        try:
+            root = ET.fromstring(response.text)
+        except ET.ParseError as e:
+            return f"Arxiv exception: {e}"
+        docs = []
+        for entry in root.findall(f"{_ATOM}entry"):
+            title = _clean(entry.findtext(f"{_ATOM}title"))
+            if not title or title == "Error":
+                continue
+            authors = ", ".join(_clean(author.findtext(f"{_ATOM}name")) for author in entry.findall(f"{_ATOM}author"))
+            docs.append(
+                f"Published: {(entry.findtext(f'{_ATOM}published') or '')[:10]}\n"
+                f"Title: {title}\n"
+                f"Authors: {authors}\n"
+                f"Summary: {_clean(entry.findtext(f'{_ATOM}summary'))}"
+            )
+        if not docs:
+            return "No good Arxiv Result was found"
+        return "\n\n".join(docs)[:self.doc_content_chars_max]
+
+    def _error(self, error):
+        return f"Arxiv exception: {error}"
+
+
+class WikipediaSearchTool(HTTPSearchTool):
+    """Wikipedia search plus page intros in one API call, same output as WikipediaQueryRun"""
+
+    name: str = "wikipedia"
+    description: str = (
+        "A wrapper around Wikipedia. "
+        "Useful for when you need to answer general questions about "
+        "people, places, companies, facts, historical events, or other subjects. "
+        "Input should be a search query."
+    )
+    lang: str = "en"
+
+    def _request(self, query):
+        params = {
+            "action": "query",
+            "format": "json",
+            "generator": "search",
+            "gsrsearch": query[:300],
+            "gsrlimit": self.top_k_results,
+            "prop": "extracts",
+            "exintro": 1,
+            "explaintext": 1,
+            "exlimit": self.top_k_results
+        }
+        return "GET", WIKIPEDIA_API_URL.format(lang=self.lang), {"params": params}
+
+    def _parse(self, response):
+        pages = sorted(
+            (response.json().get("query") or {}).get("pages", {}).values(),
+            key=lambda page: page.get("index", 0)
+        )
+        summaries = [
+            f"Page: {page['title']}\nSummary: {page['extract'].strip()}"
+            for page in pages if page.get("extract")
+        ]
+        if not summaries:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(summaries)[:self.doc_content_chars_max]
+
+    def _error(self, error):
+        return f"Wikipedia exception: {error}"
+
+
+class WebSearchTool(HTTPSearchTool):
+    """DuckDuckGo web search over the HTML endpoint, same output as DuckDuckGoSearchRun"""
+
+    name: str = "WebSearch"
+    description: str = (
+        "A wrapper around DuckDuckGo Search. "
+        "Useful for when you need to answer questions about current events. "
+        "Input should be a search query."
+    )
+    region: str = "wt-wt"
+    time: Optional[str] = None
+
+    def _request(self, query):
+        data = {"q": query, "kl": self.region}
+        if self.time:
+            data["df"] = self.time
+        return "POST", DUCKDUCKGO_HTML_URL, {"data": data}
+
+    def _parse(self, response):
+        text = response.text
+        results = list(_DDG_RESULT_RE.finditer(text))
+        ends = [result.start() for result in results[1:]] + [len(text)]
+        snippets = []
+        for result, end in zip(results, ends):
+            match = _DDG_SNIPPET_RE.search(text, result.end(), end)
+            if "result--ad" in result.group(1) or not match or not _clean(match.group(1)):
+                continue
+            snippets.append(_clean(match.group(1)))
+            if len(snippets) == self.top_k_results:
+                break
+        if snippets:
+            return " ".join(snippets)
+        if _DDG_NO_RESULTS in response.text:
+            return "No good DuckDuckGo Search Result was found"
+        # Neither results nor the no-results notice: a changed page layout or a
+        # bot check, which must not pass for an empty search
+        return self._error("unrecognized results page")
+
+    def _error(self, error):
+        return f"DuckDuckGo exception: {error}"
+
+
+def build_search_tools(max_results=3, doc_chars=500, language="English", time_filter="Any time"):
+    """WebSearch, arxiv and wikipedia tools with native async support"""
+    locale = LANGUAGES.get(language, LANGUAGES["English"])
+    return [
+        WebSearchTool(top_k_results=max_results, region=locale["region"], time=TIME_LIMITS.get(time_filter)),
+        ArxivSearchTool(top_k_results=max_results, doc_content_chars_max=doc_chars),
+        WikipediaSearchTool(top_k_results=max_results, doc_content_chars_max=doc_chars, lang=locale["wiki_lang"])
+    ]
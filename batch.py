@@ -0,0 +1,210 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from budgets import MODEL_OPTIONS
+from engine import run_query
+from query_router import get_route_stats
+from rate_limit import PRIORITY_BATCH, get_scheduler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama3-8b-8192"
+
+
+def resolve_model(name):
+    """Accept either a sidebar label ("Llama3-70B (Powerful)") or a Groq model id"""
+    return MODEL_OPTIONS.get(name, name) if name else DEFAULT_MODEL
+
+
+def read_queries(path):
+    """Yield (query_id, row) for every query in a JSONL file
+
+    Lines need ``query`` (or ``title``, so requests.jsonl works as input) and
+    may carry ``id``, ``model``, ``search_depth``, ``search_type``,
+    ``time_filter``, ``max_results`` and ``language``. Lines without an id are
+    keyed by their line number, which stays stable as long as the input file
+    is only appended to.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping malformed line %d", line_number)
+                continue
+            query = row.get("query") or row.get("title")
+            if not query:
+                continue
+            query_id = str(row.get("id") or row.get("request_id") or f"line-{line_number}")
+            yield query_id, dict(row, query=query)
+
+
+def load_checkpoint(path, retry_errors=False):
+    """Ids already written to the output file
+
+    A line cut off by a crash is ignored, so that query simply runs again.
+    Failed queries count as done unless retry_errors is set.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if retry_errors and row.get("error"):
+                continue
+            done.add(row.get("id"))
+    return done
+
+
+class ResultWriter:
+    """Append one JSON line per finished query and flush it to disk immediately"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        # Terminate a line cut off by a crash so the next result starts cleanly
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def write(self, row):
+        line = json.dumps(row, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_one(query_id, row, args):
+    """Run one query through the engine; errors are returned, never raised"""
+    start = time.perf_counter()
+    try:
+        result = run_query(
+            row["query"],
+            args.api_key,
+            resolve_model(row.get("model") or args.model),
+            search_depth=row.get("search_depth") or args.depth,
+            search_type=row.get("search_type") or args.search_type,
+            time_filter=row.get("time_filter") or args.time_filter,
+            max_results=row.get("max_results"),
+            language=row.get("language") or args.language,
+            use_answer_cache=not args.no_answer_cache,
+            priority=PRIORITY_BATCH,
+            record_analytics=False
+        )
+        return dict(result, id=query_id, error=None)
+    except Exception as e:
+        return {
+            "id": query_id,
+            "query": row["query"],
+            "output": None,
+            "error": f"{type(e).__name__}: {e}",
+            "response_time": time.perf_counter() - start
+        }
+
+
+def run_batch(args):
+    done = load_checkpoint(args.output, args.retry_errors)
+    writer = ResultWriter(args.output)
+    counts = {"done": 0, "errors": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    def record(future):
+        row = future.result()
+        writer.write(row)
+        counts["done"] += 1
+        if row.get("error"):
+            counts["errors"] += 1
+        if counts["done"] % args.progress_every == 0:
+            elapsed = time.perf_counter() - start
+            queued = sum(upstream["queue_depth"] for upstream in get_scheduler().stats().values())
+            print(
+                f"{counts['done']} done ({counts['errors']} errors, {counts['skipped']} skipped), "
+                f"{counts['done'] / elapsed:.2f} q/s, {queued} requests waiting on rate limits",
+                file=sys.stderr
+            )
+
+    # Only a bounded number of queries is in flight, so a 10k-line input is
+    # never held in memory as futures and an interrupt loses little work
+    pending = set()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="batch") as pool:
+            try:
+                for query_id, row in read_queries(args.input):
+                    if query_id in done:
+                        counts["skipped"] += 1
+                        continue
+                    done.add(query_id)  # Guard against duplicate ids inside the input
+                    pending.add(pool.submit(run_one, query_id, row, args))
+                    if len(pending) >= args.concurrency * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            record(future)
+            except KeyboardInterrupt:
+                print("Interrupted; finishing queries in flight. Re-run the same command to resume", file=sys.stderr)
+            for future in wait(pending).done:
+                record(future)
+    finally:
+        writer.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the search pipeline")
+    parser.add_argument("input", help="JSONL file with one query per line")
+    parser.add_argument("--output", default="batch_output.jsonl", help="JSONL results; also the resume checkpoint")
+    parser.add_argument("--api-key", default=os.getenv("GROQ_API_KEY"), help="Groq API key (default: $GROQ_API_KEY)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Default model for lines without one")
+    parser.add_argument("--depth", default="Standard", choices=["Quick", "Standard", "Deep"])
+    parser.add_argument("--search-type", default="General")
+    parser.add_argument("--time-filter", default="Any time")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run queries that failed in a previous run")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Always run the agent")
+    parser.add_argument("--progress-every", type=int, default=10)
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("a Groq API key is required (--api-key or GROQ_API_KEY)")
+
+    logging.basicConfig(level=logging.WARNING)
+    counts = run_batch(args)
+    print(
+        f"Finished: {counts['done']} run, {counts['errors']} errors, {counts['skipped']} already done; "
+        f"results in {args.output}"
+    )
+    routes = get_route_stats().stats()
+    if routes["total"]:
+        print("Query paths: " + ", ".join(
+            f"{path} {info['queries']} ({info['fraction']:.0%})"
+            for path, info in routes["paths"].items() if info["queries"]
+        ) + f"; {routes['direct_fallbacks']} direct lookups fell back to the agent")
+
+
+if __name__ == "__main__":
+    main()
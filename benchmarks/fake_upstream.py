@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import (  # noqa: E402
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RateLimitedTransport,
+    get_scheduler,
+    request_priority
+)
+
+
+class FakeUpstream:
+    """Local HTTP server that allows ``rate`` requests per second and answers 429 beyond that"""
+
+    def __init__(self, rate, retry_after=1, error_rate=0.0):
+        self.rate = rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {"ok": 0, "429": 0, "503": 0}
+
+    def respond(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            total = sum(self.counts.values()) + 1
+            if self.error_rate and total % max(1, round(1 / self.error_rate)) == 0:
+                self.counts["503"] += 1
+                return 503, {}
+            if self.window_count > self.rate:
+                self.counts["429"] += 1
+                return 429, {"Retry-After": str(self.retry_after)}
+            self.counts["ok"] += 1
+            return 200, {}
+
+    def serve(self, port=0):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers = upstream.respond()
+                body = json.dumps({"status": status}).encode("utf-8")
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the rate limit scheduler against a local server that returns 429s")
+    parser.add_argument("--server-rate", type=float, default=5, help="Requests per second the fake server accepts")
+    parser.add_argument("--client-rate", type=float, default=4, help="Token bucket rate for the fake upstream")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--interactive", type=int, default=20, help="Interactive requests")
+    parser.add_argument("--batch", type=int, default=60, help="Batch requests, queued first")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--no-limit", action="store_true", help="Send without the scheduler, for comparison")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(args.server_rate, error_rate=args.error_rate)
+    server = upstream.serve()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    os.environ["RATE_LIMIT_FAKE"] = f"{args.client_rate},{args.burst}"
+    transport = httpx.HTTPTransport() if args.no_limit else RateLimitedTransport("fake")
+    client = httpx.Client(transport=transport, timeout=60)
+
+    def send(priority):
+        start = time.perf_counter()
+        with request_priority(priority):
+            status = client.get(url).status_code
+        return priority, status, time.perf_counter() - start
+
+    # Batch work is queued first; interactive requests arrive right behind it
+    # and should still finish first
+    work = [PRIORITY_BATCH] * args.batch + [PRIORITY_INTERACTIVE] * args.interactive
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, work))
+    wall = time.perf_counter() - start
+    server.shutdown()
+
+    report = {"wall_seconds": round(wall, 2), "server_responses": upstream.counts}
+    for name, priority in (("interactive", PRIORITY_INTERACTIVE), ("batch", PRIORITY_BATCH)):
+        latencies = [latency for p, _, latency in results if p == priority]
+        report[name] = {
+            "ok": sum(1 for p, status, _ in results if p == priority and status == 200),
+            "failed": sum(1 for p, status, _ in results if p == priority and status != 200),
+            "latency_p50": statistics.median(latencies) if latencies else None,
+            "latency_p95": statistics.quantiles(latencies, n=20)[18] if len(latencies) > 1 else None
+        }
+    if not args.no_limit:
+        report["scheduler"] = get_scheduler().stats().get("fake")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
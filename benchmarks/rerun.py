@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The apps' history and analytics stores are process-wide, so point them at
+# scratch files before anything imports them
+_scratch = tempfile.mkdtemp(prefix="rerun-bench-")
+os.environ["HISTORY_DB_PATH"] = os.path.join(_scratch, "history.sqlite3")
+os.environ["ANALYTICS_DB_PATH"] = os.path.join(_scratch, "analytics.sqlite3")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from history_store import SESSION_MESSAGES, get_history_store  # noqa: E402
+
+SESSION_PREFIX = "bench"
+
+
+def chat_page():
+    """Chat section of the apps; RERUN_BENCH_MODE picks incremental rendering or the old full replay"""
+    import os
+    from collections import deque
+
+    import streamlit as st
+
+    from chat_view import render_chat, render_message
+    from history_store import SESSION_MESSAGES, get_history_store
+
+    history = get_history_store()
+    session_id = os.environ["RERUN_BENCH_SESSION"]
+    if "messages" not in st.session_state:
+        st.session_state.messages = deque(history.messages(session_id, limit=SESSION_MESSAGES), maxlen=SESSION_MESSAGES)
+
+    # An unrelated widget, like the sidebar's max_results slider
+    st.slider("Max Results per Tool:", 1, 5, 3, key="max_results")
+
+    if os.environ["RERUN_BENCH_MODE"] == "replay":
+        for message in history.export(session_id):
+            render_message(message)
+    else:
+        render_chat(history, session_id, st.session_state.messages)
+
+
+def fill(history, session_id, size):
+    for i in range(size):
+        history.add_message(session_id, {"role": "user", "content": f"Question {i}", "query": f"Question {i}"})
+        history.add_message(session_id, {"role": "assistant", "content": f"Answer {i}. " + "Evidence text. " * 20})
+
+
+def measure(session_id, mode, reruns):
+    """Seconds per rerun triggered by moving the slider, after the first run"""
+    os.environ["RERUN_BENCH_SESSION"] = session_id
+    os.environ["RERUN_BENCH_MODE"] = mode
+    app = AppTest.from_function(chat_page, default_timeout=120)
+    app.run()
+    timings = []
+    for i in range(reruns):
+        start = time.perf_counter()
+        app.slider(key="max_results").set_value(1 + i % 5).run()
+        timings.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Streamlit reruns of the chat as its history grows")
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma-separated question/answer pairs in the history")
+    parser.add_argument("--reruns", type=int, default=10, help="Reruns timed per size")
+    parser.add_argument("--modes", default="incremental,replay", help="incremental (chat_view) and/or replay (every message)")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    history = get_history_store()
+    results = []
+    for size in [int(size) for size in args.sizes.split(",") if size]:
+        session_id = f"{SESSION_PREFIX}-{size}"
+        fill(history, session_id, size)
+        for mode in args.modes.split(","):
+            timings = measure(session_id, mode, args.reruns)
+            results.append({
+                "messages": size * 2,
+                "mode": mode,
+                "rerun_p50": statistics.median(timings),
+                "rerun_max": max(timings)
+            })
+            print(f"messages={size * 2:>6}  {mode:<11}  p50={results[-1]['rerun_p50'] * 1000:8.1f}ms  "
+                  f"max={results[-1]['rerun_max'] * 1000:8.1f}ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"session_messages": SESSION_MESSAGES, "config": vars(args), "results": results}, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
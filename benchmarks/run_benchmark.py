@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stub runs never reach the dashboard; point the analytics store at a scratch
+# file before the engine imports it, in case a run records anyway
+os.environ["ANALYTICS_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="run-bench-"), "analytics.sqlite3")
+
+from budgets import QUICK_SUGGESTIONS  # noqa: E402
+from compaction import CHARS_PER_TOKEN  # noqa: E402
+from engine import arun_query, run_query  # noqa: E402
+from benchmarks.stubs import StubChatModel, make_stub_tools  # noqa: E402
+
+
+def load_queries(query_set):
+    """Queries from the built-in Quick Suggestions or a JSONL corpus
+
+    JSONL lines may carry ``query`` (plus optional ``search_depth`` and
+    ``search_type``); lines with only ``title`` (e.g. requests.jsonl) use it.
+    """
+    if query_set == "suggestions":
+        return [{"query": query} for query in QUICK_SUGGESTIONS]
+    queries = []
+    with open(query_set, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            query = row.get("query") or row.get("title")
+            if query:
+                queries.append({
+                    "query": query,
+                    "search_depth": row.get("search_depth"),
+                    "search_type": row.get("search_type")
+                })
+    return queries
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_level(queries, concurrency, args):
+    """Replay all queries at one concurrency level against fresh stubs"""
+    llm = StubChatModel(
+        latency=args.llm_latency,
+        seconds_per_1k_tokens=args.llm_seconds_per_1k_tokens,
+        jitter=args.jitter,
+        failure_rate=args.llm_failure_rate,
+        tool_steps=args.tool_steps,
+        seed=args.seed
+    )
+    tools = make_stub_tools(
+        latencies={"WebSearch": args.web_latency, "arxiv": args.arxiv_latency, "wikipedia": args.wiki_latency},
+        failure_rate=args.tool_failure_rate,
+        jitter=args.jitter,
+        seed=args.seed
+    )
+
+    def query_kwargs(item):
+        return {
+            "search_depth": item.get("search_depth") or args.depth,
+            "search_type": item.get("search_type") or "General",
+            "llm": llm,
+            "tools": tools,
+            "use_answer_cache": False,
+            "use_query_router": not args.no_query_router,
+            "use_compaction": not args.no_compaction,
+            "record_analytics": False
+        }
+
+    def summary(result, start):
+        return {
+            "ok": True,
+            "latency": time.perf_counter() - start,
+            "first_token": result["first_token_time"],
+            "iterations": result["iterations"],
+            "route": result["route"],
+            "llm_calls": result["llm_usage"]["calls"],
+            "llm_seconds": result["llm_usage"]["seconds"],
+            # Provider-reported prompt tokens when available (never for the stub), else estimated
+            "prompt_tokens": result["llm_usage"]["tokens_in"] or result["llm_usage"]["input_chars"] / CHARS_PER_TOKEN
+        }
+
+    def one(item):
+        start = time.perf_counter()
+        try:
+            return summary(run_query(item["query"], "stub-key", "stub-model", **query_kwargs(item)), start)
+        except Exception as e:
+            return {"ok": False, "latency": time.perf_counter() - start, "error": type(e).__name__}
+
+    async def run_async(work):
+        # Concurrency is a cap on in-flight queries on one event loop, not a thread count
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def aone(item):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await arun_query(item["query"], "stub-key", "stub-model", **query_kwargs(item))
+                    return summary(result, start)
+                except Exception as e:
+                    return {"ok": False, "latency": time.perf_counter() - start, "error": type(e).__name__}
+
+        return await asyncio.gather(*(aone(item) for item in work))
+
+    work = queries * args.repeat
+    wall_start = time.perf_counter()
+    if args.use_async:
+        results = asyncio.run(run_async(work))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, work))
+    wall = time.perf_counter() - wall_start
+
+    ok = [r for r in results if r["ok"]]
+    routes = {}
+    for r in ok:
+        routes[r["route"]] = routes.get(r["route"], 0) + 1
+    latencies = [r["latency"] for r in ok]
+    first_tokens = [r["first_token"] for r in ok]
+    llm_calls = sum(r["llm_calls"] for r in ok)
+    return {
+        "concurrency": concurrency,
+        "queries": len(results),
+        "errors": len(results) - len(ok),
+        "wall_seconds": wall,
+        "throughput_qps": len(results) / wall if wall else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "first_token_p50": percentile(first_tokens, 50),
+        "iterations_mean": sum(r["iterations"] for r in ok) / len(ok) if ok else None,
+        "llm_calls_per_query": llm.calls / len(results) if results else None,
+        "tool_calls_per_query": sum(tool.calls for tool in tools) / len(results) if results else None,
+        "prompt_tokens_per_query": sum(r["prompt_tokens"] for r in ok) / len(ok) if ok else None,
+        "seconds_per_llm_call": sum(r["llm_seconds"] for r in ok) / llm_calls if llm_calls else None,
+        "route_fractions": {route: count / len(ok) for route, count in routes.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the search pipeline with stub LLM and tools")
+    parser.add_argument("--queries", default="suggestions", help="'suggestions' or a JSONL file of queries")
+    parser.add_argument("--depth", default="Standard", choices=["Quick", "Standard", "Deep"])
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the query set this many times per level")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-seconds-per-1k-tokens", type=float, default=0.0,
+                        help="Extra stub LLM latency per 1000 prompt tokens, so prompt size shows in step time")
+    parser.add_argument("--web-latency", type=float, default=0.4)
+    parser.add_argument("--arxiv-latency", type=float, default=0.8)
+    parser.add_argument("--wiki-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tool-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tool-steps", type=int, default=3, help="Tool calls the stub agent makes per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Drive queries through arun_query on one event loop instead of a thread pool")
+    parser.add_argument("--no-query-router", action="store_true",
+                        help="Send every query through the agent (or Quick fan-out), for comparison")
+    parser.add_argument("--no-compaction", action="store_true",
+                        help="Feed tool observations back to the agent verbatim, for comparison")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    tracemalloc.start()
+    results = [run_level(queries, level, args) for level in levels]
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+        "peak_traced_memory_bytes": peak_traced,
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for level in results:
+        print(
+            f"c={level['concurrency']:>3}  n={level['queries']:>4}  err={level['errors']:>3}  "
+            f"p50={level['latency_p50'] or 0:.2f}s  p95={level['latency_p95'] or 0:.2f}s  "
+            f"p99={level['latency_p99'] or 0:.2f}s  qps={level['throughput_qps'] or 0:.2f}  "
+            f"iters={level['iterations_mean'] or 0:.1f}  llm/q={level['llm_calls_per_query'] or 0:.1f}  "
+            f"tokens/q={level['prompt_tokens_per_query'] or 0:.0f}  s/step={level['seconds_per_llm_call'] or 0:.2f}  "
+            f"routes={', '.join(f'{route} {share:.0%}' for route, share in level['route_fractions'].items())}"
+        )
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party packages and repo modules the apps load, lightest first
+MODULES = [
+    "streamlit",
+    "httpx",
+    "analytics",
+    "history_store",
+    "chat_view",
+    "query_router",
+    "search_client",
+    "warmup",
+    "pandas",
+    "plotly.express",
+    "langchain",
+    "langchain_community",
+    "langchain_groq",
+    "rate_limit",
+    "async_tools",
+    "tool_cache",
+    "agent_factory",
+    "model_router",
+    "embeddings",
+    "ingestion",
+    "local_index",
+    "engine"
+]
+
+# Modules that should not be loaded when the first page has been drawn
+HEAVY_MODULES = ["langchain", "langchain_community", "langchain_groq", "plotly", "pandas", "engine"]
+
+FIRST_RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "exception": app.exception[0].message if app.exception else None,
+    "loaded": [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+}))
+"""
+
+
+def import_time(module):
+    """Cumulative import time in seconds of one module in a fresh interpreter (-X importtime)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1]
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6, None
+    return None, "not found in -X importtime output"
+
+
+def first_render(app):
+    """Seconds for the first run of an app script, and which heavy modules it loaded"""
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_RENDER_SCRIPT, app, json.dumps(HEAVY_MODULES)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time per module and time to first render of the apps")
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma-separated modules to time")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--apps", default="app_deploy.py,app_enhanced.py", help="Apps to time with AppTest; empty to skip")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    imports = {}
+    for module in [module for module in args.modules.split(",") if module]:
+        timings, error = [], None
+        for _ in range(args.repeat):
+            seconds, error = import_time(module)
+            if seconds is None:
+                break
+            timings.append(seconds)
+        imports[module] = {"seconds": statistics.median(timings)} if timings else {"error": error}
+        if timings:
+            print(f"{module:<22} {imports[module]['seconds'] * 1000:9.1f}ms")
+        else:
+            print(f"{module:<22} {'-':>9}    ({error})")
+
+    renders = {}
+    for app in [app for app in args.apps.split(",") if app]:
+        renders[app] = first_render(app)
+        if "error" in renders[app]:
+            print(f"{app:<22} first render failed: {renders[app]['error']}")
+        else:
+            loaded = ", ".join(renders[app]["loaded"]) or "none"
+            print(f"{app:<22} first render {renders[app]['seconds']:.2f}s, heavy modules loaded: {loaded}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "imports": imports, "first_render": renders}, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
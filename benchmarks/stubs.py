@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForLLMRun,
+    CallbackManagerForToolRun
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import BaseTool
+
+from compaction import estimate_tokens
+
+# Tool names match the real tools so prompts, labels and caches line up
+STUB_TOOL_NAMES = ["WebSearch", "arxiv", "wikipedia"]
+
+
+class StubFailure(RuntimeError):
+    """Injected failure from a stub LLM or tool"""
+
+
+def _delay(rng, lock, latency, jitter):
+    """Latency +/- jitter seconds drawn from a seeded generator"""
+    with lock:
+        return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+
+def _sleep(rng, lock, latency, jitter):
+    time.sleep(_delay(rng, lock, latency, jitter))
+
+
+def _should_fail(rng, lock, failure_rate):
+    with lock:
+        return rng.random() < failure_rate
+
+
+class StubChatModel(BaseChatModel):
+    """Deterministic chat model that drives the ReAct loop without a network
+
+    For the ReAct prompt it calls ``tool_steps`` tools in turn, one per LLM
+    call, then gives a final answer. Any other prompt (e.g. the Quick synthesis
+    call) gets an answer straight away. ``seconds_per_1k_tokens`` adds prompt
+    processing time, so a longer scratchpad makes each step slower.
+    """
+
+    latency: float = 0.5
+    seconds_per_1k_tokens: float = 0.0
+    jitter: float = 0.1
+    failure_rate: float = 0.0
+    tool_steps: int = 3
+    seed: int = 0
+    calls: int = 0
+    rng: Any = None
+    lock: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rng = random.Random(self.seed)
+        self.lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _prompt_seconds(self, prompt):
+        return self.seconds_per_1k_tokens * estimate_tokens(prompt) / 1000
+
+    def _reply(self, prompt):
+        """Next ReAct step for the prompt, or a plain answer"""
+        if "Action Input" not in prompt:
+            return f"Stub answer synthesized from {prompt.count('[')} evidence blocks."
+        # Count observations in the scratchpad only, not in the format instructions
+        scratchpad = prompt.rsplit("\nQuestion:", 1)[-1]
+        step = scratchpad.count("Observation:")
+        if step >= self.tool_steps:
+            return "Thought: I now know the final answer\nFinal Answer: Stub answer after %d tool calls." % step
+        tool = STUB_TOOL_NAMES[step % len(STUB_TOOL_NAMES)]
+        question = scratchpad.split("Search Query:", 1)[-1].strip().split("\n", 1)[0][:80] or "query"
+        return f"Thought: I should check {tool}.\nAction: {tool}\nAction Input: {question}"
+
+    def _generate(
+        self,
+        messages: List[Any],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        with self.lock:
+            self.calls += 1
+        prompt = "\n".join(str(message.content) for message in messages)
+        _sleep(self.rng, self.lock, self.latency + self._prompt_seconds(prompt), self.jitter)
+        if _should_fail(self.rng, self.lock, self.failure_rate):
+            raise StubFailure("stub LLM failure")
+        text = self._reply(prompt)
+        if run_manager:
+            for token in text.split(" "):
+                run_manager.on_llm_new_token(token + " ")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[Any],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        with self.lock:
+            self.calls += 1
+        prompt = "\n".join(str(message.content) for message in messages)
+        await asyncio.sleep(_delay(self.rng, self.lock, self.latency + self._prompt_seconds(prompt), self.jitter))
+        if _should_fail(self.rng, self.lock, self.failure_rate):
+            raise StubFailure("stub LLM failure")
+        text = self._reply(prompt)
+        if run_manager:
+            for token in text.split(" "):
+                await run_manager.on_llm_new_token(token + " ")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+class StubSearchTool(BaseTool):
+    """Search tool with configurable latency and failure rate and canned output"""
+
+    name: str = "WebSearch"
+    description: str = "Stub search tool for offline benchmarks"
+    latency: float = 0.3
+    jitter: float = 0.1
+    failure_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+    rng: Any = None
+    lock: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rng = random.Random(f"{self.seed}:{self.name}")
+        self.lock = threading.Lock()
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        with self.lock:
+            self.calls += 1
+        _sleep(self.rng, self.lock, self.latency, self.jitter)
+        return self._result(query)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        with self.lock:
+            self.calls += 1
+        await asyncio.sleep(_delay(self.rng, self.lock, self.latency, self.jitter))
+        return self._result(query)
+
+    def _result(self, query):
+        if _should_fail(self.rng, self.lock, self.failure_rate):
+            raise StubFailure(f"stub {self.name} failure")
+        digest = hashlib.sha256(f"{self.name}:{query}".encode("utf-8")).hexdigest()[:12]
+        return f"{self.name} result {digest} for '{query}'. " + "Lorem ipsum evidence text. " * 10
+
+
+def make_stub_tools(latencies=None, failure_rate=0.0, jitter=0.1, seed=0):
+    """One stub per real tool name, with per-tool latency in seconds"""
+    latencies = latencies or {"WebSearch": 0.4, "arxiv": 0.8, "wikipedia": 0.3}
+    return [
+        StubSearchTool(
+            name=name,
+            description=f"Stub {name} tool for offline benchmarks",
+            latency=latencies.get(name, 0.3),
+            jitter=jitter,
+            failure_rate=failure_rate,
+            seed=seed
+        )
+        for name in STUB_TOOL_NAMES
+    ]
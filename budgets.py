@@ -0,0 +1,78 @@
+# Cost/latency budget per Search Depth setting:
+#   max_iterations  - ReAct steps before the agent must stop
+#   max_results     - cap on results per tool (the sidebar slider can only lower it)
+#   doc_chars       - characters kept per ArXiv/Wikipedia document
+#   observation_tokens - cap per tool observation fed back to the agent
+#   deadline        - wall-clock seconds for the whole query
+#   synthesis_reserve - seconds kept back from the deadline for the final answer
+DEPTH_PROFILES = {
+    "Quick": {
+        "max_iterations": 1,
+        "max_results": 2,
+        "doc_chars": 300,
+        "observation_tokens": 300,
+        "deadline": 15.0,
+        "synthesis_reserve": 5.0
+    },
+    "Standard": {
+        "max_iterations": 6,
+        "max_results": 3,
+        "doc_chars": 500,
+        "observation_tokens": 400,
+        "deadline": 45.0,
+        "synthesis_reserve": 8.0
+    },
+    "Deep": {
+        "max_iterations": 15,
+        "max_results": 5,
+        "doc_chars": 1500,
+        "observation_tokens": 800,
+        "deadline": 120.0,
+        "synthesis_reserve": 12.0
+    }
+}
+
+# Sidebar model choices; kept here (not in engine.py) so the apps can draw the
+# sidebar before the LLM stack is imported
+MODEL_OPTIONS = {
+    "Llama3-8B (Fast)": "llama3-8b-8192",
+    "Llama3-70B (Powerful)": "llama3-70b-8192",
+    "Mixtral-8x7B (Balanced)": "mixtral-8x7b-32768"
+}
+
+# Quick Suggestions shown under the search box
+QUICK_SUGGESTIONS = [
+    "Latest AI research",
+    "Climate change solutions",
+    "Quantum computing basics",
+    "Space exploration news"
+]
+
+# Wikipedia language code and DuckDuckGo region per sidebar language
+LANGUAGES = {
+    "English": {"wiki_lang": "en", "region": "wt-wt"},
+    "Spanish": {"wiki_lang": "es", "region": "es-es"},
+    "French": {"wiki_lang": "fr", "region": "fr-fr"},
+    "German": {"wiki_lang": "de", "region": "de-de"}
+}
+
+# DuckDuckGo time limit per sidebar time filter
+TIME_LIMITS = {
+    "Any time": None,
+    "Past day": "d",
+    "Past week": "w",
+    "Past month": "m"
+}
+
+
+def get_profile(search_depth, max_results=None):
+    """Budget for a depth setting, with the result count lowered to max_results"""
+    profile = dict(DEPTH_PROFILES.get(search_depth, DEPTH_PROFILES["Standard"]))
+    if max_results:
+        profile["max_results"] = max(1, min(profile["max_results"], int(max_results)))
+    return profile
+
+
+def agent_time_budget(profile):
+    """Seconds the agent loop may run before the final answer must be written"""
+    return max(1.0, profile["deadline"] - profile["synthesis_reserve"])
@@ -0,0 +1,112 @@
+import streamlit as st
+
+from history_store import PAGE_SIZE
+
+# Height in pixels of the scrollable box holding a page of earlier messages
+OLDER_MESSAGES_HEIGHT = 400
+
+# st.fragment reruns only the decorated function when a widget inside it
+# changes (experimental before Streamlit 1.37); without it the functions
+# simply run as part of the full rerun
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def lazy_expander(label, key):
+    """(container, is_open) for an expander whose body should only run while it is open
+
+    Streamlit versions that track expander state rerun when it is toggled and
+    report ``.open``; on older ones a toggle stands in for the expander.
+    """
+    try:
+        expander = st.expander(label, key=key, on_change="rerun")
+    except TypeError:
+        is_open = st.toggle(label, key=key)
+        return st.container(), is_open
+    return expander, bool(expander.open)
+
+
+def render_message(message):
+    with st.chat_message(message["role"]):
+        st.write(message["content"])
+
+
+def reset_history_view():
+    """Go back to the newest page of earlier messages, e.g. after clearing the chat"""
+    st.session_state.older_cursor = []
+
+
+def _page_back(cursor, before_id):
+    cursor.append(before_id)
+
+
+def _page_forward(cursor):
+    if cursor:
+        cursor.pop()
+
+
+@fragment
+def older_messages(history, session_id, oldest_id):
+    """Messages before the session's ring buffer, read one page at a time and only while shown
+
+    Paging reruns only this fragment, and each page is a keyset query on
+    (session, id), so the cost does not grow with the length of the chat.
+    """
+    if not history.has_messages(session_id, oldest_id):
+        return
+    if not st.toggle("🕘 Show earlier messages", key="show_older_messages"):
+        return
+
+    # before_id of every page paged past, newest first
+    cursor = st.session_state.setdefault("older_cursor", [])
+    page = history.messages(session_id, cursor[-1] if cursor else oldest_id, limit=PAGE_SIZE)
+    with st.container(height=OLDER_MESSAGES_HEIGHT):
+        for message in page:
+            render_message(message)
+
+    col_back, col_forward = st.columns(2)
+    with col_back:
+        st.button(
+            "⬆️ Earlier",
+            key="older_back",
+            disabled=not page or not history.has_messages(session_id, page[0]["id"]),
+            on_click=_page_back,
+            args=(cursor, page[0]["id"] if page else None)
+        )
+    with col_forward:
+        st.button("⬇️ Later", key="older_forward", disabled=not cursor, on_click=_page_forward, args=(cursor,))
+
+
+@fragment
+def message_actions(history, session_id, message):
+    """Feedback buttons under the latest answer; clicking them does not rerun the app"""
+    col_btn1, col_btn2, col_btn3 = st.columns(3)
+    with col_btn1:
+        if st.button("👍 Helpful", key=f"helpful_{message['id']}"):
+            st.success("Thanks for the feedback!")
+    with col_btn2:
+        if st.button("💾 Save Response", key=f"save_{message['id']}"):
+            history.add_favorite(session_id, message.get("original_query", "Unknown"), message["content"])
+            st.success("Response saved!")
+    with col_btn3:
+        if st.button("🔄 Regenerate", key=f"regen_{message['id']}"):
+            st.info("Regenerating response...")
+
+
+def render_chat(history, session_id, messages):
+    """Earlier messages collapsed behind a toggle, then the session's recent messages
+
+    Only the bounded ring buffer of recent messages is drawn on every rerun,
+    so reruns cost the same with ten messages in the history or ten thousand.
+    """
+    messages = list(messages)
+    if not messages:
+        return
+    older_messages(history, session_id, messages[0]["id"])
+    for message in messages[:-1]:
+        render_message(message)
+
+    last = messages[-1]
+    with st.chat_message(last["role"]):
+        st.write(last["content"])
+        if last["role"] == "assistant":
+            message_actions(history, session_id, last)
@@ -0,0 +1,127 @@
+import functools
+import os
+
+from shingling import sentences, shingles, words
+
+COMPACTION_ENABLED = os.getenv("OBSERVATION_COMPACTION", "1") != "0"
+
+# Rough tokens per character of English text; good enough for budgets
+# without loading a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Default cap per observation (the depth profiles set their own), how many of
+# the latest steps the agent sees in full, and what is left of older ones
+OBSERVATION_TOKENS = 400
+RECENT_STEPS = int(os.getenv("COMPACTION_RECENT_STEPS", "2"))
+SUMMARY_SENTENCES = 3
+SUMMARY_TOKENS = 120
+
+# Observations this short (errors, "No good ... Result was found") pass through
+MIN_COMPACT_TOKENS = 32
+
+# A snippet or sentence is dropped when this share of its word 3-grams was
+# already shown in an earlier observation (or earlier in the same one)
+DUPLICATE_OVERLAP = 0.8
+
+NOTHING_NEW = "No new information: these results repeat earlier observations."
+SUMMARY_PREFIX = "[Summary of earlier result] "
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _is_duplicate(text_shingles, seen):
+    return bool(text_shingles) and len(text_shingles & seen) >= DUPLICATE_OVERLAP * len(text_shingles)
+
+
+def _dedupe(text, seen):
+    """Drop snippets, then sentences, whose content is already in ``seen``
+
+    Tool outputs separate documents with blank lines (ArXiv, Wikipedia) or
+    join snippets into one line (web search), so whole documents are checked
+    first and the sentences of the rest one by one.
+    """
+    shown = set(seen)
+    blocks = []
+    for block in text.split("\n\n"):
+        if _is_duplicate(shingles(block), shown):
+            continue
+        lines = []
+        for line in block.splitlines():
+            kept = []
+            for sentence in sentences(line):
+                sentence_shingles = shingles(sentence)
+                if _is_duplicate(sentence_shingles, shown):
+                    continue
+                shown |= sentence_shingles
+                kept.append(sentence)
+            if kept:
+                lines.append(" ".join(kept))
+        if lines:
+            blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def _truncate(text, max_tokens):
+    """Cut to about ``max_tokens``, at a sentence end when one is close enough"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if end > max_chars // 2:
+        cut = cut[:end + 1]
+    return cut.rstrip() + " …"
+
+
+def _summarize(text, query):
+    """Extractive summary: the sentences sharing most words with the step's query
+
+    Each document's first sentence (usually its title or lead) gets a small
+    bonus; the picked sentences keep their original order.
+    """
+    terms = set(words(query))
+    candidates = []
+    for block in text.split("\n\n"):
+        for position, sentence in enumerate(sentences(" ".join(block.splitlines()))):
+            score = len(set(words(sentence)) & terms) + (0.5 if position == 0 else 0.0)
+            candidates.append((score, len(candidates), sentence))
+    best = sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1]))[:SUMMARY_SENTENCES]
+    summary = " ".join(sentence for _, _, sentence in sorted(best, key=lambda candidate: candidate[1]))
+    return SUMMARY_PREFIX + _truncate(summary, SUMMARY_TOKENS)
+
+
+def compact_steps(steps, max_tokens=OBSERVATION_TOKENS, keep_recent=RECENT_STEPS):
+    """Compacted copy of a ReAct agent's (action, observation) steps
+
+    Snippets already shown in an earlier observation are removed, the latest
+    ``keep_recent`` observations are capped at ``max_tokens`` and older ones
+    are replaced by a short extractive summary. Runs locally on every agent
+    step (AgentExecutor ``trim_intermediate_steps``), so the scratchpad sent
+    to the LLM stops growing by a full tool output per step; the executor
+    still returns the original steps.
+    """
+    seen = set()
+    older = len(steps) - keep_recent
+    compacted = []
+    for index, (action, observation) in enumerate(steps):
+        text = str(observation)
+        if estimate_tokens(text) > MIN_COMPACT_TOKENS:
+            text = _dedupe(text, seen)
+            if not text:
+                text = NOTHING_NEW
+            elif index < older:
+                text = _summarize(text, getattr(action, "tool_input", ""))
+            else:
+                text = _truncate(text, max_tokens)
+        # Only what the agent is shown counts as seen
+        for sentence in sentences(text):
+            seen |= shingles(sentence)
+        compacted.append((action, text))
+    return compacted
+
+
+@functools.lru_cache(maxsize=None)
+def get_compactor(max_tokens=OBSERVATION_TOKENS, keep_recent=RECENT_STEPS):
+    """compact_steps with fixed limits; the same object per limits, so cached executors are reused"""
+    return functools.partial(compact_steps, max_tokens=max_tokens, keep_recent=keep_recent)
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from compaction import NOTHING_NEW, compact_steps
+from evidence import tokenize
+from quick_search import EMPTY_RESULT_PREFIXES, format_evidence
+
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", os.path.join(".cache", "conversations.sqlite3"))
+CONVERSATION_ENABLED = os.getenv("CONVERSATION_MEMORY", "1") != "0"
+
+# Turns kept per session, how long they stay usable, and how much of each
+# is kept: evidence per source (after deduplication) and answer characters
+CONVERSATION_TURNS = int(os.getenv("CONVERSATION_TURNS", "3"))
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(2 * 3600)))
+SOURCE_TOKENS = 300
+ANSWER_CHARS = 1500
+
+# A follow-up opens with a continuation, is a bare "why?", points back at an
+# earlier result ("the second paper", "the first one"), or is a short
+# question whose only subject is a pronoun ("how does it work?"). "Who was
+# the first man on the moon" and "Is it safe to eat raw eggs" name their
+# subject, so they stand alone.
+CONTINUATION_RE = re.compile(
+    r"^\s*(and|but|so|also|then|what about|how about|tell me more|more (on|about)|go on|continue|"
+    r"elaborate|expand on|explain (it|that|this|them|those|these)|summari[sz]e (it|that|this|them)|"
+    r"compare (them|these|those|both))\b",
+    re.IGNORECASE
+)
+BARE_QUESTION_RE = re.compile(
+    r"^\s*(why|why not|why is that|how so|how come|such as|for example|which one|really)\s*[?.!]*\s*$",
+    re.IGNORECASE
+)
+# "the <ordinal>" followed by a word for an earlier result, or by no noun at all
+ORDINAL_REFERENCE_RE = re.compile(
+    r"\b(the|that|this) (first|second|third|fourth|fifth|last|other|former|latter|above|previous)"
+    r"(\s+(one|ones|paper|papers|article|articles|result|results|source|sources|study|studies|link|links|"
+    r"answer|option|options|point|example|book|video)\b"
+    r"|(?=\s*([?.!,;]|$)|\s+(is|was|are|were|do|does|did|has|had|say|says|said|mean|means|about|in|on|"
+    r"of|from|and|or|vs|versus|compared|better|worse|different)\b))",
+    re.IGNORECASE
+)
+PRONOUN_RE = re.compile(r"\b(it|its|they|them|their|this|that|these|those|he|him|his|she|her)\b", re.IGNORECASE)
+# Words besides stopwords that do not name a subject
+FUNCTION_WORDS = frozenset(
+    "do does did can could would should may might must am been being had they them their he him his she her "
+    "me you we us our more some any".split()
+)
+MAX_FOLLOW_UP_WORDS = 12
+# More content words than this and the question names its own subject
+MAX_CONTENT_WORDS = 2
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+NEED_SEARCH_PREFIX = "NEED_SEARCH:"
+
+FOLLOW_UP_PROMPT = """You are a research assistant in an ongoing conversation. Answer the follow-up question using the earlier turns and the evidence gathered for them.
+Cite the source of each claim with the bracketed label of the passage it comes from, e.g. [ArXiv: <title>] or [Web].
+
+If the evidence is enough, reply with "Final Answer:" followed by the answer.
+If it is not, reply with only "NEED_SEARCH:" followed by one standalone search query that spells out what the question refers to.
+
+Conversation:
+{conversation}
+
+Evidence:
+{evidence}
+
+Follow-up question: {query}
+"""
+
+
+def is_follow_up(query, turns):
+    """Whether a query continues the conversation of the earlier ``turns``"""
+    if not turns:
+        return False
+    if CONTINUATION_RE.search(query) or BARE_QUESTION_RE.search(query):
+        return True
+    if len(query.split()) > MAX_FOLLOW_UP_WORDS:
+        return False
+    if ORDINAL_REFERENCE_RE.search(query):
+        return True
+    content = [word for word in tokenize(query) if word not in FUNCTION_WORDS]
+    return bool(PRONOUN_RE.search(query)) and len(content) <= MAX_CONTENT_WORDS
+
+
+def compact_evidence(results):
+    """Successful tool results with repeated snippets removed and each source capped"""
+    unique = {}
+    for result in results:
+        content = str(result.get("content") or "")
+        if not result.get("error") and content and not content.startswith(EMPTY_RESULT_PREFIXES):
+            unique.setdefault((result["source"], content), result)
+    results = list(unique.values())
+    steps = compact_steps(
+        [(result["source"], str(result["content"])) for result in results],
+        max_tokens=SOURCE_TOKENS,
+        keep_recent=len(results)
+    )
+    return [
+        {"source": source, "content": content, "error": None, "elapsed": None}
+        for source, content in steps if content != NOTHING_NEW
+    ]
+
+
+def follow_up_prompt(turns, query):
+    """Prompt answering ``query`` from earlier turns, and the evidence it uses"""
+    conversation = "\n".join(
+        f"User: {turn['query']}\nAssistant: {turn['answer'][:ANSWER_CHARS]}" for turn in turns
+    )
+    evidence = compact_evidence([result for turn in turns for result in turn["evidence"]])
+    prompt = FOLLOW_UP_PROMPT.format(
+        conversation=conversation,
+        evidence=format_evidence(evidence, query) or "No evidence was gathered.",
+        query=query
+    )
+    return prompt, evidence
+
+
+def parse_follow_up(text):
+    """(answer, None) when the earlier evidence sufficed, else (None, standalone search query or None)
+
+    Only a reply with "Final Answer:" counts as an answer; anything else
+    searches, for the rewritten query if the reply gave one.
+    """
+    text = str(text).strip()
+    if FINAL_ANSWER_PREFIX in text:
+        answer = text.split(FINAL_ANSWER_PREFIX, 1)[1].strip()
+        if answer:
+            return answer, None
+    if NEED_SEARCH_PREFIX in text:
+        lines = text.split(NEED_SEARCH_PREFIX, 1)[1].strip().splitlines()
+        return None, (lines[0].strip().strip('"') if lines else "") or None
+    return None, None
+
+
+class ConversationStore:
+    """Recent turns of every session, with the evidence their answers used
+
+    Shared through SQLite so a follow-up finds the earlier turns whichever
+    process (Streamlit server or search service worker) answers it. Only the
+    last few turns of a session are kept, each with compacted evidence.
+    """
+
+    def __init__(self, path=CONVERSATION_DB_PATH, max_turns=CONVERSATION_TURNS, ttl=CONVERSATION_TTL):
+        self.path = path
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    evidence TEXT NOT NULL,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_turns_session ON turns(session, id)")
+            self._conn.execute("DELETE FROM turns WHERE created < ?", (time.time() - ttl,))
+            self._conn.commit()
+
+    def add_turn(self, session, query, answer, evidence=None):
+        evidence = compact_evidence(evidence or [])
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (session, query, answer, evidence, created) VALUES (?, ?, ?, ?, ?)",
+                (session, query, answer, json.dumps(evidence), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM turns WHERE session = ? AND id NOT IN "
+                "(SELECT id FROM turns WHERE session = ? ORDER BY id DESC LIMIT ?)",
+                (session, session, self.max_turns)
+            )
+            self._conn.commit()
+
+    def recent(self, session):
+        """The session's unexpired turns, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query, answer, evidence FROM turns WHERE session = ? AND created >= ? ORDER BY id",
+                (session, time.time() - self.ttl)
+            ).fetchall()
+        return [{"query": query, "answer": answer, "evidence": json.loads(evidence)} for query, answer, evidence in rows]
+
+    def clear(self, session):
+        with self._lock:
+            self._conn.execute("DELETE FROM turns WHERE session = ?", (session,))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store():
+    """Process-wide conversation store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore()
+        return _store
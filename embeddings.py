@@ -0,0 +1,31 @@
+import os
+import threading
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+_lock = threading.Lock()
+_models = {}
+
+
+def get_sentence_model(model_name=EMBEDDING_MODEL):
+    """Local sentence-transformers model, loaded once per process and shared"""
+    with _lock:
+        if model_name not in _models:
+            _models[model_name] = SentenceTransformer(model_name, device="cpu")
+        return _models[model_name]
+
+
+def embed_texts(texts, model_name=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE):
+    """Normalized float32 embeddings, encoded in batches"""
+    model = get_sentence_model(model_name)
+    vectors = model.encode(
+        list(texts),
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return np.asarray(vectors, dtype=np.float32)
@@ -0,0 +1,573 @@
+import asyncio
+import logging
+import threading
+import time
+
+from agent_factory import get_agent_executor
+from analytics import get_analytics
+from answer_cache import SemanticAnswerCache
+from async_tools import build_search_tools
+from budgets import agent_time_budget, get_profile
+from compaction import COMPACTION_ENABLED, compact_steps, get_compactor
+from conversation import CONVERSATION_ENABLED, follow_up_prompt, get_conversation_store, is_follow_up, parse_follow_up
+from ingestion import get_document_index, get_document_tool
+from llm_pool import get_llm_pool
+from local_index import IndexingHandler, LocalMemoryTool, get_local_index
+from model_router import ROUTING_ENABLED, get_routed_llm
+from query_router import (
+    DIRECT_TOOLS,
+    PATH_AGENT,
+    PATH_CACHED,
+    PATH_FOLLOW_UP,
+    PATH_QUICK,
+    ROUTED_DEPTHS,
+    ROUTING_ENABLED as QUERY_ROUTING_ENABLED,
+    classify,
+    get_route_stats
+)
+from rate_limit import PRIORITY_INTERACTIVE, query_deadline, request_priority
+from quick_search import (
+    SOURCE_LABELS,
+    SOURCE_TIMEOUTS,
+    adirect_search,
+    aquick_search,
+    asynthesize,
+    direct_search,
+    quick_search,
+    synthesize
+)
+from streaming import FinalAnswerStreamHandler
+from tool_cache import wrap_tools
+from tracing import SpanRecorder
+
+logger = logging.getLogger(__name__)
+
+ENHANCED_QUERY_TEMPLATE = """
+Search Query: {query}
+Search Type: {search_type}
+Depth: {search_depth}
+
+Please provide a comprehensive answer with:
+1. Key findings and main points
+2. Multiple perspectives if applicable
+3. Recent developments or updates
+4. Reliable sources and citations
+"""
+
+# Output of AgentExecutor when it hits max_iterations or max_execution_time
+AGENT_STOPPED_PREFIX = "Agent stopped due to"
+
+_lock = threading.Lock()
+_tools = {}
+_answer_cache = None
+_answer_cache_ready = False
+
+
+def setup_tools(max_results=3, doc_chars=500, language="English", time_filter="Any time"):
+    """Build the cached search tools once per (result count, size, language, time filter)"""
+    key = (max_results, doc_chars, language, time_filter)
+    with _lock:
+        if key not in _tools:
+            # WebSearch, arxiv and wikipedia on pooled HTTP clients, usable from
+            # run_query (sync) and arun_query (async); repeated queries are
+            # served from the on-disk tool cache
+            tools = wrap_tools(build_search_tools(max_results, doc_chars, language, time_filter))
+
+            # Ingested knowledge base (see ingestion.py), only offered once it has documents
+            document_index = get_document_index()
+            if document_index is not None and document_index.count():
+                tools.append(get_document_tool(document_index, k=max_results + 1))
+
+            # Previously fetched documents are listed first so the agent checks them before the network
+            local_index = get_local_index()
+            if local_index is not None:
+                tools = [LocalMemoryTool(index=local_index, k=max_results + 1)] + tools
+            _tools[key] = tools
+        return _tools[key]
+
+
+def get_answer_cache():
+    """Shared semantic answer cache, or None if local embeddings are unavailable"""
+    global _answer_cache, _answer_cache_ready
+    with _lock:
+        if not _answer_cache_ready:
+            try:
+                _answer_cache = SemanticAnswerCache()
+            except Exception as e:
+                logger.warning("Answer cache disabled: %s", e)
+                _answer_cache = None
+            _answer_cache_ready = True
+        return _answer_cache
+
+
+def create_llm(api_key, model_name):
+    """Get a pooled LLM (warm HTTP connections)
+
+    Every request it makes is paced per API key and retried on 429/5xx by the
+    rate limit scheduler in its HTTP transport (see rate_limit.py). With model
+    routing on, slow calls are hedged with a second model and calls near the
+    query deadline fall back to a faster one (see model_router.py).
+    """
+    llm_kwargs = {"temperature": 0.1, "streaming": True, "timeout": 30}
+    if ROUTING_ENABLED:
+        return get_routed_llm(api_key, model_name, **llm_kwargs)
+    return get_llm_pool().get(api_key, model_name, **llm_kwargs)
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _new_recorder(query, model_name, search_depth, search_type):
+    return SpanRecorder(attributes={
+        "llm.model": model_name,
+        "search.depth": search_depth,
+        "search.type": search_type,
+        "query.chars": len(query)
+    })
+
+
+def _finish_trace(recorder, result, record_analytics=True):
+    """Close and export the trace of a finished query and attach its stages"""
+    result["llm_usage"] = recorder.llm_usage()
+    recorder.finish({
+        "cached": result["cached"],
+        "iterations": result["iterations"],
+        "budget_exhausted": result["budget_exhausted"],
+        "route": result["route"],
+        "llm.calls": result["llm_usage"]["calls"],
+        "llm.input_chars": result["llm_usage"]["input_chars"]
+    })
+    recorder.export()
+    result["stages"] = recorder.stage_breakdown()
+    result["tool_calls"] = recorder.tool_calls()
+    result["trace_id"] = recorder.trace_id
+    if record_analytics:
+        _record_analytics(result)
+    return result
+
+
+def _record_analytics(result, error_model=None):
+    """Update the dashboard aggregates; a failure here never fails the query"""
+    try:
+        if error_model is not None:
+            get_analytics().record_error(error_model)
+        else:
+            get_analytics().record_query(result)
+    except Exception as e:
+        logger.warning("Analytics update failed: %s", e)
+
+
+def run_query(
+    query,
+    api_key,
+    model_name,
+    search_depth="Standard",
+    search_type="General",
+    time_filter="Any time",
+    max_results=None,
+    language="English",
+    callbacks=None,
+    on_token=None,
+    on_status=None,
+    llm=None,
+    tools=None,
+    use_answer_cache=True,
+    priority=PRIORITY_INTERACTIVE,
+    use_query_router=QUERY_ROUTING_ENABLED,
+    use_compaction=COMPACTION_ENABLED,
+    session_id=None,
+    refresh_answer_cache=False,
+    record_analytics=True
+):
+    """Answer one query end to end within the budget of its search depth
+
+    ``on_status(message, progress)`` reports pipeline stages, ``on_token(text)``
+    receives the answer text so far while it streams, and ``callbacks`` are
+    extra LangChain handlers (e.g. StreamlitCallbackHandler) for the agent run.
+    ``llm`` and ``tools`` replace the pooled ChatGroq and the shared tools, which
+    is how the offline benchmarks run the pipeline against stubs.
+    ``priority`` orders this query's Groq and search requests in the rate
+    limit scheduler (batch work yields to interactive searches).
+    With ``use_query_router`` simple lookups (encyclopedia questions, arXiv
+    IDs, news) are answered from one tool and one LLM call instead of the
+    agent loop (see query_router.py).
+    With ``use_compaction`` the tool observations fed back to the agent are
+    deduplicated, capped and summarized as the loop goes (see compaction.py).
+    With a ``session_id`` the evidence of the session's last few turns is
+    kept, and a follow-up question is first answered from it with one LLM
+    call; tools run again only when it is not enough (see conversation.py).
+    ``refresh_answer_cache`` skips the answer cache lookup but still stores
+    the new answer, which is how the prefetcher replaces aging answers.
+    ``record_analytics=False`` keeps non-interactive runs (batch jobs, the
+    prefetcher, benchmarks) out of the dashboard's usage aggregates.
+    Returns a dict with the answer, its timings and a per-stage breakdown;
+    the spans of every query are appended to the local trace file.
+    """
+    recorder = _new_recorder(query, model_name, search_depth, search_type)
+    deadline = get_profile(search_depth, max_results)["deadline"]
+    try:
+        with request_priority(priority), query_deadline(deadline):
+            result = _run_pipeline(_QueryRun(
+                recorder, query, api_key, model_name, search_depth, search_type, time_filter, max_results,
+                language, callbacks, on_token, on_status, llm, tools, use_answer_cache, use_query_router,
+                use_compaction, session_id, refresh_answer_cache
+            ))
+    except Exception as e:
+        recorder.finish(error=e)
+        recorder.export()
+        if record_analytics:
+            _record_analytics(None, error_model=model_name)
+        raise
+    return _finish_trace(recorder, result, record_analytics)
+
+
+async def arun_query(
+    query,
+    api_key,
+    model_name,
+    search_depth="Standard",
+    search_type="General",
+    time_filter="Any time",
+    max_results=None,
+    language="English",
+    callbacks=None,
+    on_token=None,
+    on_status=None,
+    llm=None,
+    tools=None,
+    use_answer_cache=True,
+    priority=PRIORITY_INTERACTIVE,
+    use_query_router=QUERY_ROUTING_ENABLED,
+    use_compaction=COMPACTION_ENABLED,
+    session_id=None,
+    refresh_answer_cache=False,
+    record_analytics=True
+):
+    """Async run_query for event-loop servers
+
+    The agent runs through ``ainvoke`` and the search tools through their
+    ``_arun`` on pooled async HTTP clients, so concurrent queries share one
+    event loop instead of each holding a thread while waiting on the network.
+    Same arguments and result as run_query.
+    """
+    recorder = _new_recorder(query, model_name, search_depth, search_type)
+    deadline = get_profile(search_depth, max_results)["deadline"]
+    try:
+        with request_priority(priority), query_deadline(deadline):
+            run = await asyncio.to_thread(
+                _QueryRun, recorder, query, api_key, model_name, search_depth, search_type, time_filter,
+                max_results, language, callbacks, on_token, on_status, llm, tools, use_answer_cache,
+                use_query_router, use_compaction, session_id, refresh_answer_cache
+            )
+            result = await _arun_pipeline(run)
+    except Exception as e:
+        recorder.finish(error=e)
+        recorder.export()
+        if record_analytics:
+            _record_analytics(None, error_model=model_name)
+        raise
+    return _finish_trace(recorder, result, record_analytics)
+
+
+def _step_results(steps):
+    """Agent (action, observation) steps as tool results, the shape synthesize takes"""
+    return [
+        {"source": action.tool, "content": str(observation), "error": None, "elapsed": None}
+        for action, observation in steps
+    ]
+
+
+class _QueryRun:
+    """State of one query, shared by the sync and async pipelines"""
+
+    def __init__(self, recorder, query, api_key, model_name, search_depth, search_type, time_filter,
+                 max_results, language, callbacks, on_token, on_status, llm, tools, use_answer_cache,
+                 use_query_router, use_compaction, session_id, refresh_answer_cache):
+        self.start_time = time.time()
+        self.recorder = recorder
+        # query is what gets searched; a follow-up may replace it with a standalone rewrite
+        self.query = query
+        self.user_query = query
+        self.api_key = api_key
+        self.model_name = model_name
+        self.search_depth = search_depth
+        self.search_type = search_type
+        self.time_filter = time_filter
+        self.language = language
+        self.callbacks = list(callbacks or [])
+        self.on_token = on_token or _noop
+        self.on_status = on_status or _noop
+        self.llm = llm
+        self.profile = get_profile(search_depth, max_results)
+        self.use_query_router = use_query_router
+        self.use_compaction = use_compaction
+        self.path = None
+        self.stream_handler = None
+        self.steps = []
+        self.iterations = 0
+        self.budget_exhausted = False
+
+        # Network results of the real tools are added to the local index as they arrive
+        self.indexing = []
+        if tools is None:
+            tools = setup_tools(self.profile["max_results"], self.profile["doc_chars"], language, time_filter)
+            local_index = get_local_index()
+            if local_index is not None:
+                self.indexing = [IndexingHandler(local_index)]
+        if not tools:
+            raise RuntimeError("Search tools are not properly initialized")
+        self.tools = tools
+        self.answer_cache = get_answer_cache() if use_answer_cache else None
+        self.refresh_answer_cache = refresh_answer_cache
+
+        # Earlier turns of the session and the evidence behind this answer
+        self.session_id = session_id if CONVERSATION_ENABLED else None
+        self.turns = get_conversation_store().recent(self.session_id) if self.session_id else []
+        self.follow_up = is_follow_up(query, self.turns)
+        self.evidence = []
+
+    def lookup_cached_answer(self):
+        """Stored answer to the same or a rephrased question, or None"""
+        # A follow-up means something else in another conversation
+        if self.answer_cache is None or self.follow_up or self.refresh_answer_cache:
+            return None
+        self.on_status("🧠 Checking previous answers...", 10)
+        cached_answer = self.answer_cache.lookup(
+            self.query, self.search_type, self.time_filter, self.language, self.search_depth
+        )
+        if not cached_answer:
+            return None
+        self.on_status("⚡ Found an answer to a similar question", 80)
+        return cached_answer["response"]
+
+    def prepare_llm(self):
+        self.on_status("🤖 Initializing AI model...", 20)
+        if self.llm is None:
+            self.llm = create_llm(self.api_key, self.model_name)
+
+    def follow_up_call(self):
+        """Prompt and run config for answering from earlier turns, or None if this is not a follow-up"""
+        if not self.follow_up:
+            return None
+        self.on_status("💬 Checking what the earlier searches found...", 50)
+        prompt, self.evidence = follow_up_prompt(self.turns, self.query)
+        self.stream_handler = FinalAnswerStreamHandler(self.on_token, start_time=self.start_time)
+        return prompt, {"callbacks": [self.stream_handler, self.recorder]}
+
+    def follow_up_output(self, message):
+        """Answer from the earlier evidence, or None to search for the rewritten question"""
+        answer, search_query = parse_follow_up(getattr(message, "content", message))
+        if answer is not None:
+            self.path = PATH_FOLLOW_UP
+            return answer
+        self.evidence = []
+        if search_query:
+            self.query = search_query
+        self.on_status("🔄 Earlier sources are not enough, searching again...", 55)
+        return None
+
+    def direct_route(self):
+        """(path, tool, tool input) when one tool can answer the query, else None"""
+        if not self.use_query_router or self.search_depth not in ROUTED_DEPTHS:
+            return None
+        path, tool_input = classify(self.query, self.search_type, self.time_filter)
+        for tool in self.tools:
+            if tool.name == DIRECT_TOOLS.get(path):
+                return path, tool, tool_input
+        return None
+
+    def direct_search_kwargs(self, tool):
+        self.on_status(f"⚡ Looking up {SOURCE_LABELS.get(tool.name, tool.name)}...", 60)
+        return self._synthesis_kwargs()
+
+    def direct_output(self, path, response):
+        """Answer of a direct lookup, or None to fall back to the full search"""
+        if response is None:
+            get_route_stats().record_fallback()
+            self.on_status("🔄 Nothing found there, running a full search...", 40)
+            return None
+        self.path = path
+        self.evidence = response["sources"]
+        return response["output"]
+
+    def quick_search_kwargs(self):
+        """Callbacks and per-source timeouts for the Quick fan-out"""
+        self.on_status("⚡ Querying all sources in parallel...", 60)
+        self.path = PATH_QUICK
+        return self._synthesis_kwargs()
+
+    def quick_output(self, response):
+        self.evidence = response["sources"]
+        return response["output"]
+
+    def _synthesis_kwargs(self):
+        # Query the sources at once and answer with a single LLM call;
+        # no source may use more of the budget than the agent would get
+        time_budget = agent_time_budget(self.profile)
+        self.stream_handler = FinalAnswerStreamHandler(self.on_token, answer_prefix=None, start_time=self.start_time)
+        return {
+            "callbacks": [self.stream_handler, self.recorder] + self.indexing,
+            "timeouts": {name: min(timeout, time_budget) for name, timeout in SOURCE_TIMEOUTS.items()}
+        }
+
+    def agent_call(self):
+        """Executor, input and run config for the ReAct agent"""
+        self.on_status("🔧 Setting up search agent...", 40)
+        executor_kwargs = {}
+        if self.use_compaction:
+            # Applied to the scratchpad before each LLM call; intermediate_steps stay complete
+            executor_kwargs["trim_intermediate_steps"] = get_compactor(self.profile["observation_tokens"])
+        agent_executor = get_agent_executor(
+            self.llm,
+            self.model_name,
+            self.tools,
+            max_iterations=self.profile["max_iterations"],
+            max_execution_time=agent_time_budget(self.profile),
+            early_stopping_method="force",
+            return_intermediate_steps=True,
+            **executor_kwargs
+        )
+
+        self.on_status("🔍 Searching across multiple sources...", 60)
+        self.path = PATH_AGENT
+        self.stream_handler = FinalAnswerStreamHandler(self.on_token, start_time=self.start_time)
+        enhanced_query = ENHANCED_QUERY_TEMPLATE.format(
+            query=self.query,
+            search_type=self.search_type,
+            search_depth=self.search_depth
+        )
+        config = {"callbacks": self.callbacks + [self.stream_handler, self.recorder] + self.indexing}
+        return agent_executor, {"input": enhanced_query}, config
+
+    def agent_output(self, response):
+        self.steps = response.get("intermediate_steps", [])
+        self.iterations = len(self.steps)
+        self.evidence = _step_results(self.steps)
+        output = response["output"]
+        if output.startswith(AGENT_STOPPED_PREFIX):
+            # Out of iterations or time: answer from what was gathered so far
+            self.budget_exhausted = True
+            self.on_status("⏳ Search budget used up, writing the best answer so far...", 90)
+        return output
+
+    def partial_answer_inputs(self):
+        """Evidence and callbacks for answering from the observations gathered before the budget ran out"""
+        steps = self.steps
+        if self.use_compaction:
+            # Drop repeated snippets and cap each observation, but summarize none
+            steps = compact_steps(steps, self.profile["observation_tokens"], keep_recent=len(steps))
+        results = _step_results(steps)
+        # The synthesis call is all answer, so stream every token
+        self.stream_handler.answer_prefix = None
+        return results, [self.stream_handler, self.recorder]
+
+    def store(self, output, cached=False):
+        # Remember fresh answers for similar future questions; answers built
+        # on an earlier turn only make sense in their own conversation
+        if self.answer_cache is not None and not (cached or self.budget_exhausted or self.path == PATH_FOLLOW_UP):
+            self.answer_cache.add(
+                self.query, output, self.search_type, self.model_name, self.time_filter, self.language,
+                self.search_depth
+            )
+        if self.session_id:
+            get_conversation_store().add_turn(self.session_id, self.user_query, output, self.evidence)
+
+    def result(self, output, cached=False):
+        self.on_status("✅ Search completed!", 100)
+        response_time = time.time() - self.start_time
+        if cached:
+            self.path = PATH_CACHED
+        get_route_stats().record(self.path)
+
+        # Time until the first answer token was visible (whole answer if nothing streamed)
+        first_token_time = response_time
+        if self.stream_handler is not None and self.stream_handler.time_to_first_token is not None:
+            first_token_time = self.stream_handler.time_to_first_token
+
+        return {
+            "query": self.user_query,
+            "output": output,
+            "model": self.model_name,
+            "search_depth": self.search_depth,
+            "search_type": self.search_type,
+            "cached": cached,
+            "route": self.path,
+            "iterations": self.iterations,
+            "budget_exhausted": self.budget_exhausted,
+            "response_time": response_time,
+            "first_token_time": first_token_time
+        }
+
+
+def _run_pipeline(run):
+    """Cache lookup, a follow-up answered from earlier turns, then a direct lookup, the Quick fan-out or the ReAct agent"""
+    cached_answer = run.lookup_cached_answer()
+    if cached_answer is not None:
+        run.store(cached_answer, cached=True)
+        return run.result(cached_answer, cached=True)
+
+    run.prepare_llm()
+    output = None
+    follow_up = run.follow_up_call()
+    if follow_up is not None:
+        prompt, config = follow_up
+        output = run.follow_up_output(run.llm.invoke(prompt, config=config))
+
+    route = run.direct_route() if output is None else None
+    if route is not None:
+        path, tool, tool_input = route
+        response = direct_search(
+            run.llm, tool, tool_input, run.query, run.search_type, **run.direct_search_kwargs(tool)
+        )
+        output = run.direct_output(path, response)
+
+    if output is None and run.search_depth == "Quick":
+        output = run.quick_output(
+            quick_search(run.llm, run.tools, run.query, run.search_type, **run.quick_search_kwargs())
+        )
+    elif output is None:
+        agent_executor, inputs, config = run.agent_call()
+        output = run.agent_output(agent_executor.invoke(inputs, config))
+        if run.budget_exhausted:
+            results, callbacks = run.partial_answer_inputs()
+            output = synthesize(run.llm, run.query, results, run.search_type, callbacks=callbacks)
+
+    run.store(output)
+    return run.result(output)
+
+
+async def _arun_pipeline(run):
+    """_run_pipeline on the event loop; embedding work for the answer cache runs in a thread"""
+    cached_answer = await asyncio.to_thread(run.lookup_cached_answer)
+    if cached_answer is not None:
+        await asyncio.to_thread(run.store, cached_answer, True)
+        return run.result(cached_answer, cached=True)
+
+    run.prepare_llm()
+    output = None
+    follow_up = run.follow_up_call()
+    if follow_up is not None:
+        prompt, config = follow_up
+        output = run.follow_up_output(await run.llm.ainvoke(prompt, config=config))
+
+    route = run.direct_route() if output is None else None
+    if route is not None:
+        path, tool, tool_input = route
+        response = await adirect_search(
+            run.llm, tool, tool_input, run.query, run.search_type, **run.direct_search_kwargs(tool)
+        )
+        output = run.direct_output(path, response)
+
+    if output is None and run.search_depth == "Quick":
+        response = await aquick_search(run.llm, run.tools, run.query, run.search_type, **run.quick_search_kwargs())
+        output = run.quick_output(response)
+    elif output is None:
+        agent_executor, inputs, config = run.agent_call()
+        output = run.agent_output(await agent_executor.ainvoke(inputs, config))
+        if run.budget_exhausted:
+            results, callbacks = run.partial_answer_inputs()
+            output = await asynthesize(run.llm, run.query, results, run.search_type, callbacks=callbacks)
+
+    await asyncio.to_thread(run.store, output)
+    return run.result(output)
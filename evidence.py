@@ -0,0 +1,186 @@
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+
+from shingling import sentences, shingles, words
+
+# Passages kept for the answer prompt (0 keeps every tool output whole, as before)
+EVIDENCE_PASSAGES = int(os.getenv("EVIDENCE_PASSAGES", "6"))
+
+# Long documents and the joined web snippets are cut into passages of about this many words
+PASSAGE_WORDS = 80
+
+# A passage is a near-duplicate when this share of its own word 3-grams
+# also appears in a passage already kept, estimated from MinHash signatures.
+# Only the sentences of a duplicate that the kept passage lacks are kept,
+# so a page quoting an abstract still contributes what it adds.
+MINHASH_PERMUTATIONS = 64
+DUPLICATE_CONTAINMENT = 0.7
+
+# Which copy of a duplicate is kept: the primary source (the arXiv abstract,
+# not the web snippet quoting it)
+SOURCE_PRIORITY = {
+    "arxiv": 0,
+    "wikipedia": 1,
+    "document_search": 2,
+    "local_memory": 3,
+    "WebSearch": 4
+}
+
+# BM25 parameters (also used by the local index)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what when where which who why will with about how into than then there these those".split()
+)
+
+_TITLE_RE = re.compile(r"^(?:Title|Page):\s*(.+)$", re.MULTILINE)
+
+# Universal hashing modulo a Mersenne prime; 31 bits so a * x fits in uint64
+_PRIME = (1 << 31) - 1
+_permutations = None
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords, for BM25"""
+    return [token for token in words(text) if token not in STOPWORDS and len(token) > 1]
+
+
+def split_passages(result):
+    """Passages of one tool result, each with its source and document title
+
+    ArXiv and Wikipedia separate documents with blank lines and start them
+    with a Title:/Page: line; web search joins its snippets into one line.
+    """
+    passages = []
+    for block in str(result["content"]).strip().split("\n\n"):
+        match = _TITLE_RE.search(block)
+        title = match.group(1).strip() if match else None
+        window = []
+        for sentence in sentences(" ".join(block.split())):
+            window.append(sentence)
+            if sum(len(part.split()) for part in window) >= PASSAGE_WORDS:
+                passages.append({"source": result["source"], "title": title, "text": " ".join(window)})
+                window = []
+        if window:
+            passages.append({"source": result["source"], "title": title, "text": " ".join(window)})
+    return passages
+
+
+def _shingle_hashes(text):
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(shingle).encode("utf-8"), digest_size=4).digest(), "little")
+        for shingle in shingles(text)
+    }
+
+
+def _signature(hashes):
+    """MinHash signature of a set of 32-bit shingle hashes"""
+    # numpy only once there is evidence to deduplicate, not when the apps import this module
+    import numpy as np
+
+    global _permutations
+    if _permutations is None:
+        rng = np.random.default_rng(0)
+        _permutations = (
+            rng.integers(1, _PRIME, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64),
+            rng.integers(0, _PRIME, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64)
+        )
+    a, b = _permutations
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    return ((a * values + b) % _PRIME).min(axis=1)
+
+
+def _candidate(passage):
+    hashes = _shingle_hashes(passage["text"])
+    return dict(passage, also_in=[], hashes=hashes, signature=_signature(hashes) if hashes else None)
+
+
+def _containment(candidate, kept):
+    """Estimated share of the candidate passage's shingles found in a kept one"""
+    similarity = float((candidate["signature"] == kept["signature"]).mean())
+    if not similarity:
+        return 0.0
+    # |A & B| from the Jaccard estimate: J * (|A| + |B|) / (1 + J)
+    shared = similarity * (len(candidate["hashes"]) + len(kept["hashes"])) / (1 + similarity)
+    return min(1.0, shared / len(candidate["hashes"]))
+
+
+def dedupe_passages(passages):
+    """Drop near-duplicate passages, keeping the copy from the primary source
+
+    Passages are visited primary source first, longest first. When most of
+    a passage's own text is already in a kept one, only its sentences that
+    the kept passage does not contain are kept. Each kept passage lists in
+    ``also_in`` the other sources that carried the same text, so the answer
+    can cite every one of them.
+    """
+    ordered = sorted(
+        passages,
+        key=lambda passage: (SOURCE_PRIORITY.get(passage["source"], len(SOURCE_PRIORITY)), -len(passage["text"]))
+    )
+    kept = []
+    for passage in ordered:
+        candidate = _candidate(passage)
+        if not candidate["hashes"]:
+            continue
+        duplicate = next(
+            (other for other in kept if _containment(candidate, other) >= DUPLICATE_CONTAINMENT), None
+        )
+        if duplicate is None:
+            kept.append(candidate)
+            continue
+        if candidate["source"] != duplicate["source"] and candidate["source"] not in duplicate["also_in"]:
+            duplicate["also_in"].append(candidate["source"])
+        rest = []
+        for sentence in sentences(candidate["text"]):
+            hashes = _shingle_hashes(sentence)
+            if len(hashes & duplicate["hashes"]) < DUPLICATE_CONTAINMENT * len(hashes):
+                rest.append(sentence)
+        if rest:
+            kept.append(_candidate(dict(passage, text=" ".join(rest))))
+    return [
+        {key: value for key, value in passage.items() if key not in ("signature", "hashes")}
+        for passage in kept
+    ]
+
+
+def bm25_scores(query, texts):
+    """BM25 score of each text for the query, with document frequencies taken over the texts themselves"""
+    terms = set(tokenize(query))
+    docs = [tokenize(text) for text in texts]
+    if not terms or not docs:
+        return [0.0] * len(docs)
+    avg_length = sum(len(doc) for doc in docs) / len(docs) or 1
+    dfs = Counter(term for doc in docs for term in set(doc) if term in terms)
+    scores = []
+    for doc in docs:
+        counts = Counter(doc)
+        score = 0.0
+        for term in terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(docs) - dfs[term] + 0.5) / (dfs[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+
+def select_passages(query, results, k=EVIDENCE_PASSAGES):
+    """Top-k passages across the tool results: split, deduplicated across sources, ranked by BM25
+
+    Ties (and a query with no scoring terms) fall back to source priority,
+    then to the longer passage.
+    """
+    passages = dedupe_passages([passage for result in results for passage in split_passages(result)])
+    scores = bm25_scores(query, [passage["text"] for passage in passages])
+    ranked = sorted(
+        range(len(passages)),
+        key=lambda i: (-scores[i], SOURCE_PRIORITY.get(passages[i]["source"], len(SOURCE_PRIORITY)), i)
+    )
+    return [dict(passages[i], score=scores[i]) for i in ranked[:k]]
@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from collections import deque
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(".cache", "history.sqlite3"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+
+# What a Streamlit session keeps in memory; everything else is read from the store
+SESSION_MESSAGES = 20
+TIMING_SAMPLES = 100
+PAGE_SIZE = 20
+
+# Message fields stored in their own columns; any others go in the extra JSON
+MESSAGE_COLUMNS = ("role", "content", "query", "model", "response_time", "first_token_time")
+
+
+class RingBuffer:
+    """Fixed-size array of floats that overwrites its oldest value, with a running sum"""
+
+    def __init__(self, capacity=TIMING_SAMPLES):
+        self.capacity = capacity
+        self._values = array("d", [0.0] * capacity)
+        self._next = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def append(self, value):
+        if self._count == self.capacity:
+            self._sum -= self._values[self._next]
+        else:
+            self._count += 1
+        self._values[self._next] = value
+        self._sum += value
+        self._next = (self._next + 1) % self.capacity
+
+    def mean(self):
+        return self._sum / self._count if self._count else 0.0
+
+    def values(self):
+        """Values from oldest to newest"""
+        start = (self._next - self._count) % self.capacity
+        return [self._values[(start + i) % self.capacity] for i in range(self._count)]
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def __len__(self):
+        return self._count
+
+
+def new_session_state():
+    """Bounded per-session state: an id, the last few messages and recent timings"""
+    return {
+        "session_id": uuid.uuid4().hex,
+        "messages": deque(maxlen=SESSION_MESSAGES),
+        "response_times": RingBuffer(),
+        "first_token_times": RingBuffer(),
+        "search_count": 0
+    }
+
+
+class HistoryStore:
+    """SQLite-backed chat messages, searches and saved responses of every session
+
+    Sessions only hold a ring buffer of recent messages; older ones are read
+    back a page at a time, so session memory stays flat however long it runs.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, retention_days=HISTORY_RETENTION_DAYS):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    session TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    query TEXT,
+                    model TEXT,
+                    response_time REAL,
+                    first_token_time REAL,
+                    extra TEXT,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS searches (
+                    id INTEGER PRIMARY KEY,
+                    session TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    response_time REAL,
+                    first_token_time REAL,
+                    stages TEXT,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS favorites (
+                    id INTEGER PRIMARY KEY,
+                    session TEXT NOT NULL,
+                    query TEXT,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_query ON messages(session, query)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_searches_session ON searches(session, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_searches_created ON searches(created)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_favorites_session ON favorites(session, id)")
+            if retention_days:
+                cutoff = time.time() - retention_days * 86400
+                for table in ("messages", "searches", "favorites"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE created < ?", (cutoff,))
+            self._conn.commit()
+
+    def add_message(self, session, message):
+        """Store a chat message and return it with its ``id``"""
+        extra = {key: value for key, value in message.items() if key not in MESSAGE_COLUMNS + ("id",)}
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (session, role, content, query, model, response_time, first_token_time, "
+                "extra, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    session, message["role"], message["content"], message.get("query"), message.get("model"),
+                    message.get("response_time"), message.get("first_token_time"),
+                    json.dumps(extra) if extra else None, time.time()
+                )
+            )
+            self._conn.commit()
+        return dict(message, id=cursor.lastrowid)
+
+    def messages(self, session, before_id=None, limit=PAGE_SIZE):
+        """Up to ``limit`` messages older than ``before_id`` (newest page first), oldest to newest"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content, query, model, response_time, first_token_time, extra FROM messages "
+                "WHERE session = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session, before_id if before_id is not None else 2 ** 63 - 1, limit)
+            ).fetchall()
+        messages = []
+        for row in reversed(rows):
+            message = json.loads(row[7]) if row[7] else {}
+            message["id"] = row[0]
+            message.update({key: value for key, value in zip(MESSAGE_COLUMNS, row[1:7]) if value is not None})
+            messages.append(message)
+        return messages
+
+    def has_messages(self, session, before_id=None):
+        """Whether the session has messages older than ``before_id`` (one index probe, not a count)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM messages WHERE session = ? AND id < ? LIMIT 1",
+                (session, before_id if before_id is not None else 2 ** 63 - 1)
+            ).fetchone() is not None
+
+    def has_query(self, session, query):
+        """Whether the session already asked this query (an index lookup, not a scan of its messages)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM messages WHERE session = ? AND query = ? AND role = 'user' LIMIT 1",
+                (session, query)
+            ).fetchone() is not None
+
+    def add_search(self, session, query, response_time, first_token_time=None, stages=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO searches (session, query, response_time, first_token_time, stages, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session, query, response_time, first_token_time, json.dumps(stages) if stages else None, time.time())
+            )
+            self._conn.commit()
+
+    def top_queries(self, limit=PAGE_SIZE, since=0, min_sessions=1):
+        """(query, sessions) of the queries searched by the most sessions since a timestamp
+
+        Queries are compared ignoring case and outer spaces; one session
+        searching the same thing again does not make it more popular.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(trim(query)), COUNT(DISTINCT session) FROM searches WHERE created >= ? "
+                "GROUP BY lower(trim(query)) HAVING COUNT(DISTINCT session) >= ? "
+                "ORDER BY COUNT(DISTINCT session) DESC, MAX(created) DESC LIMIT ?",
+                (since, min_sessions, limit)
+            ).fetchall()
+
+    def add_favorite(self, session, query, response):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO favorites (session, query, response, created) VALUES (?, ?, ?, ?)",
+                (session, query, response, time.time())
+            )
+            self._conn.commit()
+
+    def favorites(self, session, limit=PAGE_SIZE, offset=0):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query, response, created FROM favorites WHERE session = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (session, limit, offset)
+            ).fetchall()
+        return [{"query": row[0], "response": row[1], "timestamp": row[2]} for row in rows]
+
+    def export(self, session):
+        """Every message of a session, oldest first, read a page at a time"""
+        before_id = None
+        pages = []
+        while True:
+            page = self.messages(session, before_id, limit=500)
+            if not page:
+                break
+            pages.append(page)
+            before_id = page[0]["id"]
+        return [message for page in reversed(pages) for message in page]
+
+    def clear(self, session):
+        """Forget a session's chat and searches; saved responses are kept"""
+        with self._lock:
+            for table in ("messages", "searches"):
+                self._conn.execute(f"DELETE FROM {table} WHERE session = ?", (session,))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Process-wide history store shared by all sessions"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,447 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain.tools.retriever import create_retriever_tool
+from langchain_core.retrievers import BaseRetriever
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embeddings import EMBEDDING_MODEL, embed_texts, get_sentence_model
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_INDEX_DIR = os.getenv("DOCUMENT_INDEX_DIR", os.path.join(".cache", "documents"))
+DOCUMENT_TOOL_NAME = "document_search"
+
+# Same splitter settings as the RAG tool in tools_agents.ipynb
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Vectors added (or rows deleted) since the last compaction before the
+# memory-mapped base index is rewritten
+COMPACT_THRESHOLD = int(os.getenv("DOCUMENT_INDEX_COMPACT_THRESHOLD", "2000"))
+
+# Memory-map flat indexes where the installed faiss supports it
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# Ids/hashes per "IN (...)" query, below SQLite's host parameter limit
+SQL_BATCH = 500
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _batched(items, size=SQL_BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class DocumentIndex:
+    """Persistent vector index of text chunks with local embeddings
+
+    SQLite holds every chunk with its content hash, metadata and embedding and
+    is the source of truth. Search runs over a read-only FAISS base index that
+    is memory-mapped from disk, plus an in-memory delta index of chunks added
+    since the last compaction. Deleted chunks are dropped from the delta and
+    filtered out of base results until ``compact`` rewrites the base file from
+    SQLite. Nothing is ever re-embedded.
+
+    Several processes may share one index: before each search the delta picks
+    up rows any of them stored, and a compaction by another process (a new
+    ``generation``) maps the new base file.
+    """
+
+    def __init__(self, directory=DOCUMENT_INDEX_DIR, model_name=EMBEDDING_MODEL,
+                 chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        os.makedirs(directory, exist_ok=True)
+        self.model_name = model_name
+        self._faiss_path = os.path.join(directory, "index.faiss")
+        self._lock = threading.RLock()
+        self._splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._dim = get_sentence_model(model_name).get_sentence_embedding_dimension()
+
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash TEXT UNIQUE NOT NULL,
+                source TEXT NOT NULL,
+                metadata TEXT,
+                text TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_source ON documents(source)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+        self._base = None
+        self._pending_deletes = 0
+        self._load()
+
+    def _meta(self, key, default=0):
+        row = self._conn.execute("SELECT value FROM index_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _new_index(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self._dim))
+
+    def _load(self):
+        """Map the base index and rebuild the delta from rows newer than it"""
+        with self._lock:
+            self._generation = self._meta("generation")
+            compacted_max_id = self._meta("compacted_max_id")
+            if os.path.exists(self._faiss_path):
+                self._base = faiss.read_index(self._faiss_path, MMAP_FLAGS)
+            else:
+                self._base = None
+                compacted_max_id = 0
+            self._delta = self._new_index()
+            self._max_id = compacted_max_id
+            self._catch_up()
+
+    def _catch_up(self):
+        """Add the rows stored since the last look, by this process or another, to the delta (caller holds the lock)
+
+        Row ids grow in commit order, so those are exactly the rows above the
+        largest id already indexed.
+        """
+        rows = self._conn.execute(
+            "SELECT id, embedding FROM documents WHERE id > ? ORDER BY id", (self._max_id,)
+        ).fetchall()
+        if rows:
+            vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            self._delta.add_with_ids(vectors, np.asarray([row_id for row_id, _ in rows], dtype=np.int64))
+            self._max_id = rows[-1][0]
+
+    def _refresh(self):
+        """Map a base file another process compacted, or add the rows it stored (caller holds the lock)"""
+        if self._meta("generation") != self._generation:
+            self._load()
+        else:
+            self._catch_up()
+
+    def split(self, text):
+        return [chunk.strip() for chunk in self._splitter.split_text(text or "") if chunk.strip()]
+
+    def add_texts(self, texts, source, metadata=None):
+        """Chunk, embed in batches and index texts; returns the new (id, chunk) rows
+
+        Chunks whose content hash is already stored are skipped.
+        """
+        chunks = []
+        seen = set()
+        for text in texts:
+            for chunk in self.split(text):
+                digest = content_hash(chunk)
+                if digest not in seen:
+                    seen.add(digest)
+                    chunks.append((digest, chunk))
+        if not chunks:
+            return []
+
+        known = set()
+        with self._lock:
+            for batch in _batched(digest for digest, _ in chunks):
+                known.update(row[0] for row in self._conn.execute(
+                    f"SELECT hash FROM documents WHERE hash IN ({','.join('?' * len(batch))})", batch
+                ))
+        fresh = [(digest, chunk) for digest, chunk in chunks if digest not in known]
+        if not fresh:
+            return []
+
+        vectors = embed_texts([chunk for _, chunk in fresh], self.model_name)
+        metadata_json = json.dumps(metadata or {}, default=str)
+        added = []
+        with self._lock:
+            for (digest, chunk), vector in zip(fresh, vectors):
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO documents (hash, source, metadata, text, embedding, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (digest, source, metadata_json, chunk, vector.tobytes(), time.time())
+                )
+                if cursor.rowcount:
+                    added.append((cursor.lastrowid, chunk))
+            if added:
+                self._on_added(added)
+            self._conn.commit()
+            # The new rows reach the delta with any other process's rows since the last search
+            self._catch_up()
+            self._maybe_compact()
+        return added
+
+    def add_documents(self, documents):
+        """Index LangChain Documents, using their ``source`` metadata as the source"""
+        added = 0
+        for document in documents:
+            source = document.metadata.get("source", "unknown")
+            added += len(self.add_texts([document.page_content], source, document.metadata))
+        return added
+
+    def sync_source(self, source, documents):
+        """Re-ingest one source: add its new chunks and delete those its current version no longer has
+
+        Returns (added, deleted) chunk counts.
+        """
+        added = sum(len(self.add_texts([document.page_content], source, document.metadata)) for document in documents)
+        current = {content_hash(chunk) for document in documents for chunk in self.split(document.page_content)}
+        with self._lock:
+            outdated = [
+                row_id for row_id, digest in self._conn.execute(
+                    "SELECT id, hash FROM documents WHERE source = ?", (source,)
+                ) if digest not in current
+            ]
+            return added, self._delete_ids(outdated)
+
+    def delete_hashes(self, hashes):
+        """Delete chunks by content hash; returns how many were removed"""
+        if not hashes:
+            return 0
+        with self._lock:
+            ids = []
+            for batch in _batched(hashes):
+                ids.extend(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM documents WHERE hash IN ({','.join('?' * len(batch))})", batch
+                ))
+            return self._delete_ids(ids)
+
+    def delete_source(self, source):
+        """Delete every chunk that came from one source"""
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM documents WHERE source = ?", (source,))]
+            return self._delete_ids(ids)
+
+    def _delete_ids(self, ids):
+        if not ids:
+            return 0
+        for batch in _batched(ids):
+            self._conn.execute(f"DELETE FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._on_deleted(batch)
+        self._conn.commit()
+        self._delta.remove_ids(np.asarray(ids, dtype=np.int64))
+        self._pending_deletes += len(ids)
+        self._maybe_compact()
+        return len(ids)
+
+    def _on_added(self, rows):
+        """Hook for subclasses: new (id, text) rows, called with the lock held"""
+
+    def _on_deleted(self, ids):
+        """Hook for subclasses: deleted ids, called with the lock held"""
+
+    def _maybe_compact(self):
+        if self._delta.ntotal + self._pending_deletes >= COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the base index from SQLite and memory-map it again"""
+        with self._lock:
+            index = self._new_index()
+            max_id = 0
+            batch_ids, batch_vectors = [], []
+            for row_id, blob in self._conn.execute("SELECT id, embedding FROM documents ORDER BY id"):
+                batch_ids.append(row_id)
+                batch_vectors.append(np.frombuffer(blob, dtype=np.float32))
+                max_id = row_id
+                if len(batch_ids) >= 10000:
+                    index.add_with_ids(np.vstack(batch_vectors), np.asarray(batch_ids, dtype=np.int64))
+                    batch_ids, batch_vectors = [], []
+            if batch_ids:
+                index.add_with_ids(np.vstack(batch_vectors), np.asarray(batch_ids, dtype=np.int64))
+
+            # Per process, so two processes compacting at once never write the same file
+            tmp_path = f"{self._faiss_path}.{os.getpid()}.tmp"
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, self._faiss_path)
+            self._conn.execute(
+                "INSERT INTO index_meta (key, value) VALUES ('compacted_max_id', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (max_id,)
+            )
+            self._conn.execute(
+                "INSERT INTO index_meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+            self._conn.commit()
+            self._generation = self._meta("generation")
+            self._base = faiss.read_index(self._faiss_path, MMAP_FLAGS)
+            self._delta = self._new_index()
+            self._max_id = max_id
+            self._pending_deletes = 0
+            self._catch_up()
+
+    def similarity_search(self, query, k=4):
+        """Top-k (id, cosine score) pairs across the base and delta indexes"""
+        vector = embed_texts([query], self.model_name)
+        hits = {}
+        with self._lock:
+            self._refresh()
+            # Deleted rows stay in the base index until the next compaction (and
+            # in the delta when another process deleted them), so ask for as
+            # many more candidates as there are such rows, plus some slack
+            indexed = (self._base.ntotal if self._base is not None else 0) + self._delta.ntotal
+            live = self._conn.execute("SELECT COUNT(*) FROM documents WHERE id <= ?", (self._max_id,)).fetchone()[0]
+            candidates = k + 8 + max(0, indexed - live)
+            for index in (self._base, self._delta):
+                if index is None or index.ntotal == 0:
+                    continue
+                scores, ids = index.search(vector, min(candidates, index.ntotal))
+                for row_id, score in zip(ids[0], scores[0]):
+                    if row_id != -1:
+                        hits[int(row_id)] = max(float(score), hits.get(int(row_id), -1.0))
+            if not hits:
+                return []
+            live = self._live_ids(hits)
+        ranked = sorted(((row_id, score) for row_id, score in hits.items() if row_id in live),
+                        key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def search(self, query, k=4):
+        """Top-k chunks as dicts with ``id``, ``source``, ``text``, ``metadata`` and ``score``"""
+        hits = self.similarity_search(query, k)
+        rows = self.fetch([row_id for row_id, _ in hits])
+        return [dict(rows[row_id], id=row_id, score=score) for row_id, score in hits if row_id in rows]
+
+    def _live_ids(self, ids):
+        """The ids among ``ids`` whose rows still exist"""
+        live = set()
+        with self._lock:
+            for batch in _batched(ids):
+                live.update(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch
+                ))
+        return live
+
+    def fetch(self, ids):
+        """Stored rows by id as dicts (``source``, ``text``, ``metadata``, ``created``)"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, source, text, metadata, created FROM documents WHERE id IN ({placeholders})", list(ids)
+            ).fetchall()
+        return {
+            row_id: {"source": source, "text": text, "metadata": json.loads(metadata or "{}"), "created": created}
+            for row_id, source, text, metadata, created in rows
+        }
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "chunks": self.count(),
+                "base_vectors": self._base.ntotal if self._base is not None else 0,
+                "delta_vectors": self._delta.ntotal,
+                "pending_deletes": self._pending_deletes
+            }
+
+
+class DocumentRetriever(BaseRetriever):
+    """LangChain retriever over a DocumentIndex"""
+
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [
+            Document(page_content=hit["text"], metadata={**hit["metadata"], "source": hit["source"], "score": hit["score"]})
+            for hit in self.index.search(query, self.k)
+        ]
+
+
+def get_document_tool(index, k=4):
+    """Retriever tool over the ingested knowledge base, as built in tools_agents.ipynb"""
+    return create_retriever_tool(
+        DocumentRetriever(index=index, k=k),
+        DOCUMENT_TOOL_NAME,
+        "Search the documents ingested into the local knowledge base (docs sites, PDFs, notes). "
+        "Use it for questions about those documents."
+    )
+
+
+def load_sources(sources):
+    """Load URLs with WebBaseLoader, PDFs with PyMuPDF and anything else as text"""
+    from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, WebBaseLoader
+
+    documents = []
+    for source in sources:
+        if source.startswith(("http://", "https://")):
+            loader = WebBaseLoader(source)
+        elif source.lower().endswith(".pdf"):
+            loader = PyMuPDFLoader(source)
+        else:
+            loader = TextLoader(source, encoding="utf-8")
+        for document in loader.load():
+            document.metadata["source"] = source
+            documents.append(document)
+    return documents
+
+
+_default_index = None
+_default_index_ready = False
+_default_index_lock = threading.Lock()
+
+
+def get_document_index():
+    """Process-wide knowledge base index, or None if it cannot be opened"""
+    global _default_index, _default_index_ready
+    with _default_index_lock:
+        if not _default_index_ready:
+            try:
+                _default_index = DocumentIndex()
+            except Exception as e:
+                logger.warning("Document index disabled: %s", e)
+                _default_index = None
+            _default_index_ready = True
+        return _default_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local document knowledge base")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_parser = subparsers.add_parser("add", help="Ingest URLs or files (re-ingesting replaces only changed chunks)")
+    add_parser.add_argument("sources", nargs="+")
+    delete_parser = subparsers.add_parser("delete", help="Remove every chunk of a URL or file")
+    delete_parser.add_argument("sources", nargs="+")
+    subparsers.add_parser("compact", help="Rewrite the memory-mapped base index")
+    subparsers.add_parser("stats", help="Show index size")
+    args = parser.parse_args()
+
+    index = DocumentIndex()
+    if args.command == "add":
+        documents = load_sources(args.sources)
+        added = deleted = 0
+        for source in args.sources:
+            source_added, source_deleted = index.sync_source(
+                source, [document for document in documents if document.metadata["source"] == source]
+            )
+            added += source_added
+            deleted += source_deleted
+        print(f"Added {added} new chunks, deleted {deleted} outdated chunks")
+    elif args.command == "delete":
+        print(f"Deleted {sum(index.delete_source(source) for source in args.sources)} chunks")
+    elif args.command == "compact":
+        index.compact()
+    print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from langchain_groq import ChatGroq
+
+from rate_limit import AsyncRateLimitedTransport, RateLimitedTransport, groq_upstream
+
+POOL_MAX_SIZE = int(os.getenv("LLM_POOL_MAX_SIZE", "32"))
+POOL_IDLE_TIMEOUT = float(os.getenv("LLM_POOL_IDLE_TIMEOUT", "300"))
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that calls ``release`` once when it is closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _InUseTransport(httpx.BaseTransport):
+    """Transport that counts requests in flight so closing can wait for them
+
+    A request counts until its response body is closed, which covers a
+    streamed completion that is still being read. ``close_when_idle`` closes
+    the connections at once if nothing is in flight, else when the last
+    request finishes; a later request from a session still holding the
+    client opens a new connection, which is closed the same way.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._closing = False
+
+    def handle_request(self, request):
+        with self._lock:
+            self._in_flight += 1
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._release()
+            raise
+        response.stream = _ReleasingStream(response.stream, self._release)
+        return response
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            close_now = self._closing and not self._in_flight
+        if close_now:
+            self._transport.close()
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def close_when_idle(self):
+        with self._lock:
+            self._closing = True
+            close_now = not self._in_flight
+        if close_now:
+            self._transport.close()
+
+    def close(self):
+        self.close_when_idle()
+
+
+def _pool_key(api_key, model_name, temperature, llm_kwargs):
+    """Hash of the client identity so raw API keys are never kept as dict keys
+
+    Other ChatGroq settings (streaming, timeout, ...) are part of it, so a
+    caller never gets a client built with another caller's settings.
+    """
+    raw = f"{api_key}\x00{model_name}\x00{temperature}\x00{sorted(llm_kwargs.items())}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMPool:
+    """Bounded LRU pool of ChatGroq clients that share warm HTTP connections
+
+    Each entry owns an ``httpx.Client`` so repeated questions from the same user
+    reuse keep-alive connections instead of paying a new TLS handshake. Entries
+    idle for longer than ``idle_timeout`` seconds, or pushed out by LRU when the
+    pool is full, have their connections closed once no request of another
+    session is still using them.
+    """
+
+    def __init__(self, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT, base_url=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.base_url = base_url
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=20,
+            max_keepalive_connections=10,
+            keepalive_expiry=self.idle_timeout
+        )
+
+    def _new_http_client(self, api_key):
+        """HTTP client whose keep-alive connections outlive a single query, and its transport
+
+        Requests go through the rate limit scheduler, which paces them per API
+        key and retries 429/5xx responses with backoff.
+        """
+        transport = _InUseTransport(
+            RateLimitedTransport(groq_upstream(api_key), httpx.HTTPTransport(limits=self._limits()))
+        )
+        return httpx.Client(transport=transport, timeout=httpx.Timeout(30.0, connect=10.0)), transport
+
+    def _new_async_http_client(self, api_key):
+        """Async twin of _new_http_client, used by ainvoke"""
+        transport = AsyncRateLimitedTransport(
+            groq_upstream(api_key), httpx.AsyncHTTPTransport(limits=self._limits())
+        )
+        return httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(30.0, connect=10.0))
+
+    def _create(self, api_key, model_name, temperature, **llm_kwargs):
+        """Build a ChatGroq bound to its own pooled HTTP clients"""
+        http_client, transport = self._new_http_client(api_key)
+        if self.base_url:
+            llm_kwargs.setdefault("base_url", self.base_url)
+        # Retries happen in the rate-limited transport, not again in the SDK
+        llm_kwargs.setdefault("max_retries", 0)
+        # The async client is not closed on eviction: closing needs its event
+        # loop, and its connections are released once it is garbage collected
+        llm = ChatGroq(
+            groq_api_key=api_key,
+            model_name=model_name,
+            temperature=temperature,
+            http_client=http_client,
+            http_async_client=self._new_async_http_client(api_key),
+            **llm_kwargs
+        )
+        return llm, transport
+
+    def get(self, api_key, model_name, temperature=0.1, **llm_kwargs):
+        """Return a pooled ChatGroq, creating it on first use"""
+        key = _pool_key(api_key, model_name, temperature, llm_kwargs)
+        now = time.monotonic()
+        closing = []
+
+        with self._lock:
+            closing.extend(self._pop_idle(now))
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_used"] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                llm = entry["llm"]
+            else:
+                self.misses += 1
+                llm = None
+
+        if llm is None:
+            llm, transport = self._create(api_key, model_name, temperature, **llm_kwargs)
+            with self._lock:
+                existing = self._entries.get(key)
+                if existing is not None:
+                    # Lost a race with another thread, use its client
+                    closing.append(transport)
+                    llm = existing["llm"]
+                else:
+                    self._entries[key] = {"llm": llm, "transport": transport, "last_used": now}
+                    while len(self._entries) > self.max_size:
+                        _, evicted = self._entries.popitem(last=False)
+                        closing.append(evicted["transport"])
+                        self.evictions += 1
+
+        for transport in closing:
+            transport.close_when_idle()
+        return llm
+
+    def _pop_idle(self, now):
+        """Remove entries idle past the timeout, returning their transports"""
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry["last_used"] > self.idle_timeout
+        ]
+        transports = []
+        for key in expired:
+            transports.append(self._entries.pop(key)["transport"])
+            self.evictions += 1
+        return transports
+
+    def prune(self):
+        """Close connections of idle entries"""
+        with self._lock:
+            closing = self._pop_idle(time.monotonic())
+        for transport in closing:
+            transport.close_when_idle()
+
+    def close(self):
+        """Close every pooled connection, each once its requests in flight finish"""
+        with self._lock:
+            closing = [entry["transport"] for entry in self._entries.values()]
+            self._entries.clear()
+        for transport in closing:
+            transport.close_when_idle()
+
+    def stats(self):
+        """Pool size and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_llm_pool():
+    """Process-wide pool shared by all Streamlit sessions"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = LLMPool()
+        return _default_pool
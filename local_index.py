@@ -0,0 +1,290 @@
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+from embeddings import EMBEDDING_MODEL
+from evidence import BM25_B, BM25_K1, tokenize
+from ingestion import DOCUMENT_TOOL_NAME, DocumentIndex, content_hash
+from tool_cache import DEFAULT_TTL, TOOL_TTLS
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(".cache", "local_index"))
+LOCAL_MEMORY_TOOL_NAME = "local_memory"
+
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+# A chunk is only returned if one of the retrievers is confident about it
+MIN_DENSE_SCORE = float(os.getenv("LOCAL_INDEX_MIN_DENSE", "0.55"))
+MIN_BM25_SCORE = float(os.getenv("LOCAL_INDEX_MIN_BM25", "4.0"))
+
+# Fetched chunks expire with their tool's result cache TTL (15 minutes for
+# web results, a week for arXiv); expired ones are skipped by search and
+# deleted by the indexing thread at most this often
+PRUNE_INTERVAL = 60.0
+
+
+def chunk_ttl(source):
+    """Seconds a chunk fetched by a tool stays usable as evidence"""
+    return TOOL_TTLS.get(source, DEFAULT_TTL)
+
+
+class BM25Index:
+    """Incremental BM25 inverted index stored in SQLite
+
+    Adding a chunk only inserts its postings and bumps document frequencies,
+    so the index grows without ever being rebuilt.
+    """
+
+    def __init__(self, conn, lock):
+        self._conn = conn
+        self._lock = lock
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, chunk_id INTEGER NOT NULL, tf INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term ON postings(term)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lengths (chunk_id INTEGER PRIMARY KEY, length INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def add(self, chunk_id, tokens):
+        """Insert postings for one chunk (caller holds the lock and commits)"""
+        counts = Counter(tokens)
+        self._conn.executemany(
+            "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+            [(term, chunk_id, tf) for term, tf in counts.items()]
+        )
+        self._conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+            [(term,) for term in counts]
+        )
+        self._conn.execute("INSERT OR REPLACE INTO lengths (chunk_id, length) VALUES (?, ?)", (chunk_id, len(tokens)))
+
+    def remove(self, chunk_ids):
+        """Drop the postings of deleted chunks (caller holds the lock and commits)"""
+        placeholders = ",".join("?" * len(chunk_ids))
+        terms = self._conn.execute(
+            f"SELECT term FROM postings WHERE chunk_id IN ({placeholders})", list(chunk_ids)
+        ).fetchall()
+        self._conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", terms)
+        self._conn.execute("DELETE FROM terms WHERE df <= 0")
+        self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", list(chunk_ids))
+        self._conn.execute(f"DELETE FROM lengths WHERE chunk_id IN ({placeholders})", list(chunk_ids))
+
+    def search(self, query, k):
+        """Top-k (chunk_id, score) pairs for a query"""
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM lengths").fetchone()
+            if not total:
+                return []
+            dfs = dict(self._conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms))
+            rows = self._conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, l.length FROM postings p "
+                f"JOIN lengths l ON l.chunk_id = p.chunk_id WHERE p.term IN ({placeholders})",
+                terms
+            ).fetchall()
+
+        scores = {}
+        for term, chunk_id, tf, length in rows:
+            df = dfs.get(term, 0)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class HybridIndex(DocumentIndex):
+    """Dense + BM25 index over every document the search tools fetched
+
+    Chunk storage, embeddings and the memory-mapped FAISS index come from
+    DocumentIndex; BM25 postings live in the same SQLite file and are keyed
+    by the same row ids, so both retrievers refer to the same chunks. New
+    text is chunked, embedded and indexed on a background thread so searches
+    never wait for it.
+
+    A chunk's ``created`` time is the last time a tool fetched it; chunks
+    older than their tool's cache TTL are never returned and are pruned by
+    the same thread.
+    """
+
+    def __init__(self, directory=LOCAL_INDEX_DIR, model_name=EMBEDDING_MODEL):
+        super().__init__(directory, model_name)
+        self.bm25 = BM25Index(self._conn, self._lock)
+        self._last_prune = 0.0
+        self._queue = queue.Queue(maxsize=1000)
+        self._worker = threading.Thread(target=self._index_loop, name="local-index", daemon=True)
+        self._worker.start()
+
+    def add_async(self, source, query, text):
+        """Queue fetched text for indexing; drops it if the queue is full"""
+        try:
+            self._queue.put_nowait((source, query, text))
+        except queue.Full:
+            logger.warning("Local index queue full, dropping %s result", source)
+
+    def _index_loop(self):
+        while True:
+            try:
+                source, query, text = self._queue.get(timeout=PRUNE_INTERVAL)
+                self.add(source, query, text)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.warning("Local indexing failed: %s", e)
+            if time.time() - self._last_prune >= PRUNE_INTERVAL:
+                try:
+                    self.prune()
+                except Exception as e:
+                    logger.warning("Local index pruning failed: %s", e)
+
+    def add(self, source, query, text):
+        """Chunk, embed and index text, skipping chunks already stored
+
+        Chunks that were already stored count as fetched again now.
+        """
+        added = self.add_texts([text], source, {"query": query})
+        hashes = [content_hash(chunk) for chunk in self.split(text)]
+        if hashes:
+            with self._lock:
+                self._conn.execute(
+                    f"UPDATE documents SET created = ? WHERE hash IN ({','.join('?' * len(hashes))})",
+                    [time.time(), *hashes]
+                )
+                self._conn.commit()
+        return len(added)
+
+    def prune(self):
+        """Delete chunks older than their tool's cache TTL; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            self._last_prune = now
+            sources = [row[0] for row in self._conn.execute("SELECT DISTINCT source FROM documents")]
+            ids = []
+            for source in sources:
+                ids.extend(row[0] for row in self._conn.execute(
+                    "SELECT id FROM documents WHERE source = ? AND created < ?", (source, now - chunk_ttl(source))
+                ))
+            return self._delete_ids(ids)
+
+    def _on_added(self, rows):
+        for chunk_id, chunk in rows:
+            self.bm25.add(chunk_id, tokenize(chunk))
+
+    def _on_deleted(self, ids):
+        self.bm25.remove(ids)
+
+    def search(self, query, k=4):
+        """Hybrid search fused with reciprocal rank fusion
+
+        Returns dicts with ``source``, ``text`` and scores; only unexpired
+        chunks that the dense or the BM25 retriever scored above its
+        threshold qualify.
+        """
+        candidates = k * 4
+        dense = self.similarity_search(query, candidates)
+        sparse = self.bm25.search(query, candidates)
+
+        fused = {}
+        confident = set()
+        for rank, (chunk_id, score) in enumerate(dense):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            if score >= MIN_DENSE_SCORE:
+                confident.add(chunk_id)
+        for rank, (chunk_id, score) in enumerate(sparse):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            if score >= MIN_BM25_SCORE:
+                confident.add(chunk_id)
+
+        ranked = [chunk_id for chunk_id, _ in sorted(fused.items(), key=lambda item: item[1], reverse=True)
+                  if chunk_id in confident]
+        rows = self.fetch(ranked)
+        now = time.time()
+        fresh = [
+            chunk_id for chunk_id in ranked
+            if chunk_id in rows and now - rows[chunk_id]["created"] <= chunk_ttl(rows[chunk_id]["source"])
+        ]
+        return [dict(rows[chunk_id], id=chunk_id, score=fused[chunk_id]) for chunk_id in fresh[:k]]
+
+    def stats(self):
+        stats = super().stats()
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+
+class LocalMemoryTool(BaseTool):
+    """Retriever tool over the local hybrid index of previously fetched results"""
+
+    name: str = LOCAL_MEMORY_TOOL_NAME
+    description: str = (
+        "Search previously fetched ArXiv papers, Wikipedia articles and web results stored locally. "
+        "Answers in milliseconds, so check it first; use the other tools only when it returns "
+        "nothing relevant. Input should be a search query."
+    )
+    index: Any
+    k: int = 4
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        hits = self.index.search(query, self.k)
+        if not hits:
+            return "No relevant local results."
+        return "\n\n".join(f"[{hit['source']}] {hit['text']}" for hit in hits)
+
+
+class IndexingHandler(BaseCallbackHandler):
+    """Feed every network tool result into the local index in the background"""
+
+    run_inline = True  # add_async only enqueues
+
+    def __init__(self, index):
+        self.index = index
+        self._runs = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        tool_name = (serialized or {}).get("name") or kwargs.get("name")
+        self._runs[run_id] = (tool_name, input_str)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        tool_name, query = self._runs.pop(run_id, (None, None))
+        if not tool_name or tool_name in (LOCAL_MEMORY_TOOL_NAME, DOCUMENT_TOOL_NAME):
+            return
+        text = str(getattr(output, "content", output))
+        errors = ("No good", "Arxiv exception", "Wikipedia exception", "DuckDuckGo exception", f"{tool_name} exception",
+                  "Error")
+        if text and not text.startswith(errors):
+            self.index.add_async(tool_name, query, text)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+
+_default_index = None
+_default_index_ready = False
+_default_index_lock = threading.Lock()
+
+
+def get_local_index():
+    """Process-wide local index, or None if it cannot be opened"""
+    global _default_index, _default_index_ready
+    with _default_index_lock:
+        if not _default_index_ready:
+            try:
+                _default_index = HybridIndex()
+            except Exception as e:
+                logger.warning("Local index disabled: %s", e)
+                _default_index = None
+            _default_index_ready = True
+        return _default_index
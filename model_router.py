@@ -0,0 +1,426 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    BaseCallbackHandler,
+    CallbackManagerForLLMRun
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import SecretStr
+
+from llm_pool import get_llm_pool
+from rate_limit import current_deadline
+
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "1") != "0"
+
+# Second model raced against a slow first one, per model
+HEDGE_MODELS = {
+    "llama3-70b-8192": "llama3-8b-8192",
+    "mixtral-8x7b-32768": "llama3-8b-8192",
+    "llama3-8b-8192": "mixtral-8x7b-32768"
+}
+# Cheaper model used outright once a query's budget is nearly spent
+FALLBACK_MODELS = {
+    "llama3-70b-8192": "llama3-8b-8192",
+    "mixtral-8x7b-32768": "llama3-8b-8192"
+}
+
+# Hedge after the primary's p95 time to first token, within these bounds;
+# before MIN_SAMPLES calls have been seen the default delay is used
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MAX_DELAY = 15.0
+HEDGE_DEFAULT_DELAY = 8.0
+MIN_SAMPLES = 20
+# Fall back when less than this many seconds would remain without data
+FALLBACK_DEFAULT_REMAINING = 10.0
+
+# Histogram bucket upper bounds in seconds, log-spaced from 0.1s to ~3 minutes
+LATENCY_BUCKETS = [round(0.1 * 1.5 ** i, 3) for i in range(19)]
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MODEL_ROUTER_WORKERS", "32")),
+    thread_name_prefix="model-router"
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with quantile estimates"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, or None without data"""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.buckets[-1] * 1.5
+        return self.buckets[-1] * 1.5
+
+    def to_dict(self):
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+        }
+
+
+class ModelRouter:
+    """Per-model latency histograms and the hedging/fallback decisions made from them
+
+    ``ttft`` is the time to the first streamed token (when a racing request
+    is decided), ``total`` the time to the full response.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _model_stats(self, model):
+        if model not in self._stats:
+            self._stats[model] = {
+                "ttft": LatencyHistogram(),
+                "total": LatencyHistogram(),
+                "calls": 0,
+                "errors": 0,
+                "hedged": 0,
+                "hedge_wins": 0,
+                "fallbacks": 0
+            }
+        return self._stats[model]
+
+    def observe(self, model, ttft=None, total=None, error=False):
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["calls"] += 1
+            if error:
+                stats["errors"] += 1
+            if ttft is not None:
+                stats["ttft"].observe(ttft)
+            if total is not None:
+                stats["total"].observe(total)
+
+    def count(self, model, counter):
+        with self._lock:
+            self._model_stats(model)[counter] += 1
+
+    def hedge_delay(self, model):
+        """Seconds to wait for the first token before racing a second model"""
+        with self._lock:
+            histogram = self._model_stats(model)["ttft"]
+            if histogram.total < MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY
+            delay = histogram.quantile(HEDGE_QUANTILE)
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, delay))
+
+    def route(self, model, remaining=None):
+        """(model to call, model to hedge with or None) given the seconds left in the budget"""
+        fallback = FALLBACK_MODELS.get(model)
+        if fallback and remaining is not None:
+            with self._lock:
+                histogram = self._model_stats(model)["total"]
+                needed = histogram.quantile(HEDGE_QUANTILE) if histogram.total >= MIN_SAMPLES else None
+            if remaining < (needed or FALLBACK_DEFAULT_REMAINING):
+                self.count(model, "fallbacks")
+                return fallback, None
+        return model, HEDGE_MODELS.get(model)
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {
+                    key: value.to_dict() if isinstance(value, LatencyHistogram) else value
+                    for key, value in stats.items()
+                }
+                for model, stats in self._stats.items()
+            }
+
+
+class _LostRace(Exception):
+    """Raised inside the slower request to stop its stream"""
+
+
+class _TokenRelay(BaseCallbackHandler):
+    """Forward one attempt's tokens to the dispatcher, and stop it once it has lost"""
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, model, race, put):
+        self.model = model
+        self.race = race
+        self.put = put
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.race["winner"] not in (None, self.model):
+            raise _LostRace()
+        self.put(("token", self.model, token, kwargs.get("chunk")))
+
+
+def _to_result(message, model):
+    generation_info = {"model_name": model}
+    return ChatResult(
+        generations=[ChatGeneration(message=message, generation_info=generation_info)],
+        llm_output={"model_name": model}
+    )
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model that hedges slow requests and falls back near the deadline
+
+    Each call goes to the configured model. If no token has streamed after
+    that model's p95 time to first token (or it fails first), the same
+    messages are sent to its hedge model and whichever streams first wins;
+    the other request is stopped. When the query's remaining budget is below
+    the model's p95 response time, the call goes straight to its fallback.
+    Both requests run on worker threads and their tokens are relayed through
+    the calling thread, so UI callbacks (e.g. Streamlit) stay on that thread.
+    """
+
+    api_key: SecretStr
+    model_name: str
+    llm_kwargs: dict = {}
+    router: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-groq"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def _llm(self, model):
+        return get_llm_pool().get(self.api_key.get_secret_value(), model, **self.llm_kwargs)
+
+    def _plan(self):
+        deadline = current_deadline.get()
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        return self.router.route(self.model_name, remaining)
+
+    def _generate(
+        self,
+        messages: List[Any],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        primary, hedge = self._plan()
+        race = {"winner": None}
+        events = queue.Queue()
+        started = {}
+
+        def launch(model):
+            relay = _TokenRelay(model, race, events.put)
+            started[model] = time.monotonic()
+
+            def attempt():
+                try:
+                    message = self._llm(model).invoke(messages, stop=stop, config={"callbacks": [relay]}, **kwargs)
+                    events.put(("done", model, message, None))
+                except _LostRace:
+                    pass
+                except Exception as e:
+                    events.put(("error", model, e, None))
+
+            _executor.submit(contextvars.copy_context().run, attempt)
+
+        launch(primary)
+        hedge_at = started[primary] + self.router.hedge_delay(primary) if hedge else None
+        first_token = {}
+        errors = []
+        failed = set()
+        while True:
+            timeout = None
+            if hedge_at is not None and race["winner"] is None:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                kind, model, payload, chunk = events.get(timeout=timeout)
+            except queue.Empty:
+                self.router.count(primary, "hedged")
+                launch(hedge)
+                hedge_at = None
+                continue
+
+            if kind == "error":
+                self.router.observe(model, total=time.monotonic() - started[model], error=True)
+                errors.append(payload)
+                failed.add(model)
+                if race["winner"] == model:
+                    raise payload
+                if hedge_at is not None:
+                    # The primary failed before the hedge delay: try the hedge model right away
+                    self.router.count(primary, "hedged")
+                    launch(hedge)
+                    hedge_at = None
+                    continue
+                if len(errors) == len(started):
+                    raise errors[-1]
+                continue
+
+            if race["winner"] is None:
+                race["winner"] = model
+                first_token[model] = time.monotonic() - started[model]
+                for other in started:
+                    if other != model and other not in failed:
+                        # Censored sample: the loser was at least this slow
+                        self.router.observe(other, ttft=time.monotonic() - started[other])
+                if model != primary:
+                    self.router.count(primary, "hedge_wins")
+            if model != race["winner"]:
+                continue
+
+            if kind == "token":
+                if run_manager:
+                    run_manager.on_llm_new_token(payload, chunk=chunk)
+                continue
+            self.router.observe(model, ttft=first_token[model], total=time.monotonic() - started[model])
+            return _to_result(payload, model)
+
+    async def _agenerate(
+        self,
+        messages: List[Any],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        primary, hedge = self._plan()
+        race = {"winner": None}
+        events = asyncio.Queue()
+        started = {}
+        tasks = {}
+
+        def launch(model):
+            relay = _TokenRelay(model, race, events.put_nowait)
+            started[model] = time.monotonic()
+
+            async def attempt():
+                try:
+                    message = await self._llm(model).ainvoke(
+                        messages, stop=stop, config={"callbacks": [relay]}, **kwargs
+                    )
+                    events.put_nowait(("done", model, message, None))
+                except (_LostRace, asyncio.CancelledError):
+                    pass
+                except Exception as e:
+                    events.put_nowait(("error", model, e, None))
+
+            tasks[model] = asyncio.create_task(attempt())
+
+        launch(primary)
+        hedge_at = started[primary] + self.router.hedge_delay(primary) if hedge else None
+        first_token = {}
+        errors = []
+        failed = set()
+        try:
+            while True:
+                timeout = None
+                if hedge_at is not None and race["winner"] is None:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    kind, model, payload, chunk = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    self.router.count(primary, "hedged")
+                    launch(hedge)
+                    hedge_at = None
+                    continue
+
+                if kind == "error":
+                    self.router.observe(model, total=time.monotonic() - started[model], error=True)
+                    errors.append(payload)
+                    failed.add(model)
+                    if race["winner"] == model:
+                        raise payload
+                    if hedge_at is not None:
+                        self.router.count(primary, "hedged")
+                        launch(hedge)
+                        hedge_at = None
+                        continue
+                    if len(errors) == len(started):
+                        raise errors[-1]
+                    continue
+
+                if race["winner"] is None:
+                    race["winner"] = model
+                    first_token[model] = time.monotonic() - started[model]
+                    for other, task in tasks.items():
+                        if other != model and other not in failed:
+                            self.router.observe(other, ttft=time.monotonic() - started[other])
+                            task.cancel()
+                    if model != primary:
+                        self.router.count(primary, "hedge_wins")
+                if model != race["winner"]:
+                    continue
+
+                if kind == "token":
+                    if run_manager:
+                        await run_manager.on_llm_new_token(payload, chunk=chunk)
+                    continue
+                self.router.observe(model, ttft=first_token[model], total=time.monotonic() - started[model])
+                return _to_result(payload, model)
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+
+_router = None
+_routed = OrderedDict()
+_routed_lock = threading.Lock()
+ROUTED_CACHE_SIZE = 64
+
+
+def get_model_router():
+    """Process-wide router holding the latency histograms"""
+    global _router
+    with _routed_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+
+def get_routed_llm(api_key, model_name, **llm_kwargs):
+    """Routed chat model for an API key and model, reused so agent executors stay cached"""
+    router = get_model_router()
+    raw = f"{api_key}\x00{model_name}\x00{sorted(llm_kwargs.items())}"
+    key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    with _routed_lock:
+        llm = _routed.get(key)
+        if llm is None:
+            llm = RoutedChatModel(api_key=api_key, model_name=model_name, llm_kwargs=llm_kwargs, router=router)
+            _routed[key] = llm
+            while len(_routed) > ROUTED_CACHE_SIZE:
+                _routed.popitem(last=False)
+        else:
+            _routed.move_to_end(key)
+        return llm
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import time
+
+from budgets import MODEL_OPTIONS, QUICK_SUGGESTIONS
+from history_store import get_history_store
+from rate_limit import PRIORITY_BACKGROUND, get_scheduler, groq_upstream
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") != "0"
+
+# Only the process holding this lock prefetches; the others (search service
+# workers, Streamlit) try to take over each interval in case it exits
+PREFETCH_LOCK_PATH = os.getenv("PREFETCH_LOCK_PATH", os.path.join(".cache", "prefetch.lock"))
+
+# How many hot queries are kept warm, how often they are checked, and the
+# age at which a cached answer is fetched again
+PREFETCH_QUERIES = int(os.getenv("PREFETCH_QUERIES", str(len(QUICK_SUGGESTIONS))))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", str(30 * 60)))
+PREFETCH_MAX_AGE = float(os.getenv("PREFETCH_MAX_AGE", str(3600)))
+PREFETCH_MODEL = os.getenv("PREFETCH_MODEL", next(iter(MODEL_OPTIONS.values())))
+
+# Hot queries come from the searches of the last days; a query is only hot
+# once several separate sessions searched it, so one user's private searches
+# never are, and the default suggestions fill the remaining places
+HOT_QUERY_DAYS = float(os.getenv("PREFETCH_HISTORY_DAYS", "7"))
+HOT_QUERY_MIN_SESSIONS = int(os.getenv("HOT_QUERY_MIN_SESSIONS", "3"))
+HOT_QUERIES_TTL = 60.0
+
+# Hot queries are what users typed, so the apps only show them as Quick
+# Suggestions when the operator opts in; they are prefetched either way
+HOT_QUERY_SUGGESTIONS = os.getenv("HOT_QUERY_SUGGESTIONS", "0") == "1"
+
+# Prefetched answers use the sidebar defaults, which most clicks keep
+PREFETCH_SETTINGS = {
+    "search_depth": "Standard",
+    "search_type": "General",
+    "time_filter": "Any time",
+    "language": "English"
+}
+
+# Seconds between checks while other requests are queued for the Groq key
+IDLE_POLL = 5.0
+
+_hot_lock = threading.Lock()
+_hot = {}
+
+
+def hot_queries(limit=PREFETCH_QUERIES):
+    """Most searched recent queries, topped up with the default Quick Suggestions
+
+    Read from the history store at most once a minute, since the apps call
+    this on every rerun to label the suggestion buttons.
+    """
+    with _hot_lock:
+        cached = _hot.get(limit)
+        if cached is not None and time.time() - cached[0] < HOT_QUERIES_TTL:
+            return list(cached[1])
+
+    since = time.time() - HOT_QUERY_DAYS * 86400
+    queries = [query for query, _ in get_history_store().top_queries(limit, since, HOT_QUERY_MIN_SESSIONS)]
+    taken = {query.lower() for query in queries}
+    for suggestion in QUICK_SUGGESTIONS:
+        if len(queries) >= limit:
+            break
+        if suggestion.lower() not in taken:
+            queries.append(suggestion)
+
+    with _hot_lock:
+        _hot[limit] = (time.time(), queries)
+    return list(queries)
+
+
+def _try_lock(path):
+    """Exclusive lock on a file without blocking; the open file, or None if another process holds it
+
+    The operating system releases the lock when the holder exits.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lock_file = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class Prefetcher:
+    """Keep fresh answers to the hot queries in the semantic answer cache
+
+    A background thread checks the hot queries every ``interval`` seconds
+    and runs the ones whose cached answer is missing or older than
+    ``max_age`` through the engine. Their Groq and search requests go out at
+    background priority and only when no other request is queued for the
+    key, so prefetching never delays a user's search. A click on a hot query
+    is then served from the answer cache, which every process shares.
+
+    Of all the processes that start one, only the holder of ``lock_path``
+    runs cycles, so Groq usage does not grow with the number of workers.
+    """
+
+    def __init__(self, api_key, interval=PREFETCH_INTERVAL, max_age=PREFETCH_MAX_AGE,
+                 model_name=PREFETCH_MODEL, limit=PREFETCH_QUERIES, lock_path=PREFETCH_LOCK_PATH):
+        self.api_key = api_key
+        self.interval = interval
+        self.max_age = max_age
+        self.model_name = model_name
+        self.limit = limit
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.queries = []
+        self.refreshed = 0
+        self.fresh = 0
+        self.errors = 0
+        self.last_cycle = None
+        self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def is_leader(self):
+        """Whether this process holds the prefetch lock, taking it if it is free"""
+        if self._lock_file is None:
+            self._lock_file = _try_lock(self.lock_path)
+        return self._lock_file is not None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader():
+                    self.run_cycle()
+            except Exception as e:
+                logger.warning("Prefetch cycle failed: %s", e)
+            self._stop.wait(self.interval)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _wait_until_idle(self):
+        """Block while interactive or batch requests are queued for this Groq key"""
+        upstream = get_scheduler().upstream(groq_upstream(self.api_key))
+        while not self._stop.is_set() and upstream.stats()["queue_depth"]:
+            self._stop.wait(IDLE_POLL)
+
+    def run_cycle(self):
+        """Refresh every hot query whose cached answer is missing or too old"""
+        # The engine is heavy; this thread loads it, not the app's first render
+        from engine import get_answer_cache, run_query
+
+        answer_cache = get_answer_cache()
+        if answer_cache is None:
+            logger.info("Prefetch skipped: the answer cache is unavailable")
+            return
+        queries = hot_queries(self.limit)
+        for query in queries:
+            if self._stop.is_set():
+                break
+            cached = answer_cache.lookup(query, **PREFETCH_SETTINGS)
+            if cached is not None and time.time() - cached["created"] < self.max_age:
+                with self._lock:
+                    self.fresh += 1
+                continue
+            self._wait_until_idle()
+            try:
+                run_query(
+                    query,
+                    self.api_key,
+                    self.model_name,
+                    priority=PRIORITY_BACKGROUND,
+                    refresh_answer_cache=True,
+                    record_analytics=False,
+                    **PREFETCH_SETTINGS
+                )
+                with self._lock:
+                    self.refreshed += 1
+            except Exception as e:
+                logger.warning("Prefetch of %r failed: %s", query, e)
+                with self._lock:
+                    self.errors += 1
+        with self._lock:
+            self.queries = queries
+            self.last_cycle = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": list(self.queries),
+                "refreshed": self.refreshed,
+                "already_fresh": self.fresh,
+                "errors": self.errors,
+                "last_cycle": self.last_cycle,
+                "interval": self.interval,
+                "leader": self._lock_file is not None
+            }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def start_prefetcher(api_key=None):
+    """Start the process-wide prefetcher once; None if disabled or there is no server-side Groq key"""
+    global _prefetcher
+    api_key = api_key or os.getenv("GROQ_API_KEY", "")
+    if not PREFETCH_ENABLED or not api_key:
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(api_key).start()
+        return _prefetcher
+
+
+def get_prefetcher():
+    """The running prefetcher, or None"""
+    with _prefetcher_lock:
+        return _prefetcher
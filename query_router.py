@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+
+ROUTING_ENABLED = os.getenv("QUERY_ROUTING", "1") != "0"
+
+# Paths a query can take through the pipeline
+PATH_CACHED = "cached"
+PATH_QUICK = "quick"
+PATH_WIKIPEDIA = "wikipedia"
+PATH_ARXIV = "arxiv"
+PATH_NEWS = "news"
+PATH_AGENT = "agent"
+# Answered from the evidence of earlier turns (see conversation.py)
+PATH_FOLLOW_UP = "follow_up"
+PATHS = (PATH_CACHED, PATH_FOLLOW_UP, PATH_QUICK, PATH_WIKIPEDIA, PATH_ARXIV, PATH_NEWS, PATH_AGENT)
+
+# Tool that answers each direct path on its own
+DIRECT_TOOLS = {
+    PATH_WIKIPEDIA: "wikipedia",
+    PATH_ARXIV: "arxiv",
+    PATH_NEWS: "WebSearch"
+}
+
+# Depths whose simple queries skip the agent; Deep always gets the full search
+ROUTED_DEPTHS = ("Quick", "Standard")
+
+# Longer queries are assumed to need more than one lookup
+MAX_DIRECT_WORDS = 12
+
+ARXIV_ID_RE = re.compile(r"(?:\barxiv[:\s]*)?\b(\d{4}\.\d{4,5}(?:v\d+)?)\b", re.IGNORECASE)
+
+# Questions that compare, explain or ask for advice need several sources and reasoning
+COMPLEX_RE = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference|differences|pros and cons|advantages|disadvantages|"
+    r"why|how (do|does|did|can|could|would|should|to)|impact|affect|affects|effect of|relationship|"
+    r"analy[sz]e|evaluate|recommend|should i|best way|step by step)\b",
+    re.IGNORECASE
+)
+
+NEWS_RE = re.compile(
+    r"\b(news|latest|breaking|today|tonight|yesterday|this (week|month|year)|currently|recent|recently|"
+    r"headlines?|announced|announcement|updates?)\b",
+    re.IGNORECASE
+)
+
+# "What is X", "who was X", "history of X", "X basics" and the like
+ENCYCLOPEDIA_PREFIX_RE = re.compile(
+    r"^(what|who) (is|are|was|were)( an?| the)?\s+|"
+    r"^(define|definition of|meaning of|history of|tell me about|overview of|introduction to)\s+",
+    re.IGNORECASE
+)
+ENCYCLOPEDIA_SUFFIX_RE = re.compile(r"\s+(basics|overview|definition|history|biography|explained|wiki)$", re.IGNORECASE)
+
+
+def classify(query, search_type="General", time_filter="Any time"):
+    """(path, tool input) for a query, using keyword rules only (no LLM call)
+
+    arXiv IDs go to ArXiv, news-type queries to web search and encyclopedia
+    questions to Wikipedia; anything longer, comparative or open-ended goes
+    to the agent.
+    """
+    text = " ".join(query.split()).rstrip("?.! ")
+    if not text or len(text.split()) > MAX_DIRECT_WORDS or query.count("?") > 1 or COMPLEX_RE.search(text):
+        return PATH_AGENT, query
+
+    arxiv_ids = ARXIV_ID_RE.findall(text)
+    if len(arxiv_ids) == 1:
+        return PATH_ARXIV, arxiv_ids[0]
+    if arxiv_ids:
+        return PATH_AGENT, query
+
+    if search_type == "News" or time_filter != "Any time" or NEWS_RE.search(text):
+        return PATH_NEWS, text
+
+    if search_type in ("General", "Technical"):
+        topic = ENCYCLOPEDIA_SUFFIX_RE.sub("", ENCYCLOPEDIA_PREFIX_RE.sub("", text))
+        if topic != text and topic:
+            return PATH_WIKIPEDIA, topic
+
+    return PATH_AGENT, query
+
+
+class RouteStats:
+    """Count of queries per path, plus direct lookups that fell back to the agent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(PATHS, 0)
+        self.fallbacks = 0
+
+    def record(self, path):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        """Queries and share of traffic per path"""
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                "total": total,
+                "paths": {
+                    path: {"queries": count, "fraction": count / total if total else 0.0}
+                    for path, count in self.counts.items()
+                },
+                "direct_fallbacks": self.fallbacks
+            }
+
+
+_route_stats = None
+_route_stats_lock = threading.Lock()
+
+
+def get_route_stats():
+    """Process-wide per-path query counts"""
+    global _route_stats
+    with _route_stats_lock:
+        if _route_stats is None:
+            _route_stats = RouteStats()
+        return _route_stats
@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from evidence import EVIDENCE_PASSAGES, select_passages
+
+# Per-source timeouts in seconds, keyed by tool name
+SOURCE_TIMEOUTS = {
+    "local_memory": 2.0,
+    "WebSearch": 8.0,
+    "arxiv": 10.0,
+    "wikipedia": 6.0,
+    "document_search": 2.0
+}
+DEFAULT_TIMEOUT = 10.0
+
+SOURCE_LABELS = {
+    "local_memory": "Local",
+    "WebSearch": "Web",
+    "arxiv": "ArXiv",
+    "wikipedia": "Wikipedia",
+    "document_search": "Docs"
+}
+
+# Tool outputs that mean "nothing found" and carry no evidence
+EMPTY_RESULT_PREFIXES = ("No relevant local results", "No good")
+
+# Shared across queries; a source that times out keeps its worker until the
+# remote call returns, so the pool is sized for a few stuck calls per source.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUICK_SEARCH_WORKERS", "16")),
+    thread_name_prefix="quick-search"
+)
+
+SYNTHESIS_PROMPT = """You are a research assistant. Answer the question using only the evidence below.
+Cite the source of each claim with the bracketed label of the passage it comes from, e.g. [ArXiv: <title>] or [Web].
+If the evidence is insufficient, say so briefly.
+
+Question: {query}
+Search Type: {search_type}
+
+Evidence:
+{evidence}
+
+Answer:"""
+
+
+def _run_tool(tool, query, callbacks=None):
+    """Run one tool and time it"""
+    start = time.perf_counter()
+    content = tool.run(query, callbacks=callbacks)
+    return content, time.perf_counter() - start
+
+
+def fan_out(tools, query, timeouts=None, callbacks=None):
+    """Query every tool at the same time and collect whatever returns in time
+
+    Each source is waited on until its own deadline, so the total wait is the
+    slowest source (capped by its timeout) rather than the sum of all of them.
+    Returns one dict per tool with ``source``, ``content``, ``error`` and ``elapsed``.
+    """
+    timeouts = timeouts or SOURCE_TIMEOUTS
+    start = time.perf_counter()
+    # Each worker runs in a copy of the caller's context so the request priority carries over
+    futures = [
+        (tool, _executor.submit(contextvars.copy_context().run, _run_tool, tool, query, callbacks))
+        for tool in tools
+    ]
+
+    results = []
+    for tool, future in futures:
+        deadline = start + timeouts.get(tool.name, DEFAULT_TIMEOUT)
+        try:
+            content, elapsed = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+            results.append({"source": tool.name, "content": content, "error": None, "elapsed": elapsed})
+        except FutureTimeout:
+            future.cancel()
+            results.append({
+                "source": tool.name,
+                "content": "",
+                "error": "timeout",
+                "elapsed": time.perf_counter() - start
+            })
+        except Exception as e:
+            results.append({
+                "source": tool.name,
+                "content": "",
+                "error": str(e),
+                "elapsed": time.perf_counter() - start
+            })
+    return results
+
+
+async def _arun_tool(tool, query, callbacks=None):
+    """Run one tool on the event loop and time it"""
+    start = time.perf_counter()
+    content = await tool.arun(query, callbacks=callbacks)
+    return content, time.perf_counter() - start
+
+
+async def afan_out(tools, query, timeouts=None, callbacks=None):
+    """Async fan_out: every source is a task on the event loop instead of a pool thread"""
+    timeouts = timeouts or SOURCE_TIMEOUTS
+    start = time.perf_counter()
+
+    async def one(tool):
+        try:
+            content, elapsed = await asyncio.wait_for(
+                _arun_tool(tool, query, callbacks), timeout=timeouts.get(tool.name, DEFAULT_TIMEOUT)
+            )
+            return {"source": tool.name, "content": content, "error": None, "elapsed": elapsed}
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = str(e)
+        return {"source": tool.name, "content": "", "error": error, "elapsed": time.perf_counter() - start}
+
+    return list(await asyncio.gather(*(one(tool) for tool in tools)))
+
+
+def usable_results(results):
+    """Tool results that carry evidence (no error, not a "nothing found" message)"""
+    return [
+        result for result in results
+        if not result["error"] and result["content"] and not result["content"].startswith(EMPTY_RESULT_PREFIXES)
+    ]
+
+
+def format_evidence(results, query, k=EVIDENCE_PASSAGES):
+    """The top-k evidence passages for the query as labelled blocks
+
+    Passages are deduplicated across sources and ranked by BM25 (see
+    evidence.py); each is labelled with its source and document title so
+    the answer can cite exactly where a claim came from. With ``k=0`` every
+    tool output is included whole under its source label.
+    """
+    results = usable_results(results)
+    if k <= 0:
+        return "\n\n".join(
+            f"[{SOURCE_LABELS.get(result['source'], result['source'])}]\n{result['content'].strip()}"
+            for result in results
+        )
+    blocks = []
+    for passage in select_passages(query, results, k):
+        label = SOURCE_LABELS.get(passage["source"], passage["source"])
+        if passage["title"]:
+            label = f"{label}: {passage['title']}"
+        header = f"[{label}]"
+        if passage["also_in"]:
+            header += " (also in " + ", ".join(SOURCE_LABELS.get(s, s) for s in passage["also_in"]) + ")"
+        blocks.append(f"{header}\n{passage['text']}")
+    return "\n\n".join(blocks)
+
+
+def synthesize(llm, query, results, search_type="General", callbacks=None):
+    """Answer from the best evidence passages with a single LLM call"""
+    evidence = format_evidence(results, query) or "No evidence was returned by any source."
+    prompt = SYNTHESIS_PROMPT.format(query=query, search_type=search_type, evidence=evidence)
+    message = llm.invoke(prompt, config={"callbacks": callbacks or []})
+    return getattr(message, "content", message)
+
+
+async def asynthesize(llm, query, results, search_type="General", callbacks=None):
+    """Async synthesize"""
+    evidence = format_evidence(results, query) or "No evidence was returned by any source."
+    prompt = SYNTHESIS_PROMPT.format(query=query, search_type=search_type, evidence=evidence)
+    message = await llm.ainvoke(prompt, config={"callbacks": callbacks or []})
+    return getattr(message, "content", message)
+
+
+def quick_search(llm, tools, query, search_type="General", callbacks=None, timeouts=None):
+    """Parallel fan-out over all tools followed by one synthesis call"""
+    results = fan_out(tools, query, timeouts, callbacks)
+    answer = synthesize(llm, query, results, search_type, callbacks)
+    return {"output": answer, "sources": results}
+
+
+async def aquick_search(llm, tools, query, search_type="General", callbacks=None, timeouts=None):
+    """Async quick_search"""
+    results = await afan_out(tools, query, timeouts, callbacks)
+    answer = await asynthesize(llm, query, results, search_type, callbacks)
+    return {"output": answer, "sources": results}
+
+
+def direct_search(llm, tool, tool_input, query, search_type="General", callbacks=None, timeouts=None):
+    """One tool followed by one synthesis call; None if the tool found nothing, so the caller can fall back"""
+    results = fan_out([tool], tool_input, timeouts, callbacks)
+    if not usable_results(results):
+        return None
+    answer = synthesize(llm, query, results, search_type, callbacks)
+    return {"output": answer, "sources": results}
+
+
+async def adirect_search(llm, tool, tool_input, query, search_type="General", callbacks=None, timeouts=None):
+    """Async direct_search"""
+    results = await afan_out([tool], tool_input, timeouts, callbacks)
+    if not usable_results(results):
+        return None
+    answer = await asynthesize(llm, query, results, search_type, callbacks)
+    return {"output": answer, "sources": results}
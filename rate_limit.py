@@ -0,0 +1,404 @@
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+import httpx
+
+# Request priorities; lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+
+# Requests per second and burst size per upstream. Groq limits are per API
+# key (the free tier allows 30 requests a minute); arXiv asks for at most one
+# request every three seconds. Override with e.g. RATE_LIMIT_GROQ="2,60".
+UPSTREAM_LIMITS = {
+    "groq": (0.5, 30),
+    "duckduckgo": (1.0, 5),
+    "arxiv": (0.34, 2),
+    "wikipedia": (10.0, 20)
+}
+DEFAULT_LIMIT = (5.0, 10)
+
+# Upstream of the search tools' requests, keyed by host suffix
+HOST_UPSTREAMS = {
+    "duckduckgo.com": "duckduckgo",
+    "arxiv.org": "arxiv",
+    "wikipedia.org": "wikipedia",
+    "groq.com": "groq"
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+# Priority of the requests made by the current query; set by the engine
+current_priority = contextvars.ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+# Wall-clock deadline (time.monotonic) of the current query; set by the engine
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Run the enclosed calls (and the tasks they start) at a priority"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+@contextlib.contextmanager
+def query_deadline(seconds):
+    """Let the enclosed calls (and the tasks they start) know how much of the query's budget is left"""
+    token = current_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def _past_deadline(delay):
+    """Whether waiting ``delay`` seconds would overrun the current query's deadline"""
+    deadline = current_deadline.get()
+    return deadline is not None and time.monotonic() + delay > deadline
+
+
+def _limit(kind):
+    value = os.getenv(f"RATE_LIMIT_{kind.upper()}")
+    if value:
+        rate, burst = value.split(",")
+        return float(rate), int(burst)
+    return UPSTREAM_LIMITS.get(kind, DEFAULT_LIMIT)
+
+
+def groq_upstream(api_key):
+    """Upstream name of one Groq API key (hashed, never the raw key)"""
+    return "groq:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def upstream_for_host(host):
+    for suffix, name in HOST_UPSTREAMS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return name
+    return host
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def retry_after_seconds(response):
+    """Retry-After header as seconds (delta or HTTP date), or None"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Token bucket; ``pause`` holds every caller back while an upstream is throttling us"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds, now):
+        self._refill(now)
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class _Waiter:
+    """A caller queued for a token, woken by a thread event or a future on its loop"""
+
+    _seq = itertools.count()
+
+    def __init__(self, priority, loop=None):
+        self.key = (priority, next(self._seq))
+        self.priority = priority
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = None
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+
+class Upstream:
+    """Token bucket plus a priority queue of the callers waiting for it
+
+    Only the caller at the head of the queue waits for the bucket; everyone
+    else sleeps until they become the head, so a higher-priority request that
+    arrives later is served before queued lower-priority ones.
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self._lock = threading.Lock()
+        self._waiters = []
+        self.granted = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.max_depth = 0
+
+    def _enqueue(self, waiter):
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+            self.max_depth = max(self.max_depth, len(self._waiters))
+
+    def _poll(self, waiter):
+        """0 when the waiter got its token, seconds to wait, or None if it is not the head"""
+        with self._lock:
+            if self._waiters[0] is not waiter:
+                return None
+            wait = self.bucket.wait_time(time.monotonic())
+            if wait > 0:
+                return wait
+            self.bucket.take()
+            heapq.heappop(self._waiters)
+            self.granted += 1
+            if self._waiters:
+                self._waiters[0].wake()
+            return 0
+
+    def _remove(self, waiter):
+        with self._lock:
+            if waiter in self._waiters:
+                was_head = self._waiters[0] is waiter
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                if was_head and self._waiters:
+                    self._waiters[0].wake()
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """Block until a token is granted"""
+        start = time.monotonic()
+        waiter = _Waiter(priority)
+        self._enqueue(waiter)
+        try:
+            while True:
+                wait = self._poll(waiter)
+                if wait == 0:
+                    break
+                waiter.event.wait(wait)
+                waiter.event.clear()
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._record_wait(start)
+
+    async def acquire_async(self, priority=PRIORITY_INTERACTIVE):
+        """Wait for a token without blocking the event loop"""
+        start = time.monotonic()
+        waiter = _Waiter(priority, asyncio.get_running_loop())
+        self._enqueue(waiter)
+        try:
+            while True:
+                waiter.future = waiter.loop.create_future()
+                wait = self._poll(waiter)
+                if wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.future, wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._record_wait(start)
+
+    def _record_wait(self, start):
+        with self._lock:
+            self.wait_seconds += time.monotonic() - start
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def throttle(self, seconds):
+        """Pause the bucket after a 429 so every caller of this upstream backs off"""
+        with self._lock:
+            self.throttled += 1
+            self.bucket.pause(seconds, time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            depth = {}
+            for waiter in self._waiters:
+                depth[waiter.priority] = depth.get(waiter.priority, 0) + 1
+            return {
+                "queue_depth": len(self._waiters),
+                "queue_depth_by_priority": depth,
+                "max_queue_depth": self.max_depth,
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "avg_wait": self.wait_seconds / self.granted if self.granted else 0.0,
+                "tokens": round(max(0.0, self.bucket.tokens), 2)
+            }
+
+
+class RateLimitScheduler:
+    """Process-wide registry of upstreams, created on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upstreams = {}
+
+    def upstream(self, name):
+        with self._lock:
+            if name not in self._upstreams:
+                rate, burst = _limit(name.split(":", 1)[0])
+                self._upstreams[name] = Upstream(name, rate, burst)
+            return self._upstreams[name]
+
+    def stats(self):
+        """Live queue depth and counters per upstream"""
+        with self._lock:
+            upstreams = list(self._upstreams.values())
+        return {upstream.name: upstream.stats() for upstream in upstreams}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide rate limit scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that takes a token before each request and retries 429/5xx
+
+    With ``upstream=None`` the upstream is picked from the request host, which
+    suits a client shared by several search APIs.
+    """
+
+    def __init__(self, upstream=None, transport=None, max_retries=MAX_RETRIES):
+        self.upstream = upstream
+        self.max_retries = max_retries
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        upstream = get_scheduler().upstream(self.upstream or upstream_for_host(request.url.host))
+        attempt = 0
+        while True:
+            upstream.acquire(current_priority.get())
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError:
+                delay = backoff_delay(attempt)
+                if attempt >= self.max_retries or _past_deadline(delay):
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, retry_after_seconds(response))
+                if response.status_code == 429:
+                    upstream.throttle(delay)
+                # A retry the query cannot wait for is no use to it
+                if _past_deadline(delay):
+                    return response
+                response.close()
+            upstream.record_retry()
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async RateLimitedTransport"""
+
+    def __init__(self, upstream=None, transport=None, max_retries=MAX_RETRIES):
+        self.upstream = upstream
+        self.max_retries = max_retries
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        upstream = get_scheduler().upstream(self.upstream or upstream_for_host(request.url.host))
+        attempt = 0
+        while True:
+            await upstream.acquire_async(current_priority.get())
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                delay = backoff_delay(attempt)
+                if attempt >= self.max_retries or _past_deadline(delay):
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, retry_after_seconds(response))
+                if response.status_code == 429:
+                    upstream.throttle(delay)
+                if _past_deadline(delay):
+                    return response
+                await response.aclose()
+            upstream.record_retry()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
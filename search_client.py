@@ -0,0 +1,79 @@
+import json
+import os
+
+import httpx
+
+SEARCH_SERVICE_URL = os.getenv("SEARCH_SERVICE_URL", "")
+SEARCH_SERVICE_TIMEOUT = float(os.getenv("SEARCH_SERVICE_TIMEOUT", "180"))
+# Shared secret of the service (its SEARCH_SERVICE_TOKEN), sent as a bearer token
+SEARCH_SERVICE_TOKEN = os.getenv("SEARCH_SERVICE_TOKEN", "")
+
+_client = None
+
+
+def _get_client():
+    """Shared HTTP client so calls to the service reuse connections"""
+    global _client
+    if _client is None:
+        headers = {"Authorization": f"Bearer {SEARCH_SERVICE_TOKEN}"} if SEARCH_SERVICE_TOKEN else None
+        _client = httpx.Client(timeout=httpx.Timeout(SEARCH_SERVICE_TIMEOUT, connect=10.0), headers=headers)
+    return _client
+
+
+def iter_events(response):
+    """Parse Server-Sent Events frames into dicts"""
+    for line in response.iter_lines():
+        if line.startswith("data: "):
+            yield json.loads(line[len("data: "):])
+
+
+def fetch_analytics(base_url=SEARCH_SERVICE_URL):
+    """Dashboard aggregates from the service, which records the queries it runs"""
+    response = _get_client().get(f"{base_url.rstrip('/')}/analytics", timeout=5.0)
+    response.raise_for_status()
+    return response.json()
+
+
+def run_remote_query(
+    query,
+    api_key,
+    model_name,
+    search_depth="Standard",
+    search_type="General",
+    time_filter="Any time",
+    max_results=None,
+    language="English",
+    on_token=None,
+    on_status=None,
+    session_id=None,
+    base_url=SEARCH_SERVICE_URL
+):
+    """Same contract as engine.run_query, served by the search service over SSE"""
+    payload = {
+        "query": query,
+        "api_key": api_key,
+        "model_name": model_name,
+        "search_depth": search_depth,
+        "search_type": search_type,
+        "time_filter": time_filter,
+        "max_results": max_results,
+        "language": language,
+        "session_id": session_id,
+        "stream": True
+    }
+    answer = ""
+    with _get_client().stream("POST", f"{base_url.rstrip('/')}/search", json=payload) as response:
+        response.raise_for_status()
+        for event in iter_events(response):
+            kind = event.pop("event", None)
+            if kind == "status" and on_status:
+                on_status(event["message"], event["progress"])
+            elif kind in ("token", "reset"):
+                answer = answer + event["delta"] if kind == "token" else event["text"]
+                if on_token:
+                    on_token(answer)
+            elif kind == "result":
+                return event
+            elif kind == "error":
+                raise RuntimeError(event["message"])
+    raise RuntimeError("Search service closed the stream without a result")
@@ -0,0 +1,198 @@
+import asyncio
+import hmac
+import json
+import os
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+import engine
+from analytics import get_analytics
+from async_tools import aclose_async_client
+from model_router import get_model_router
+from prefetch import get_prefetcher, start_prefetcher
+from query_router import get_route_stats
+from rate_limit import PRIORITY_INTERACTIVE, get_scheduler
+
+app = FastAPI(title="AI Search Pro - Search Service")
+
+SERVICE_HOST = os.getenv("SEARCH_SERVICE_HOST", "0.0.0.0")
+
+# Shared secret callers send as "Authorization: Bearer <token>"; once set, /search requires it
+SERVICE_TOKEN = os.getenv("SEARCH_SERVICE_TOKEN", "")
+
+# Only trusted callers (with the token, or any caller of a service bound to
+# loopback) may search with the server's GROQ_API_KEY or pick a priority
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+class SearchRequest(BaseModel):
+    query: str
+    api_key: Optional[str] = None
+    model_name: str = "llama3-8b-8192"
+    search_depth: str = "Standard"
+    search_type: str = "General"
+    time_filter: str = "Any time"
+    max_results: Optional[int] = None
+    language: str = "English"
+    priority: Optional[int] = None
+    # Follow-ups of a conversation are answered from its earlier evidence when possible
+    session_id: Optional[str] = None
+    stream: bool = True
+
+
+def _sse(event):
+    """Encode one event as a Server-Sent Events frame"""
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def _event_stream(request, api_key, priority):
+    """Run the async pipeline as a task on this loop and relay its events as SSE"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    sent = {"text": ""}
+
+    # LangChain may still call sync handlers from executor threads, so events
+    # are always handed to the loop thread-safely
+    def emit(event):
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def on_token(text):
+        # The handler reports the answer so far; only forward what is new.
+        # A later LLM call (the agent after the follow-up call, a synthesis or
+        # a hedge winner) starts a new answer, which replaces the old one.
+        if text.startswith(sent["text"]):
+            delta = text[len(sent["text"]):]
+            if delta:
+                emit({"event": "token", "delta": delta})
+        else:
+            emit({"event": "reset", "text": text})
+        sent["text"] = text
+
+    def on_status(message, progress):
+        emit({"event": "status", "message": message, "progress": progress})
+
+    async def worker():
+        try:
+            result = await engine.arun_query(
+                request.query,
+                api_key,
+                request.model_name,
+                search_depth=request.search_depth,
+                search_type=request.search_type,
+                time_filter=request.time_filter,
+                max_results=request.max_results,
+                language=request.language,
+                priority=priority,
+                session_id=request.session_id,
+                on_token=on_token,
+                on_status=on_status
+            )
+            emit({"event": "result", **result})
+        except Exception as e:
+            emit({"event": "error", "message": str(e)})
+        finally:
+            emit(None)
+
+    task = asyncio.create_task(worker())
+    while True:
+        event = await queue.get()
+        if event is None:
+            break
+        yield _sse(event)
+    await task
+
+
+@app.on_event("startup")
+async def startup():
+    # Every worker starts one; only the worker holding the prefetch lock runs it
+    start_prefetcher()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await aclose_async_client()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "tools": [tool.name for tool in engine.setup_tools()]}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Live queue depth per upstream (Groq keys are hashed), latency histograms per model, traffic per query path
+    and the prefetcher's hot queries"""
+    prefetcher = get_prefetcher()
+    return {
+        "upstreams": get_scheduler().stats(),
+        "models": get_model_router().stats(),
+        "routes": get_route_stats().stats(),
+        "prefetch": prefetcher.stats() if prefetcher is not None else None
+    }
+
+
+def _is_trusted(authorization):
+    """Whether the caller presented the service token, or the service only listens on loopback"""
+    if SERVICE_TOKEN:
+        return hmac.compare_digest((authorization or "").encode(), f"Bearer {SERVICE_TOKEN}".encode())
+    return SERVICE_HOST in LOOPBACK_HOSTS
+
+
+@app.get("/analytics")
+async def analytics():
+    """Dashboard aggregates of the queries this service ran (every worker shares the analytics DB)"""
+    return await asyncio.to_thread(get_analytics().snapshot)
+
+
+@app.post("/search")
+async def search(request: SearchRequest, authorization: Optional[str] = Header(None)):
+    trusted = _is_trusted(authorization)
+    if SERVICE_TOKEN and not trusted:
+        raise HTTPException(status_code=401, detail="Invalid or missing service token")
+    api_key = request.api_key or (os.getenv("GROQ_API_KEY", "") if trusted else "")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="A Groq API key is required")
+    # Nobody goes ahead of interactive searches; untrusted callers cannot choose
+    priority = PRIORITY_INTERACTIVE
+    if trusted and request.priority is not None:
+        priority = max(PRIORITY_INTERACTIVE, request.priority)
+
+    if not request.stream:
+        try:
+            result = await engine.arun_query(
+                request.query,
+                api_key,
+                request.model_name,
+                search_depth=request.search_depth,
+                search_type=request.search_type,
+                time_filter=request.time_filter,
+                max_results=request.max_results,
+                language=request.language,
+                priority=priority,
+                session_id=request.session_id
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        return JSONResponse(result)
+
+    return StreamingResponse(
+        _event_stream(request, api_key, priority),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Each worker is an independent process with its own pools and caches;
+    # put several behind a load balancer to scale search apart from the UI.
+    uvicorn.run(
+        "server:app",
+        host=SERVICE_HOST,
+        port=int(os.getenv("SEARCH_SERVICE_PORT", "8000")),
+        workers=int(os.getenv("SEARCH_SERVICE_WORKERS", "4"))
+    )
@@ -0,0 +1,25 @@
+import re
+
+# Near-duplicate text is found by comparing sets of word 3-grams
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def words(text):
+    """Lowercased words of a text"""
+    return _WORD_RE.findall(str(text).lower())
+
+
+def sentences(text):
+    """Sentences of a line or paragraph, split after . ! and ?"""
+    return [sentence for sentence in _SENTENCE_RE.split(text.strip()) if sentence]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Word n-grams of a text as tuples; a text shorter than ``size`` words is one shingle"""
+    tokens = words(text)
+    if len(tokens) < size:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
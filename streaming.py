@@ -0,0 +1,54 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Stream the final-answer tokens of an agent run as they arrive
+
+    ReAct steps stream their Thought/Action text too, so tokens are only
+    forwarded once ``answer_prefix`` has appeared in the current LLM call.
+    With ``answer_prefix=None`` every token is forwarded, which suits a
+    single synthesis call. ``on_text`` receives the answer text so far.
+    """
+
+    # Cheap enough to run on the event loop in async runs instead of an executor thread
+    run_inline = True
+
+    def __init__(self, on_text, answer_prefix=FINAL_ANSWER_PREFIX, start_time=None):
+        self.on_text = on_text
+        self.answer_prefix = answer_prefix
+        self.start_time = start_time if start_time is not None else time.time()
+        self.first_token_time = None
+        self.answer = ""
+        self._buffer = ""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._buffer = ""
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._buffer = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        self._buffer += token
+        if self.answer_prefix is None:
+            answer = self._buffer
+        elif self.answer_prefix in self._buffer:
+            answer = self._buffer.split(self.answer_prefix, 1)[1].lstrip()
+        else:
+            return
+        if not answer:
+            return
+        if self.first_token_time is None:
+            self.first_token_time = time.time()
+        self.answer = answer
+        self.on_text(answer)
+
+    @property
+    def time_to_first_token(self):
+        """Seconds from query start to the first visible answer token, or None"""
+        if self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("langchain_core")
+
+import async_tools
+from async_tools import HTTPSearchTool, WebSearchTool
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _page(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return httpx.Response(200, text=f.read())
+
+
+def test_web_search_parses_organic_snippets_and_skips_ads():
+    output = WebSearchTool(top_k_results=2)._parse(_page("duckduckgo_results.html"))
+    assert output == (
+        "We introduce sparse factorizations of the attention matrix which reduce this to O(n'√n). "
+        "Local windows & global tokens keep the cost linear."
+    )
+
+
+def test_web_search_reports_no_results():
+    output = WebSearchTool()._parse(_page("duckduckgo_no_results.html"))
+    assert output == "No good DuckDuckGo Search Result was found"
+
+
+def test_unrecognized_results_page_is_an_error_not_an_empty_search():
+    output = WebSearchTool()._parse(httpx.Response(200, text="<html><body>Unexpected layout</body></html>"))
+    assert output == "DuckDuckGo exception: unrecognized results page"
+
+
+def test_failed_request_is_returned_to_the_agent(monkeypatch):
+    def fail(request):
+        raise httpx.ConnectError("unreachable", request=request)
+
+    class EchoTool(HTTPSearchTool):
+        name: str = "echo"
+        description: str = "Echo"
+
+        def _request(self, query):
+            return "GET", "http://example.invalid/", {}
+
+        def _parse(self, response):
+            return response.text
+
+    monkeypatch.setattr(async_tools, "_sync_client", httpx.Client(transport=httpx.MockTransport(fail)))
+    assert EchoTool().run("query") == "echo exception: unreachable"
+
+
+def test_base_tool_cannot_be_used_without_a_request_and_parser():
+    with pytest.raises(TypeError):
+        HTTPSearchTool(name="base", description="Base")
@@ -0,0 +1,66 @@
+import pytest
+
+from conversation import ConversationStore, is_follow_up, parse_follow_up
+
+TURNS = [{"query": "recent papers on sparse attention", "answer": "Two papers ...", "evidence": []}]
+
+
+@pytest.mark.parametrize("query", [
+    "tell me more about the second paper",
+    "What about the first one?",
+    "And how fast is it?",
+    "Why?",
+    "What did the second paper find?",
+    "Is the first better?",
+    "How does it work?",
+    "What are its main applications?",
+    "Compare them"
+])
+def test_follow_ups(query):
+    assert is_follow_up(query, TURNS)
+
+
+@pytest.mark.parametrize("query", [
+    "Who was the first man on the moon",
+    "Is it safe to eat raw eggs",
+    "What is it like to live in Tokyo",
+    "Does it rain a lot in Seattle",
+    "Who was the last emperor of China",
+    "Why is the sky blue",
+    "What is the capital of France"
+])
+def test_standalone_questions(query):
+    assert not is_follow_up(query, TURNS)
+
+
+def test_nothing_is_a_follow_up_without_an_earlier_turn():
+    assert not is_follow_up("tell me more about the second paper", [])
+    assert not is_follow_up("How does it work?", [])
+
+
+def test_parse_follow_up():
+    assert parse_follow_up("Final Answer: It uses local attention [ArXiv: Sparse]") == (
+        "It uses local attention [ArXiv: Sparse]", None
+    )
+    assert parse_follow_up('NEED_SEARCH: "sparse attention benchmark results"\nextra') == (
+        None, "sparse attention benchmark results"
+    )
+
+
+@pytest.mark.parametrize("reply", ["The moon landing was in 1969.", "Final Answer:", "NEED_SEARCH:"])
+def test_replies_without_an_answer_search_the_original_question(reply):
+    assert parse_follow_up(reply) == (None, None)
+
+
+def test_store_keeps_the_last_turns_of_each_session():
+    store = ConversationStore(":memory:", max_turns=2)
+    evidence = [{"source": "arxiv", "content": "Title: Sparse\nSummary: local attention", "error": None}]
+    for i in range(3):
+        store.add_turn("a", f"query {i}", f"answer {i}", evidence)
+    store.add_turn("b", "other", "answer")
+    turns = store.recent("a")
+    assert [turn["query"] for turn in turns] == ["query 1", "query 2"]
+    assert turns[0]["evidence"][0]["source"] == "arxiv"
+    store.clear("a")
+    assert store.recent("a") == []
+    assert len(store.recent("b")) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from evidence import dedupe_passages, select_passages, tokenize
+from shingling import sentences, shingles, words
+
+ABSTRACT = (
+    "Transformers rely on self-attention to model long range dependencies in sequences. "
+    "We propose sparse attention that reduces quadratic cost to linear while keeping accuracy "
+    "on language modeling benchmarks."
+)
+
+
+def _result(source, content):
+    return {"source": source, "content": content, "error": None}
+
+
+def test_shingling_helpers():
+    assert words("Self-Attention, 2023!") == ["self", "attention", "2023"]
+    assert sentences("One. Two? Three!  ") == ["One.", "Two?", "Three!"]
+    assert shingles("a b c d") == {("a", "b", "c"), ("b", "c", "d")}
+    assert shingles("a b") == {("a", "b")}
+    assert tokenize("The attention of a model") == ["attention", "model"]
+
+
+def test_duplicate_keeps_the_primary_source_and_cites_the_other():
+    passages = select_passages("sparse attention", [
+        _result("WebSearch", ABSTRACT),
+        _result("arxiv", "Title: Sparse Attention Transformers\nSummary: " + ABSTRACT)
+    ])
+    assert len(passages) == 1
+    assert passages[0]["source"] == "arxiv"
+    assert passages[0]["also_in"] == ["WebSearch"]
+
+
+def test_quoting_passage_keeps_the_text_it_adds():
+    passages = select_passages("sparse attention cats", [
+        _result("WebSearch", "Blog: " + ABSTRACT + " Other stuff here about cats."),
+        _result("arxiv", "Title: Sparse Attention Transformers\nSummary: " + ABSTRACT)
+    ])
+    by_source = {passage["source"]: passage for passage in passages}
+    assert by_source["arxiv"]["also_in"] == ["WebSearch"]
+    assert by_source["WebSearch"]["text"] == "Other stuff here about cats."
+
+
+def test_short_passage_is_not_dropped_for_a_long_one_it_only_overlaps():
+    kept = dedupe_passages([
+        {"source": "arxiv", "title": None, "text": ABSTRACT},
+        {"source": "WebSearch", "title": None, "text": "Sparse attention is fast. Cats sleep sixteen hours a day."}
+    ])
+    assert [passage["source"] for passage in kept] == ["arxiv", "WebSearch"]
+    assert kept[0]["also_in"] == []
+
+
+def test_passages_are_ranked_by_bm25():
+    passages = select_passages("volcano eruption", [
+        _result("wikipedia", "Page: Volcano\nSummary: A volcano eruption releases lava and ash."),
+        _result("arxiv", "Title: Sparse Attention Transformers\nSummary: " + ABSTRACT)
+    ])
+    assert passages[0]["source"] == "wikipedia"
+    assert passages[0]["score"] > passages[1]["score"] == 0.0
@@ -0,0 +1,17 @@
+from history_store import HistoryStore
+
+
+def test_top_queries_count_sessions_not_searches():
+    store = HistoryStore(":memory:")
+    for _ in range(5):
+        store.add_search("a", "my private diagnosis", 1.0)
+    for session in ("a", "b", "c"):
+        store.add_search(session, "Latest AI developments", 1.0)
+    store.add_search("d", "  latest ai developments ", 1.0)
+    store.add_search("b", "quantum computing", 1.0)
+    store.add_search("c", "Quantum computing", 1.0)
+
+    assert store.top_queries(10) == [
+        ("Latest AI developments", 4), ("Quantum computing", 2), ("my private diagnosis", 1)
+    ]
+    assert store.top_queries(10, min_sessions=3) == [("Latest AI developments", 4)]
@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("langchain_groq")
+
+from llm_pool import LLMPool, _InUseTransport
+
+COMPLETION = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # One handler per accepted TCP connection
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests += 1
+        body = json.dumps(COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.connections = 0
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _pool(server, **kwargs):
+    return LLMPool(base_url=f"http://127.0.0.1:{server.server_address[1]}", **kwargs)
+
+
+def test_repeated_queries_reuse_one_connection(server):
+    pool = _pool(server)
+    for _ in range(5):
+        assert pool.get("key", "stub-model").invoke("ping").content == "pong"
+    assert server.requests == 5
+    assert server.connections == 1
+    assert pool.stats()["hits"] == 4
+    pool.close()
+
+
+def test_separate_keys_get_separate_connections(server):
+    pool = _pool(server)
+    for api_key in ("key-a", "key-b", "key-a", "key-b"):
+        pool.get(api_key, "stub-model").invoke("ping")
+    assert server.connections == 2
+    pool.close()
+
+
+def test_client_settings_are_part_of_the_key(server):
+    pool = _pool(server)
+    short = pool.get("key", "stub-model", timeout=30)
+    default = pool.get("key", "stub-model")
+    assert short is not default
+    assert short.request_timeout == 30
+    assert default.request_timeout is None
+    assert pool.get("key", "stub-model", timeout=30) is short
+    pool.close()
+
+
+def test_evicted_client_still_serves_its_session(server):
+    pool = _pool(server, max_size=1)
+    held = pool.get("key-a", "stub-model")
+    pool.get("key-b", "stub-model").invoke("ping")
+    assert pool.stats()["evictions"] == 1
+    # The session that got the client before the eviction can finish its query
+    assert held.invoke("ping").content == "pong"
+    pool.close()
+
+
+class _RecordingTransport(httpx.BaseTransport):
+    def __init__(self):
+        self.closed = False
+
+    def handle_request(self, request):
+        return httpx.Response(200, stream=httpx.ByteStream(b"streamed body"), request=request)
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_waits_for_requests_in_flight():
+    inner = _RecordingTransport()
+    transport = _InUseTransport(inner)
+    client = httpx.Client(transport=transport)
+    with client.stream("POST", "http://stub/chat") as response:
+        assert transport.in_flight() == 1
+        transport.close_when_idle()
+        assert not inner.closed
+        assert response.read() == b"streamed body"
+    assert transport.in_flight() == 0
+    assert inner.closed
+
+
+def test_close_is_immediate_when_idle():
+    inner = _RecordingTransport()
+    transport = _InUseTransport(inner)
+    httpx.Client(transport=transport).get("http://stub/")
+    transport.close_when_idle()
+    assert inner.closed
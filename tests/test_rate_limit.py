@@ -0,0 +1,133 @@
+import email.utils
+import threading
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import rate_limit
+from benchmarks.fake_upstream import FakeUpstream
+from rate_limit import (
+    BACKOFF_CAP,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RateLimitedTransport,
+    Upstream,
+    backoff_delay,
+    get_scheduler,
+    query_deadline,
+    retry_after_seconds
+)
+
+
+def _response(retry_after):
+    return httpx.Response(429, headers={"Retry-After": retry_after})
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(_response("3")) == 3.0
+    assert retry_after_seconds(_response("-5")) == 0.0
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < retry_after_seconds(_response(date)) <= 30
+    assert retry_after_seconds(httpx.Response(429)) is None
+
+
+def test_invalid_retry_after_is_ignored():
+    assert retry_after_seconds(_response("garbage")) is None
+    assert retry_after_seconds(_response("Mon, 99 Foo 2024")) is None
+
+
+def test_backoff_delays_grow_exponentially_up_to_the_cap(monkeypatch):
+    # The longest delay full jitter can draw for each attempt
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(8)] == [0.5, 1, 2, 4, 8, 16, BACKOFF_CAP, BACKOFF_CAP]
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: low)
+    assert backoff_delay(3) == 0
+
+
+def test_backoff_never_undercuts_retry_after():
+    for attempt in range(6):
+        assert backoff_delay(attempt, retry_after=30) >= 30
+
+
+@pytest.fixture
+def fake_upstream():
+    upstream = FakeUpstream(rate=1, retry_after=1)
+    server = upstream.serve()
+    yield upstream, f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_429_is_retried_after_retry_after(fake_upstream):
+    upstream, url = fake_upstream
+    client = httpx.Client(transport=RateLimitedTransport("test-retry-after"), timeout=30)
+    assert client.get(url).status_code == 200
+    start = time.monotonic()
+    # Over the server's one request per second: 429 with Retry-After: 1, then retried
+    assert client.get(url).status_code == 200
+    assert time.monotonic() - start >= 1.0
+    assert upstream.counts == {"ok": 2, "429": 1, "503": 0}
+    stats = get_scheduler().upstream("test-retry-after").stats()
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+
+
+def test_no_retry_past_the_query_deadline(fake_upstream):
+    upstream, url = fake_upstream
+    client = httpx.Client(transport=RateLimitedTransport("test-deadline"), timeout=30)
+    assert client.get(url).status_code == 200
+    start = time.monotonic()
+    # Retry-After: 1 does not fit in what is left of the query's budget
+    with query_deadline(0.5):
+        assert client.get(url).status_code == 429
+    assert time.monotonic() - start < 0.5
+    assert upstream.counts == {"ok": 1, "429": 1, "503": 0}
+
+
+def test_throttle_holds_back_every_caller_of_the_upstream():
+    upstream = Upstream("test-throttle", rate=100, burst=100)
+    upstream.throttle(0.5)
+    start = time.monotonic()
+    upstream.acquire()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_gives_up_after_max_retries(fake_upstream):
+    upstream, url = fake_upstream
+    upstream.retry_after = 0
+    upstream.rate = 0
+    client = httpx.Client(transport=RateLimitedTransport("test-give-up", max_retries=2), timeout=30)
+    assert client.get(url).status_code == 429
+    assert upstream.counts["429"] == 3
+
+
+def test_interactive_requests_are_served_before_queued_batch_ones():
+    upstream = Upstream("test-priority", rate=10, burst=1)
+    upstream.acquire()  # Empty the bucket so every request below has to queue
+    order = []
+    order_lock = threading.Lock()
+
+    def request(priority):
+        upstream.acquire(priority)
+        with order_lock:
+            order.append(priority)
+
+    def start(priority, count):
+        threads = [threading.Thread(target=request, args=(priority,)) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    threads = start(PRIORITY_BATCH, 5)
+    while upstream.stats()["queue_depth"] < 5:
+        time.sleep(0.005)
+    threads += start(PRIORITY_INTERACTIVE, 5)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # At most the batch request at the head when they arrived goes first
+    assert order.count(PRIORITY_INTERACTIVE) == 5
+    last_interactive = max(i for i, priority in enumerate(order) if priority == PRIORITY_INTERACTIVE)
+    assert order[:last_interactive + 1].count(PRIORITY_BATCH) <= 1
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import search_client
+
+
+def _stream(events):
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+    return httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+
+
+def test_reset_replaces_the_streamed_answer(monkeypatch):
+    monkeypatch.setattr(search_client, "_client", httpx.Client(transport=_stream([
+        {"event": "token", "delta": "The answer is in"},
+        {"event": "token", "delta": " the earlier evidence"},
+        {"event": "reset", "text": "Sparse"},
+        {"event": "token", "delta": " attention"},
+        {"event": "result", "response": "Sparse attention"}
+    ])))
+    seen = []
+    result = search_client.run_remote_query("q", "key", "model", on_token=seen.append, base_url="http://service")
+    assert seen == ["The answer is in", "The answer is in the earlier evidence", "Sparse", "Sparse attention"]
+    assert result == {"response": "Sparse attention"}
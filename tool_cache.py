@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", os.path.join(".cache", "tool_cache.sqlite3"))
+TOOL_CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Seconds a cached result stays fresh, keyed by tool name
+TOOL_TTLS = {
+    "arxiv": 7 * 24 * 3600,
+    "wikipedia": 24 * 3600,
+    "WebSearch": 15 * 60
+}
+DEFAULT_TTL = 3600
+
+# Tool outputs that report a failure instead of raising; never cached
+ERROR_PREFIXES = ("Arxiv exception", "Wikipedia exception", "Error")
+
+# How many writes between size checks
+EVICTION_INTERVAL = 50
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivial variants share an entry"""
+    return " ".join(str(query).lower().split())
+
+
+def tool_settings(tool):
+    """Settings that change a tool's output, part of its cache key
+
+    Result count, content size, Wikipedia language, web search region and
+    time filter; None where the tool has no such setting.
+    """
+    # LangChain tools keep these on their api_wrapper, the async_tools ones on the tool itself
+    wrapper = getattr(tool, "api_wrapper", None) or tool
+    top_k = getattr(wrapper, "top_k_results", None) or getattr(wrapper, "max_results", None)
+    chars = getattr(wrapper, "doc_content_chars_max", None)
+    return (
+        top_k,
+        chars,
+        getattr(wrapper, "lang", None),
+        getattr(wrapper, "region", None),
+        getattr(wrapper, "time", None)
+    )
+
+
+class ToolCache:
+    """SQLite-backed cache of tool outputs with per-tool TTL and LRU eviction"""
+
+    def __init__(self, path=TOOL_CACHE_PATH, max_bytes=TOOL_CACHE_MAX_BYTES, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(TOOL_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = {}
+        self.misses = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS tool_cache (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_cache_access ON tool_cache(last_access)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(tool_name, query, settings=()):
+        """Stable key for (tool, normalized query, tool_settings)"""
+        raw = json.dumps([tool_name, normalize_query(query), *settings])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, tool_name, key):
+        """Cached value if present and within the tool's TTL, else None"""
+        now = time.time()
+        ttl = self.ttls.get(tool_name, DEFAULT_TTL)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self.misses[tool_name] = self.misses.get(tool_name, 0) + 1
+                return None
+            self._conn.execute("UPDATE tool_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[tool_name] = self.hits.get(tool_name, 0) + 1
+            return row[0]
+
+    def set(self, tool_name, key, value):
+        """Store a tool output, evicting least recently used entries when over budget"""
+        if not isinstance(value, str) or value.startswith(ERROR_PREFIXES):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tool_name, value, len(value.encode("utf-8")), now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired rows, then least recently used rows until under max_bytes"""
+        for tool_name, ttl in self.ttls.items():
+            self._conn.execute(
+                "DELETE FROM tool_cache WHERE tool = ? AND created < ?", (tool_name, now - ttl)
+            )
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM tool_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM tool_cache ORDER BY last_access"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM tool_cache WHERE key = ?", stale_keys)
+
+    def stats(self):
+        """Hit/miss counters per tool plus current size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tool_cache"
+            ).fetchone()
+        return {"hits": dict(self.hits), "misses": dict(self.misses), "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache")
+            self._conn.commit()
+
+
+class CachedTool(BaseTool):
+    """Drop-in wrapper that serves a tool's output from ToolCache when fresh
+
+    Keeps the wrapped tool's name, description and args schema, so the agent
+    sees exactly the same interface.
+    """
+
+    tool: BaseTool
+    cache: Any
+
+    def __init__(self, tool, cache, **kwargs):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            cache=cache,
+            **kwargs
+        )
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        key = self.cache.make_key(self.tool.name, query, tool_settings(self.tool))
+        cached = self.cache.get(self.tool.name, key)
+        if cached is not None:
+            return cached
+        result = self.tool.run(query)
+        self.cache.set(self.tool.name, key, result)
+        return result
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        key = self.cache.make_key(self.tool.name, query, tool_settings(self.tool))
+        cached = await asyncio.to_thread(self.cache.get, self.tool.name, key)
+        if cached is not None:
+            return cached
+        result = await self.tool.arun(query)
+        await asyncio.to_thread(self.cache.set, self.tool.name, key, result)
+        return result
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_tool_cache():
+    """Process-wide tool cache shared by all sessions"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ToolCache()
+        return _default_cache
+
+
+def wrap_tools(tools, cache=None):
+    """Wrap each tool with the shared result cache"""
+    cache = cache or get_tool_cache()
+    return [CachedTool(tool, cache) for tool in tools]
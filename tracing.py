@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_PATH = os.getenv("TRACE_PATH", os.path.join(".cache", "traces", "spans.jsonl"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-search-pro")
+
+# The trace file is rotated to <path>.1 at this size, so at most twice this is kept on disk
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_export_lock = threading.Lock()
+
+
+def _new_id(num_bytes):
+    return os.urandom(num_bytes).hex()
+
+
+def _otlp_value(value):
+    """Wrap a Python value as an OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _token_usage(response):
+    """Prompt and completion tokens from an LLMResult, if the provider reported them"""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    tokens_in = usage.get("prompt_tokens")
+    tokens_out = usage.get("completion_tokens")
+    if tokens_in is None:
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    tokens_in = (tokens_in or 0) + metadata.get("input_tokens", 0)
+                    tokens_out = (tokens_out or 0) + metadata.get("output_tokens", 0)
+    return tokens_in, tokens_out
+
+
+class SpanRecorder(BaseCallbackHandler):
+    """Record a span per LLM call and per tool call of one query
+
+    Runs next to StreamlitCallbackHandler. Spans hang off a root span for the
+    whole query and are exported as OTLP/JSON (one ExportTraceServiceRequest
+    per line), the format read by the OpenTelemetry Collector file receiver.
+    """
+
+    run_inline = True  # Only appends to in-memory lists; no executor hop in async runs
+
+    def __init__(self, name="search_query", attributes=None):
+        self.trace_id = _new_id(16)
+        self.root = {
+            "spanId": _new_id(8),
+            "name": name,
+            "kind": SPAN_KIND_INTERNAL,
+            "start": time.time_ns(),
+            "end": None,
+            "attributes": dict(attributes or {}),
+            "error": None
+        }
+        self.spans = []
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, name, stage, attributes):
+        with self._lock:
+            parent = self._open.get(parent_run_id) if parent_run_id else None
+            self._open[run_id] = {
+                "spanId": _new_id(8),
+                "parentSpanId": parent["spanId"] if parent else self.root["spanId"],
+                "name": name,
+                "stage": stage,
+                "kind": SPAN_KIND_CLIENT,
+                "start": time.time_ns(),
+                "end": None,
+                "attributes": attributes,
+                "error": None
+            }
+
+    def _end(self, run_id, attributes=None, error=None):
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span["end"] = time.time_ns()
+            span["attributes"].update(attributes or {})
+            span["error"] = str(error) if error else None
+            self.spans.append(span)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, parent_run_id, "llm", "llm", {
+            "llm.model": params.get("model_name") or params.get("model") or "unknown",
+            "llm.input_chars": sum(len(prompt) for prompt in prompts)
+        })
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, parent_run_id, "llm", "llm", {
+            "llm.model": params.get("model_name") or params.get("model") or "unknown",
+            "llm.input_chars": sum(len(str(m.content)) for batch in messages for m in batch)
+        })
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        tokens_in, tokens_out = _token_usage(response)
+        attributes = {}
+        if tokens_in is not None:
+            attributes["llm.tokens_in"] = tokens_in
+        if tokens_out is not None:
+            attributes["llm.tokens_out"] = tokens_out
+        output_chars = sum(len(g.text) for generations in response.generations for g in generations)
+        attributes["llm.output_chars"] = output_chars
+        # Model that actually answered when the call was hedged or fell back
+        served_by = (response.llm_output or {}).get("model_name")
+        if served_by:
+            attributes["llm.response_model"] = served_by
+        self._end(run_id, attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        tool_name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool:{tool_name}", f"tool:{tool_name}", {
+            "tool.name": tool_name,
+            "tool.input_chars": len(str(input_str))
+        })
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self._end(run_id, {"tool.output_chars": len(str(content))})
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def finish(self, attributes=None, error=None):
+        """Close the root span"""
+        self.root["end"] = time.time_ns()
+        self.root["attributes"].update(attributes or {})
+        self.root["error"] = str(error) if error else None
+
+    def stage_breakdown(self):
+        """Seconds spent per stage (``llm``, ``tool:<name>``) plus everything else
+
+        Tool calls that ran in parallel are summed, so stages can add up to
+        more than the wall-clock total.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        stages = {}
+        for span in spans:
+            stages[span["stage"]] = stages.get(span["stage"], 0.0) + (span["end"] - span["start"]) / 1e9
+        end = self.root["end"] or time.time_ns()
+        total = (end - self.root["start"]) / 1e9
+        stages["other"] = max(0.0, total - sum(stages.values()))
+        return stages
+
+    def tool_calls(self):
+        """Number of calls per tool name"""
+        with self._lock:
+            spans = list(self.spans)
+        calls = {}
+        for span in spans:
+            if span["stage"].startswith("tool:"):
+                name = span["stage"][len("tool:"):]
+                calls[name] = calls.get(name, 0) + 1
+        return calls
+
+    def llm_usage(self):
+        """LLM calls of the query and their prompt size
+
+        ``input_chars`` is always known; ``tokens_in`` only when the provider
+        reported usage for every call (streamed responses often do not).
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span["stage"] == "llm"]
+        tokens = [span["attributes"].get("llm.tokens_in") for span in spans]
+        return {
+            "calls": len(spans),
+            "input_chars": sum(span["attributes"].get("llm.input_chars", 0) for span in spans),
+            "tokens_in": sum(tokens) if spans and None not in tokens else None,
+            "seconds": sum((span["end"] - span["start"]) / 1e9 for span in spans)
+        }
+
+    def _otlp_span(self, span):
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": span["spanId"],
+            "name": span["name"],
+            "kind": span["kind"],
+            "startTimeUnixNano": str(span["start"]),
+            "endTimeUnixNano": str(span["end"] or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span["attributes"].items()],
+            "status": {"code": STATUS_ERROR, "message": span["error"]} if span["error"] else {"code": STATUS_OK}
+        }
+        if span.get("parentSpanId"):
+            otlp["parentSpanId"] = span["parentSpanId"]
+        return otlp
+
+    def to_otlp(self):
+        """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+        with self._lock:
+            spans = [self.root] + list(self.spans)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "ai-search-pro.tracing"},
+                    "spans": [self._otlp_span(span) for span in spans]
+                }]
+            }]
+        }
+
+    def export(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES):
+        """Append the trace to the local trace file, rotating it once it reaches max_bytes"""
+        line = json.dumps(self.to_otlp())
+        try:
+            with _export_lock:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+                    os.replace(path, path + ".1")
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError:
+            pass  # Tracing must never break a search
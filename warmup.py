@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_warmups = {}
+
+
+class Warmup:
+    """Run a slow loader (heavy imports, tool setup) once in a background thread"""
+
+    def __init__(self, name, load):
+        self.name = name
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._done = threading.Event()
+        threading.Thread(target=self._run, args=(load,), name=f"warmup-{name}", daemon=True).start()
+
+    def _run(self, load):
+        start = time.perf_counter()
+        try:
+            self.result = load()
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", self.name, e)
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until loaded and return the result (re-raises a load failure)"""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def start_warmup(name, load):
+    """Start ``load`` in the background once per process and return its Warmup
+
+    Streamlit reruns the app script for every interaction and every session;
+    only the first call for a name starts a thread, later ones get the same Warmup.
+    """
+    with _lock:
+        if name not in _warmups:
+            _warmups[name] = Warmup(name, load)
+        return _warmups[name]
+
+
+def get_warmup(name):
+    """The Warmup started under this name, or None if none has been started"""
+    with _lock:
+        return _warmups.get(name)